@@ -0,0 +1,51 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import PlainTextResponse, Response
+
+from ..core import metrics
+from ..core.config import PROFILING_TOKEN
+from ..core.profiling import profiler, valid_token
+
+
+def require_profiling_token(x_profile_token: Optional[str] = Header(None)):
+    if not PROFILING_TOKEN:
+        raise HTTPException(status_code=404, detail="Profiling is not enabled")
+    if not valid_token(x_profile_token):
+        raise HTTPException(status_code=403, detail="Invalid profiling token")
+
+
+router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(require_profiling_token)])
+
+
+# Under /api so vercel.json routes it; Prometheus sends the token as a header
+# (scrape_config http_headers). Per worker process, like the profiles.
+@router.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
+# Profiles are kept per worker process; with several workers, retry against the
+# one that returned the X-Profile-Id.
+@router.get("/profiles")
+def list_profiles(path: Optional[str] = None):
+    """Recent profiles, newest first, optionally only those of one path."""
+    return [p.summary() for p in reversed(profiler.profiles) if path is None or p.path == path]
+
+
+@router.get("/profiles/collapsed", response_class=PlainTextResponse)
+def collapsed_profiles(path: Optional[str] = None):
+    """All buffered profiles (of one path) as collapsed stacks, for a combined flamegraph."""
+    return "".join(p.collapsed() for p in profiler.profiles if path is None or p.path == path)
+
+
+@router.get("/profiles/{profile_id}", response_class=PlainTextResponse)
+def get_profile(profile_id: str):
+    """
+    One profile as collapsed stacks ("frame;frame;frame count"), e.g.
+    `curl ... > out.folded && flamegraph.pl out.folded > out.svg`, or drop it
+    on speedscope.app.
+    """
+    profile = profiler.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found (evicted, or recorded by another worker)")
+    return profile.collapsed()
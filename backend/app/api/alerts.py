@@ -2,21 +2,26 @@ import logging
 from fastapi import APIRouter, HTTPException, Query
 from typing import Optional
 
+from ..core.database import DbSession
 from ..schemas.schemas import AlertRequest, AlertStatusUpdate
-from ..services import storage
+from ..services import alert_index, storage
 from ..services.scraper import compare_product
 
 router = APIRouter(prefix="/alerts", tags=["alerts"])
 logger = logging.getLogger("pricenest")
 
 @router.post("")
-def create_alert(req: AlertRequest):
+def create_alert(req: AlertRequest, db: DbSession):
     try:
         query = req.query.strip().lower()
         logger.info(f"[ALERT CREATE] {query} for {req.email}")
 
         # Ensure product exists
-        if not storage.get_product(query):
+        if not storage.get_product(query, db=db):
+            # Nothing written yet: end the read transaction so the pooled
+            # connection is not held across the scrape
+            if db is not None:
+                db.commit()
             try:
                 logger.info(f"[ALERT CREATE] Product not found, scraping: {query}")
                 fresh = compare_product(query)
@@ -24,7 +29,7 @@ def create_alert(req: AlertRequest):
                     logger.error(f"[ALERT CREATE] Scraper returned invalid data for {query}: {fresh}")
                     raise HTTPException(status_code=500, detail="Failed to fetch product data")
                 
-                storage.upsert_product(query, fresh.get("results", []))
+                storage.upsert_product(query, fresh.get("results", []), db=db)
             except Exception as e:
                 logger.error(f"[ALERT CREATE] Scraper failed for {query}: {e}")
                 raise HTTPException(status_code=500, detail=f"Failed to verify product: {str(e)}")
@@ -33,9 +38,11 @@ def create_alert(req: AlertRequest):
             email=req.email,
             query=query,
             target_price=req.target_price,
-            notify_method=req.notify_method
+            notify_method=req.notify_method,
+            db=db
         )
         
+        storage.after_commit(db, alert_index.alert_changed, alert)
         logger.info(f"[ALERT CREATE] Success: {alert}")
         return {"status": "ok", "alert": alert}
 
@@ -47,14 +54,14 @@ def create_alert(req: AlertRequest):
 
 
 @router.get("")
-def get_alerts(email: Optional[str] = Query(None)):
+def get_alerts(db: DbSession, email: Optional[str] = Query(None)):
     try:
         if email:
             logger.info(f"[ALERT LIST] {email}")
-            alerts = storage.list_alerts(email)
+            alerts = storage.list_alerts(email, db=db)
         else:
             logger.info("[ALERT LIST] all alerts")
-            alerts = storage.list_all_alerts()
+            alerts = storage.list_all_alerts(db=db)
 
         if not alerts:
             return []
@@ -67,18 +74,20 @@ def get_alerts(email: Optional[str] = Query(None)):
 
 
 @router.put("/{alert_id}")
-def update_alert_status(alert_id: int, req: AlertStatusUpdate):
+def update_alert_status(alert_id: int, req: AlertStatusUpdate, db: DbSession):
     logger.info(f"[ALERT UPDATE] {alert_id} -> {req.is_active}")
-    updated = storage.update_alert_status(alert_id, req.is_active)
+    updated = storage.update_alert_status(alert_id, req.is_active, db=db)
     if not updated:
         raise HTTPException(status_code=404, detail="Alert not found")
+    storage.after_commit(db, alert_index.alert_changed, updated)
     return {"status": "ok", "alert": updated}
 
 
 @router.delete("/{alert_id}")
-def delete_alert(alert_id: int):
+def delete_alert(alert_id: int, db: DbSession):
     logger.info(f"[ALERT DELETE] {alert_id}")
-    success = storage.delete_alert(alert_id)
+    success = storage.delete_alert(alert_id, db=db)
     if not success:
         raise HTTPException(status_code=404, detail="Alert not found")
+    storage.after_commit(db, alert_index.alert_deleted, alert_id)
     return {"status": "ok"}
@@ -1,19 +1,55 @@
 import logging
-from fastapi import APIRouter, HTTPException
-from ..services.analytics import analyze_price
+from typing import Literal, Optional
+from fastapi import APIRouter, Header, HTTPException, Query, Response
+from ..schemas.schemas import AnalyticsBatchRequest
+from ..services import storage_async
+from ..services.analytics import analyze_price_async, analyze_prices_async, DEFAULT_TREND_POINTS, MAX_BATCH_QUERIES
 
 router = APIRouter(tags=["analytics"])
 logger = logging.getLogger("pricenest")
 
+# The ETag is the query's data version (bumped by every stored scrape) plus the
+# parameters, so a repeat view or a polling client costs one version lookup and
+# a 304 until the next scrape. Bump the prefix when the result shape changes.
+ETAG_PREFIX = "a1"
+
+
+def _etag(version: int, resolution: str, max_points: int) -> str:
+    return f'"{ETAG_PREFIX}-{version}-{resolution}-{max_points}"'
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [t.strip() for t in if_none_match.split(",")]
+    return "*" in tags or any(t.removeprefix("W/") == etag for t in tags)
+
+
 @router.get("/analytics")
-def analytics(q: str):
+async def analytics(
+    response: Response,
+    q: str,
+    resolution: Literal["raw", "day", "week"] = "day",
+    max_points: int = Query(DEFAULT_TREND_POINTS, ge=10, le=5000),
+    if_none_match: Optional[str] = Header(None)
+):
     q = q.strip().lower()
-    logger.info(f"[ANALYTICS] {q}")
 
     try:
-        result = analyze_price(q)
+        version = await storage_async.get_data_version(q)
+        etag = _etag(version, resolution, max_points)
+        # Clients may keep the result but must revalidate it on every use.
+        # Version 0 (history stored before versions existed) is never cached.
+        headers = {"ETag": etag, "Cache-Control": "no-cache"} if version else {}
+        if version and _etag_matches(if_none_match, etag):
+            logger.info(f"[ANALYTICS] {q} not modified (version {version})")
+            return Response(status_code=304, headers=headers)
+
+        logger.info(f"[ANALYTICS] {q} ({resolution}, max {max_points} points, version {version})")
+        result = await analyze_price_async(q, resolution=resolution, max_points=max_points, version=version)
         if "error" in result:
             raise HTTPException(status_code=404, detail=result["error"])
+        response.headers.update(headers)
         return result
     except HTTPException:
         raise
@@ -23,3 +59,27 @@ def analytics(q: str):
             status_code=503, 
             detail="Analytics service temporarily unavailable (database connection issue)"
         )
+
+
+@router.post("/analytics/batch")
+async def analytics_batch(body: AnalyticsBatchRequest):
+    """
+    Analytics for many products at once (wishlist / alerts pages), keyed by the
+    lowercased query. A product without data, or whose analytics failed, gets
+    {"error": ...} in its slot instead of failing the whole request.
+    """
+    queries = list(dict.fromkeys(q.strip().lower() for q in body.queries if q.strip()))
+    if not queries:
+        raise HTTPException(status_code=400, detail="At least one non-empty query is required.")
+    if len(queries) > MAX_BATCH_QUERIES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_QUERIES} queries per request.")
+    logger.info(f"[ANALYTICS] batch of {len(queries)} ({body.resolution}, max {body.max_points} points)")
+
+    try:
+        return await analyze_prices_async(queries, resolution=body.resolution, max_points=body.max_points)
+    except Exception as e:
+        logger.error(f"Batch analytics failure for {len(queries)} queries: {e}")
+        raise HTTPException(
+            status_code=503,
+            detail="Analytics service temporarily unavailable (database connection issue)"
+        )
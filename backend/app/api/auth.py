@@ -1,4 +1,5 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException
+from ..core.database import DbSession
 from ..schemas.schemas import UserSignupRequest, UserLoginRequest, UserProfileUpdate
 from ..services import storage
 from ..core.security import get_password_hash, verify_password
@@ -6,8 +7,8 @@ from ..core.security import get_password_hash, verify_password
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 @router.post("/signup")
-def signup(req: UserSignupRequest):
-    existing_user = storage.get_user_by_email(req.email)
+def signup(req: UserSignupRequest, db: DbSession):
+    existing_user = storage.get_user_by_email(req.email, db=db)
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
 
@@ -17,7 +18,8 @@ def signup(req: UserSignupRequest):
         first_name=req.first_name,
         last_name=req.last_name,
         email=req.email,
-        hashed_password=hashed_password
+        hashed_password=hashed_password,
+        db=db
     )
 
     return {
@@ -32,8 +34,8 @@ def signup(req: UserSignupRequest):
 
 
 @router.post("/login")
-def login(req: UserLoginRequest):
-    user = storage.get_user_by_email(req.email)
+def login(req: UserLoginRequest, db: DbSession):
+    user = storage.get_user_by_email(req.email, db=db)
 
     if not user or not verify_password(req.password, user.hashed_password):
         raise HTTPException(status_code=401, detail="Invalid credentials")
@@ -50,14 +52,11 @@ def login(req: UserLoginRequest):
 
 
 @router.put("/profile")
-def update_profile(req: UserProfileUpdate):
-    user = storage.get_user_by_email(req.email)
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
-    updated = storage.update_user(req.email, req.first_name, req.last_name)
+def update_profile(req: UserProfileUpdate, db: DbSession):
+    # update_user looks the user up itself; None means there is no such user
+    updated = storage.update_user(req.email, req.first_name, req.last_name, db=db)
     if not updated:
-        raise HTTPException(status_code=500, detail="Failed to update profile")
+        raise HTTPException(status_code=404, detail="User not found")
 
     return {
         "status": "ok",
@@ -1,38 +1,98 @@
+import asyncio
 import logging
+import threading
 from fastapi import APIRouter, HTTPException
-from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 
 from ..schemas.schemas import CompareResponse
-from ..services import storage
-from ..services.scraper import compare_product
+from ..services import storage, storage_async
+from ..services.scraper import compare_product, compare_product_async
+from ..core import metrics
+from ..core.config import COMPARE_CACHE_ENABLED, COMPARE_CACHE_TTL, COMPARE_CACHE_STALE_TTL
 
 router = APIRouter(tags=["products"])
 logger = logging.getLogger("pricenest")
 
+# Background stale-cache refreshes; the request path itself is async
 EXECUTOR = ThreadPoolExecutor(max_workers=4)
 SCRAPER_TIMEOUT = 25
 
+# Queries with a background refresh in flight, so a burst of stale hits scrapes once
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+
+
+def _refresh(q: str):
+    metrics.COMPARE_REFRESH_QUEUE.dec()
+    try:
+        data = compare_product(q)
+        storage.upsert_product(q, data.get("results", []))
+        logger.info(f"[COMPARE] Background refresh done: {q}")
+    except Exception as e:
+        logger.error(f"[COMPARE] Background refresh failed for {q}: {e}")
+    finally:
+        with _refreshing_lock:
+            _refreshing.discard(q)
+
+
+def _schedule_refresh(q: str):
+    with _refreshing_lock:
+        if q in _refreshing:
+            return
+        _refreshing.add(q)
+    metrics.COMPARE_REFRESH_QUEUE.inc()
+    EXECUTOR.submit(_refresh, q)
+
+
+async def _cached_compare(q: str):
+    """
+    Serve the latest stored scrape for q if it is within the stale window.
+    Stale hits are returned immediately and refreshed in the background.
+    """
+    try:
+        scraped_at, results = await storage_async.get_latest_results(q)
+    except Exception as e:
+        logger.error(f"[COMPARE] Cache lookup failed for {q}: {e}")
+        return None
+
+    if not results:
+        return None
+
+    age = datetime.utcnow() - scraped_at
+    if age <= timedelta(seconds=COMPARE_CACHE_TTL):
+        logger.info(f"[COMPARE] Fresh cache hit: {q} ({int(age.total_seconds())}s old)")
+        return {"query": q, "results": results}
+
+    if age <= timedelta(seconds=COMPARE_CACHE_STALE_TTL):
+        logger.info(f"[COMPARE] Stale cache hit: {q} ({int(age.total_seconds())}s old), refreshing")
+        _schedule_refresh(q)
+        return {"query": q, "results": results}
+
+    return None
+
+
 @router.get("/compare", response_model=CompareResponse)
-def compare(q: str):
+async def compare(q: str):
     q = q.strip().lower()
     logger.info(f"[COMPARE] {q}")
 
-    # Cache check disabled per user request to always fetch from SerpAPI for compare tab.
-    # Results will still be saved to DB for history/analytics.
-
-
-    future = EXECUTOR.submit(compare_product, q)
+    # Cache is opt-in (COMPARE_CACHE_ENABLED); by default the compare tab always
+    # fetches from SerpAPI. Results are saved to DB for history/analytics either way.
+    if COMPARE_CACHE_ENABLED:
+        cached = await _cached_compare(q)
+        if cached is not None:
+            return cached
 
     try:
-        data = future.result(timeout=SCRAPER_TIMEOUT)
-    except FuturesTimeout:
+        data = await asyncio.wait_for(compare_product_async(q, timeout=SCRAPER_TIMEOUT), SCRAPER_TIMEOUT)
+    except asyncio.TimeoutError:
         raise HTTPException(status_code=504, detail="Scraper timed out")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
     try:
-        results = storage.upsert_product(q, data.get("results", []))
+        results = await storage_async.upsert_product(q, data.get("results", []))
         return {"query": q, "results": results}
     except Exception:
         return data
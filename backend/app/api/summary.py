@@ -2,18 +2,18 @@ from fastapi import APIRouter, HTTPException
 from ..schemas.schemas import SummaryRequest
 
 try:
-    from ..services.summary import get_product_summary
+    from ..services.summary import get_product_summary_async
 except ImportError:
-    from services.summary import get_product_summary
+    from services.summary import get_product_summary_async
 
 router = APIRouter()
 
 @router.post("/summary")
-def ai_summary(body: SummaryRequest):
+async def ai_summary(body: SummaryRequest):
     if not body.query or not body.query.strip():
         raise HTTPException(status_code=400, detail="Query cannot be empty.")
 
-    result = get_product_summary(body.query.strip())
+    result = await get_product_summary_async(body.query.strip())
 
     if "error" in result:
         raise HTTPException(status_code=500, detail=result["error"])
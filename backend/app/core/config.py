@@ -20,3 +20,54 @@ GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY")
 # Email Config
 EMAIL_USER = os.environ.get("EMAIL_USER")
 EMAIL_PASS = os.environ.get("EMAIL_PASS")
+
+# SMTP. Without EMAIL_USER/EMAIL_PASS no email is sent, unless SMTP_ALLOW_NO_AUTH is
+# set for a server that needs no login, e.g. a local sink
+# (`python -m aiosmtpd -n -l localhost:1025`, with SMTP_SERVER=localhost
+# SMTP_PORT=1025 SMTP_STARTTLS=false SMTP_ALLOW_NO_AUTH=true)
+SMTP_SERVER = os.environ.get("SMTP_SERVER", "smtp.gmail.com")
+SMTP_PORT = int(os.environ.get("SMTP_PORT", "587"))
+SMTP_STARTTLS = os.environ.get("SMTP_STARTTLS", "true").lower() in ("1", "true", "yes")
+SMTP_ALLOW_NO_AUTH = os.environ.get("SMTP_ALLOW_NO_AUTH", "false").lower() in ("1", "true", "yes")
+SMTP_POOL_SIZE = int(os.environ.get("SMTP_POOL_SIZE", "3"))   # authenticated connections kept open
+
+# Compare cache (opt-in)
+# A scrape younger than COMPARE_CACHE_TTL seconds is served as-is; one younger than
+# COMPARE_CACHE_STALE_TTL is served immediately while a background scrape refreshes it.
+COMPARE_CACHE_ENABLED = os.environ.get("COMPARE_CACHE_ENABLED", "false").lower() in ("1", "true", "yes")
+COMPARE_CACHE_TTL = int(os.environ.get("COMPARE_CACHE_TTL", "900"))
+COMPARE_CACHE_STALE_TTL = int(os.environ.get("COMPARE_CACHE_STALE_TTL", "21600"))
+
+# Scheduler scraping
+SCRAPE_CONCURRENCY = int(os.environ.get("SCRAPE_CONCURRENCY", "8"))    # parallel SerpAPI calls
+SERPAPI_MAX_RPS = float(os.environ.get("SERPAPI_MAX_RPS", "5"))        # global request rate cap, 0 = unlimited
+SCRAPE_DEADLINE = float(os.environ.get("SCRAPE_DEADLINE", "30"))       # wall-clock seconds per query (wait, call, write)
+
+# AI summary cache: in-process LRU in front of the product_summaries table
+SUMMARY_CACHE_TTL = int(os.environ.get("SUMMARY_CACHE_TTL", str(7 * 24 * 3600)))   # seconds
+SUMMARY_CACHE_SIZE = int(os.environ.get("SUMMARY_CACHE_SIZE", "256"))              # entries per process
+
+# Analytics results cached per process under (query, data version, resolution, max_points),
+# bounded by their total trend points (~260 bytes each, so the default is ~13 MB)
+ANALYTICS_CACHE_POINTS = int(os.environ.get("ANALYTICS_CACHE_POINTS", "50000"))   # per process, 0 = off
+
+# Real-time alerts (opt-in): alerts are checked against every fresh scrape the API
+# stores, via an in-process index rebuilt every REALTIME_ALERTS_RELOAD seconds.
+REALTIME_ALERTS_ENABLED = os.environ.get("REALTIME_ALERTS_ENABLED", "false").lower() in ("1", "true", "yes")
+REALTIME_ALERTS_RELOAD = int(os.environ.get("REALTIME_ALERTS_RELOAD", "300"))
+
+# Adaptive scrape planning (see services/scrape_planner.py)
+SCRAPE_BUDGET = int(os.environ.get("SCRAPE_BUDGET", "0"))          # SerpAPI calls per scheduler run, 0 = every alert query
+SCRAPE_MAX_AGE = float(os.environ.get("SCRAPE_MAX_AGE", "24"))     # hours before a query is scraped regardless of priority
+
+# Scrape job queue (python -m backend.app.services.scheduler enqueue / worker)
+SCRAPE_JOB_LEASE = int(os.environ.get("SCRAPE_JOB_LEASE", "300"))            # seconds a claimed job stays leased
+SCRAPE_JOB_MAX_ATTEMPTS = int(os.environ.get("SCRAPE_JOB_MAX_ATTEMPTS", "3"))
+
+# Request profiling (see core/profiling.py). A request is profiled when it sends
+# X-Profile-Token: <PROFILING_TOKEN>, or at random with PROFILING_SAMPLE_RATE; the last
+# PROFILING_BUFFER_SIZE profiles are served from /api/admin/profiles to the same header.
+PROFILING_TOKEN = os.environ.get("PROFILING_TOKEN")                            # unset = header trigger and admin API off
+PROFILING_SAMPLE_RATE = float(os.environ.get("PROFILING_SAMPLE_RATE", "0"))   # fraction of requests, 0 = none
+PROFILING_INTERVAL_MS = float(os.environ.get("PROFILING_INTERVAL_MS", "5"))   # stack sampling period
+PROFILING_BUFFER_SIZE = int(os.environ.get("PROFILING_BUFFER_SIZE", "50"))
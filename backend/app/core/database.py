@@ -1,12 +1,53 @@
+import threading
+from typing import Annotated, Optional
+from fastapi import Depends
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
 from .config import DATABASE_URL
+from . import metrics
 
 Base = declarative_base()
 
 engine = None
 SessionLocal = None
 
+# Async engine for the request path (/compare, /analytics, /summary); the
+# scheduler, scripts and remaining routers stay on the sync engine above.
+# Created by get_async_sessionmaker() on first use, so processes and cold
+# starts that never touch it do not load asyncpg.
+async_engine = None
+AsyncSessionLocal = None
+_async_init_lock = threading.Lock()
+_async_initialized = False
+
+# libpq URL parameters asyncpg does not accept as keywords
+_LIBPQ_ONLY_PARAMS = ("sslmode", "channel_binding")
+
+
+def _async_url(url: str):
+    """
+    Translate the libpq-style DATABASE_URL into asyncpg form.
+
+    Returns (url, connect_args): the driver is swapped to asyncpg and sslmode
+    moves from the query string to asyncpg's `ssl` argument, which takes the
+    same mode names (disable/prefer/require/verify-ca/verify-full).
+    """
+    url = make_url(url)
+    if url.get_backend_name() == "sqlite":
+        return url.set(drivername="sqlite+aiosqlite"), {}
+    if url.get_backend_name() != "postgresql":
+        return url, {}
+
+    connect_args = {}
+    sslmode = url.query.get("sslmode")
+    if sslmode:
+        connect_args["ssl"] = sslmode
+    url = url.set(drivername="postgresql+asyncpg").difference_update_query(_LIBPQ_ONLY_PARAMS)
+    return url, connect_args
+
+
 if DATABASE_URL:
     # Clean Neon URL safely
     clean_url = DATABASE_URL.replace("channel_binding=require", "")
@@ -21,5 +62,67 @@ if DATABASE_URL:
         autoflush=False,
         bind=engine
     )
+    metrics.instrument_engine(engine, "sync")
+
+
 else:
-    print("⚠️ DATABASE_URL not set")
\ No newline at end of file
+    print("⚠️ DATABASE_URL not set")
+
+
+def get_async_sessionmaker():
+    """AsyncSessionLocal, creating the async engine on the first call; None if unavailable."""
+    global async_engine, AsyncSessionLocal, _async_initialized
+    if _async_initialized:
+        return AsyncSessionLocal
+
+    with _async_init_lock:
+        if _async_initialized or not DATABASE_URL:
+            _async_initialized = True
+            return AsyncSessionLocal
+        try:
+            from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+            async_url, connect_args = _async_url(DATABASE_URL)
+            async_engine = create_async_engine(
+                async_url,
+                connect_args=connect_args,
+                pool_pre_ping=True
+            )
+            AsyncSessionLocal = async_sessionmaker(
+                async_engine,
+                autoflush=False,
+                expire_on_commit=False
+            )
+            metrics.instrument_engine(async_engine.sync_engine, "async")
+        except (ImportError, InvalidRequestError) as e:
+            # Async storage falls back to the sync engine in a worker thread
+            print(f"⚠️ Async database driver unavailable ({e}), using the sync engine")
+        _async_initialized = True
+    return AsyncSessionLocal
+
+
+def get_db():
+    """
+    One session and transaction per request. Storage calls given this session
+    flush into it; it is committed when the endpoint returns and rolled back
+    if it raises. Yields None when the database is not configured, so storage
+    raises its usual 503.
+    """
+    if SessionLocal is None:
+        yield None
+        return
+
+    db = SessionLocal()
+    try:
+        yield db
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+# scope="function" runs the commit before the response is sent, so a failed
+# commit is a 500 instead of a success the database never saw.
+DbSession = Annotated[Optional[Session], Depends(get_db, scope="function")]
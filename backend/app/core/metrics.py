@@ -0,0 +1,294 @@
+"""
+In-process metrics, exposed in the Prometheus text format at /api/admin/metrics
+(behind the X-Profile-Token admin header, see api/admin.py).
+
+A deliberately small subset of prometheus_client: counters, gauges (set
+directly or read from a callback at scrape time) and histograms, all labelled
+by keyword. Values live in this process, so with several uvicorn workers each
+one reports its own series; scrape them individually or add a pod/instance
+label on the Prometheus side.
+
+    with metrics.SERPAPI_REQUEST.time(mode="sync"):
+        ...
+
+    @metrics.timed(metrics.GEMINI_REQUEST, mode="async")
+    async def call(): ...
+"""
+import functools
+import inspect
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; SerpAPI and Gemini calls routinely land in the 1-30s range
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+_registry = []
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in list(zip(names, values)) + list(extra)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def _samples(self):
+        """[(suffix, label_values, extra_labels, value)]"""
+        with self._lock:
+            return [("", key, (), value) for key, value in self._values.items()]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, key, extra, value in self._samples():
+            lines.append(f"{self.name}{suffix}{_format_labels(self.labelnames, key, extra)} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._functions = {}
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set_function(self, fn, **labels):
+        """Report fn() for these labels, evaluated on every scrape."""
+        with self._lock:
+            self._functions[self._key(labels)] = fn
+
+    def _samples(self):
+        samples = super()._samples()
+        with self._lock:
+            functions = list(self._functions.items())
+        for key, fn in functions:
+            try:
+                samples.append(("", key, (), fn()))
+            except Exception:
+                # A gauge whose source is gone (e.g. a disposed pool) is skipped
+                continue
+        return samples
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0]
+            counts = state[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            state[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the with-block, whether or not it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _samples(self):
+        with self._lock:
+            states = [(key, list(counts), total) for key, (counts, total) in self._values.items()]
+        samples = []
+        for key, counts, total in states:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                samples.append(("_bucket", key, (("le", _format_value(bound)),), cumulative))
+            samples.append(("_sum", key, (), total))
+            samples.append(("_count", key, (), cumulative))
+        return samples
+
+
+def timed(histogram, **labels):
+    """Decorator: observe each call's duration. Coroutines are timed to completion
+    and generators over their whole iteration."""
+    def decorator(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def wrapper(*args, **kwargs):
+                with histogram.time(**labels):
+                    return await fn(*args, **kwargs)
+        elif inspect.isgeneratorfunction(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with histogram.time(**labels):
+                    yield from fn(*args, **kwargs)
+        else:
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with histogram.time(**labels):
+                    return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def render() -> str:
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# -----------------------------
+# Application metrics
+# -----------------------------
+HTTP_REQUEST = Histogram(
+    "pricenest_http_request_duration_seconds", "API request latency by route template and status",
+    ("method", "route", "status")
+)
+SERPAPI_REQUEST = Histogram(
+    "pricenest_serpapi_request_duration_seconds", "google_search / google_search_async latency",
+    ("mode",)
+)
+EXTRACT_RESULTS = Histogram(
+    "pricenest_extract_results_duration_seconds", "extract_results processing time",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25)
+)
+STORAGE_CALL = Histogram(
+    "pricenest_storage_call_duration_seconds", "Storage function latency, including pool checkout",
+    ("function",)
+)
+GEMINI_REQUEST = Histogram(
+    "pricenest_gemini_request_duration_seconds", "Gemini generate_content latency",
+    ("mode",)
+)
+SMTP_SEND = Histogram(
+    "pricenest_smtp_send_duration_seconds", "SMTP send_message latency on an open connection"
+)
+DB_POOL_CHECKOUT = Histogram(
+    "pricenest_db_pool_checkout_duration_seconds", "Time to check a connection out of the pool (incl. pre-ping)",
+    ("engine",)
+)
+DB_POOL_HOLD = Histogram(
+    "pricenest_db_pool_hold_duration_seconds", "Time a connection stays checked out, checkout to checkin",
+    ("engine",)
+)
+DB_POOL_WAITS = Counter(
+    "pricenest_db_pool_waits_total", "Checkouts that found the pool exhausted and had to wait",
+    ("engine",)
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "pricenest_db_pool_checked_out", "Connections currently checked out", ("engine",)
+)
+DB_POOL_SIZE = Gauge(
+    "pricenest_db_pool_size", "Configured pool size (without overflow)", ("engine",)
+)
+COMPARE_REFRESH_QUEUE = Gauge(
+    "pricenest_compare_refresh_queue_depth", "Background compare refreshes waiting for an EXECUTOR thread"
+)
+
+
+def instrument_engine(engine, name):
+    """
+    Time pool checkouts and report pool occupancy for a (sync) Engine.
+
+    Everything goes through the Engine, never a Pool instance, because
+    engine.dispose() replaces the pool: pool events registered on the Engine
+    carry over to the new pool, and raw_connection() is where every Connection
+    (sync or AsyncEngine.sync_engine) checks one out, pre-ping included.
+    """
+    from sqlalchemy import event
+
+    if not hasattr(engine.pool, "checkedout"):
+        return
+    raw_connection = engine.raw_connection
+
+    def timed_raw_connection():
+        pool = engine.pool
+        max_overflow = getattr(pool, "_max_overflow", 0)
+        exhausted = (
+            max_overflow >= 0 and pool.checkedin() == 0
+            and pool.checkedout() >= pool.size() + max_overflow
+        )
+        if exhausted:
+            DB_POOL_WAITS.inc(engine=name)
+        with DB_POOL_CHECKOUT.time(engine=name):
+            return raw_connection()
+
+    @event.listens_for(engine, "checkout")
+    def _checked_out(dbapi_connection, connection_record, connection_proxy):
+        connection_record.info["pricenest_checked_out_at"] = time.perf_counter()
+
+    @event.listens_for(engine, "checkin")
+    def _checked_in(dbapi_connection, connection_record):
+        checked_out_at = connection_record.info.pop("pricenest_checked_out_at", None)
+        if checked_out_at is not None:
+            DB_POOL_HOLD.observe(time.perf_counter() - checked_out_at, engine=name)
+
+    engine.raw_connection = timed_raw_connection
+    DB_POOL_CHECKED_OUT.set_function(lambda: engine.pool.checkedout(), engine=name)
+    DB_POOL_SIZE.set_function(lambda: engine.pool.size(), engine=name)
+
+
+def instrument_module(namespace, prefix, exclude=()):
+    """Wrap every public function defined in a module with STORAGE_CALL timing."""
+    for name, fn in list(namespace.items()):
+        if (name.startswith("_") or name in exclude or not inspect.isfunction(fn)
+                or fn.__module__ != namespace["__name__"]):
+            continue
+        namespace[name] = timed(STORAGE_CALL, function=f"{prefix}.{name}")(fn)
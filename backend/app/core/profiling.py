@@ -0,0 +1,299 @@
+"""
+Opt-in sampling profiler for individual API requests.
+
+ProfilingMiddleware profiles a request when it carries
+X-Profile-Token: <PROFILING_TOKEN>, or at random with PROFILING_SAMPLE_RATE.
+It is a plain ASGI middleware, so the endpoint runs in the asyncio task it
+sees. While at least one request is being profiled, a daemon thread wakes
+every PROFILING_INTERVAL_MS and records the stack of each profiled task:
+
+- running: the event loop thread's frames from the middleware down, so sync
+  code called from the endpoint (NumPy, extract_results, the ORM) shows up;
+- suspended: its chain of awaiting coroutines, ending in what it waits on
+  ("[await Future]" for network I/O, a worker thread or a lock).
+
+Tasks the request spawns (asyncio.wait_for on 3.11, gather) are attributed to
+it by a task factory chained onto the loop, and followed from the parent's
+await, so a scrape behind a timeout still shows up under the endpoint.
+
+Stacks are counted in the collapsed "a;b;c N" form that flamegraph.pl,
+inferno and speedscope read directly. Finished profiles go into a ring buffer
+of the last PROFILING_BUFFER_SIZE, per process, served by api/admin.py. With
+nothing being profiled there is no sampler thread and a request costs one
+header lookup.
+
+Sync endpoints run in the threadpool and are not sampled past the hand-off;
+their profile shows the time spent awaiting it.
+"""
+import asyncio
+import hmac
+import itertools
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime
+
+from .config import (
+    BASE_DIR, PROFILING_TOKEN, PROFILING_SAMPLE_RATE, PROFILING_INTERVAL_MS, PROFILING_BUFFER_SIZE
+)
+
+PROFILE_HEADER = "X-Profile-Token"
+MAX_SAMPLES = 20_000                      # per profile: 100 s at the default 5 ms
+_REPO_ROOT = str(BASE_DIR.parent) + os.sep
+
+# Paths never picked by random sampling (the profiler's own API and metrics scrapes)
+_UNSAMPLED_PREFIXES = ("/api/admin",)
+
+_labels = {}
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    label = _labels.get(code)
+    if label is None:
+        filename = code.co_filename
+        if filename.startswith(_REPO_ROOT):
+            filename = filename[len(_REPO_ROOT):]
+        elif "site-packages" in filename:
+            filename = filename.rsplit("site-packages" + os.sep, 1)[-1]
+        else:
+            filename = os.path.basename(filename)
+        name = getattr(code, "co_qualname", code.co_name)
+        label = _labels[code] = f"{name} ({filename}:{code.co_firstlineno})".replace(";", ",")
+    return label
+
+
+def valid_token(token) -> bool:
+    return bool(PROFILING_TOKEN) and token is not None and hmac.compare_digest(token, PROFILING_TOKEN)
+
+
+class Profile:
+    """Stack counts for one request and the asyncio tasks it spawned."""
+
+    def __init__(self, profile_id, method, path, task, root_frame):
+        self.id = profile_id
+        self.method = method
+        self.path = path
+        self.status = None
+        self.started_at = datetime.utcnow()
+        self.duration = None
+        self.samples = 0
+        self.stacks = Counter()
+        self._loop = task.get_loop()
+        self._root = task
+        self._root_frame = root_frame
+        self._parents = {}          # child task -> parent task, for tasks created by the request
+        self._thread_id = threading.get_ident()
+        self._start = time.perf_counter()
+
+    def add_task(self, task, parent):
+        self._parents[task] = parent
+
+    def owns(self, task) -> bool:
+        return task is self._root or task in self._parents
+
+    def release(self):
+        """Drop the references to tasks and frames once the request is over."""
+        self._root = self._root_frame = None
+        self._parents = {}
+
+    def sample(self, frames_by_thread):
+        if self.samples >= MAX_SAMPLES or self._root is None:
+            return
+        current = asyncio.current_task(self._loop)
+        path = self._task_path(current if self.owns(current) else None)
+
+        stack = []
+        for task in path[:-1]:
+            stack += self._awaiting_stack(task)
+        if path[-1] is current:
+            stack += self._running_stack(path[-1], frames_by_thread.get(self._thread_id)) or []
+        else:
+            stack += self._awaiting_stack(path[-1])
+        if stack:
+            self.stacks[tuple(stack)] += 1
+            self.samples += 1
+
+    def _task_path(self, leaf):
+        """Tasks from the root down to leaf, or down the newest live children if leaf is None."""
+        if leaf is not None:
+            path = [leaf]
+            while path[-1] is not self._root:
+                path.append(self._parents[path[-1]])
+            return path[::-1]
+        path = [self._root]
+        while True:
+            children = [t for t, parent in list(self._parents.items()) if parent is path[-1] and not t.done()]
+            if not children:
+                return path
+            path.append(children[-1])
+
+    def _start_frame(self, task):
+        return self._root_frame if task is self._root else getattr(task.get_coro(), "cr_frame", None)
+
+    def _running_stack(self, task, frame):
+        """Frames from the task's first coroutine (the middleware, for the root) to the leaf."""
+        start = self._start_frame(task)
+        frames = []
+        while frame is not None:
+            frames.append(frame)
+            if frame is start:
+                return [_frame_label(f) for f in reversed(frames)]
+            frame = frame.f_back
+        return None
+
+    def _awaiting_stack(self, task):
+        """A suspended task's await chain, ending in what it waits on."""
+        labels = []
+        start = self._start_frame(task)
+        started = start is None
+        awaitable = task.get_coro()
+        while awaitable is not None:
+            frame = getattr(awaitable, "cr_frame", None) or getattr(awaitable, "gi_frame", None)
+            if frame is None:
+                if started:
+                    labels.append(f"[await {type(awaitable).__name__}]")
+                break
+            started = started or frame is start
+            if started:
+                labels.append(_frame_label(frame))
+            awaitable = getattr(awaitable, "cr_await", None) or getattr(awaitable, "gi_yieldfrom", None)
+        return labels
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "status": self.status,
+            "started_at": self.started_at.isoformat(),
+            "duration_ms": round(self.duration * 1000, 1) if self.duration is not None else None,
+            "samples": self.samples
+        }
+
+    def collapsed(self) -> str:
+        """One "root;...;leaf count" line per distinct stack, most frequent first."""
+        root = f"{self.method} {self.path}"
+        return "\n".join(
+            f"{root};{';'.join(stack)} {count}" for stack, count in self.stacks.most_common()
+        ) + "\n"
+
+
+class Profiler:
+    """Samples the active profiles from one daemon thread and keeps the finished ones."""
+
+    def __init__(self, interval_ms=PROFILING_INTERVAL_MS, buffer_size=PROFILING_BUFFER_SIZE):
+        self.interval = max(interval_ms, 0.5) / 1000
+        self.profiles = deque(maxlen=max(1, buffer_size))
+        self._active = {}
+        self._task_profiles = {}     # task -> Profile, for every task of an active profile
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self, method, path, task, root_frame) -> Profile:
+        self._install_task_factory(task.get_loop())
+        profile = Profile(f"{os.getpid()}-{next(self._ids)}", method, path, task, root_frame)
+        with self._lock:
+            self._active[profile.id] = profile
+            self._task_profiles[task] = profile
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+                self._thread.start()
+        return profile
+
+    def finish(self, profile, status):
+        with self._lock:
+            self._active.pop(profile.id, None)
+            self._task_profiles = {t: p for t, p in self._task_profiles.items() if p is not profile}
+            profile.status = status
+            profile.duration = time.perf_counter() - profile._start
+            profile.release()
+            self.profiles.append(profile)
+
+    def get(self, profile_id):
+        return next((p for p in self.profiles if p.id == profile_id), None)
+
+    def _install_task_factory(self, loop):
+        """
+        Chain a task factory that attributes tasks created by a profiled task
+        (asyncio.wait_for, gather, to_thread wrappers) to its profile. For
+        unprofiled requests it costs one dict lookup per task.
+        """
+        previous = loop.get_task_factory()
+        if getattr(previous, "_request_profiler", None) is self:
+            return
+
+        def task_factory(loop, coro, **kwargs):
+            if previous is not None:
+                task = previous(loop, coro, **kwargs)
+            else:
+                task = asyncio.Task(coro, loop=loop, **kwargs)
+            if self._task_profiles:
+                parent = asyncio.current_task(loop)
+                profile = self._task_profiles.get(parent)
+                if profile is not None:
+                    with self._lock:
+                        profile.add_task(task, parent)
+                        self._task_profiles[task] = profile
+            return task
+
+        task_factory._request_profiler = self
+        loop.set_task_factory(task_factory)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._active:
+                    self._thread = None
+                    return
+                frames = sys._current_frames()
+                for profile in self._active.values():
+                    profile.sample(frames)
+                del frames
+            time.sleep(self.interval)
+
+
+profiler = Profiler()
+
+
+class ProfilingMiddleware:
+    """Profiles token-carrying or sampled requests and tags the response with X-Profile-Id."""
+
+    def __init__(self, app, sample_rate=PROFILING_SAMPLE_RATE):
+        self.app = app
+        self.sample_rate = sample_rate
+        self._header = PROFILE_HEADER.lower().encode()
+
+    def _wanted(self, scope) -> bool:
+        if PROFILING_TOKEN:
+            for name, value in scope["headers"]:
+                if name == self._header:
+                    return valid_token(value.decode("latin-1"))
+        return (
+            self.sample_rate > 0 and random.random() < self.sample_rate
+            and not scope["path"].startswith(_UNSAMPLED_PREFIXES)
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._wanted(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile = profiler.start(scope["method"], scope["path"], asyncio.current_task(), sys._getframe())
+        status = 500
+
+        async def send_with_profile_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", profile.id.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            profiler.finish(profile, status)
@@ -1,8 +1,11 @@
-import bcrypt
+# bcrypt is imported on first use (later calls are a sys.modules lookup), so
+# only the auth routes pay for loading it.
 
 def verify_password(plain_password, hashed_password):
+    import bcrypt
     return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
 
 def get_password_hash(password):
+    import bcrypt
     salt = bcrypt.gensalt()
     return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
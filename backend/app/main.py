@@ -1,8 +1,10 @@
 import os
 import sys
 import logging
+import time
+from contextlib import asynccontextmanager
 from pathlib import Path
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 
 # -----------------------
@@ -14,10 +16,20 @@ if str(current_dir) not in sys.path:
     sys.path.append(str(current_dir))
 
 try:
-    from .api import auth, products, alerts, wishlist, analytics, summary
+    from .api import auth, products, alerts, wishlist, analytics, summary, admin
+    from .core import metrics
+    from .core.profiling import ProfilingMiddleware
+    from .core import database
+    from .services.scraper import close_http_client
+    from .services import alert_index
 except (ImportError, ValueError):
     try:
-        from api import auth, products, alerts, wishlist, analytics, summary
+        from api import auth, products, alerts, wishlist, analytics, summary, admin
+        from core import metrics
+        from core.profiling import ProfilingMiddleware
+        from core import database
+        from services.scraper import close_http_client
+        from services import alert_index
     except ImportError as e:
         print(f"Import Error: {e}")
         # We will handle missing routers below to avoid crashing
@@ -32,9 +44,27 @@ logger = logging.getLogger("pricenest")
 # -----------------------
 # FastAPI App
 # -----------------------
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    try:
+        alert_index.start()
+    except NameError:
+        pass
+    yield
+    # Release pooled SerpAPI and asyncpg connections on shutdown
+    try:
+        alert_index.stop()
+        await close_http_client()
+        if database.async_engine is not None:
+            await database.async_engine.dispose()
+    except NameError:
+        pass
+
+
 app = FastAPI(
     title="PriceNest API",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 
@@ -50,6 +80,43 @@ app.add_middleware(
 )
 
 
+# -----------------------
+# Profiling (opt-in, see core/profiling.py)
+# -----------------------
+# Added before the metrics middleware so it sits inside it, in the same task as the endpoint.
+app.add_middleware(ProfilingMiddleware)
+
+
+# -----------------------
+# Metrics
+# -----------------------
+def _route_label(request: Request) -> str:
+    """Route template (/api/alerts/{alert_id}) rather than the raw path, so the series count stays bounded."""
+    route = request.scope.get("route")
+    if route is None:
+        return "unmatched"
+    # Newer FastAPI resolves included routers lazily and reports the route
+    # path without the include prefix.
+    if request.url.path.startswith(API_PREFIX) and not route.path.startswith(API_PREFIX):
+        return API_PREFIX + route.path
+    return route.path
+
+
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        metrics.HTTP_REQUEST.observe(
+            time.perf_counter() - start,
+            method=request.method, route=_route_label(request), status=status
+        )
+
+
 # -----------------------
 # Routes
 # -----------------------
@@ -63,6 +130,7 @@ try:
     app.include_router(wishlist.router, prefix=API_PREFIX)
     app.include_router(analytics.router, prefix=API_PREFIX)
     app.include_router(summary.router, prefix=API_PREFIX)
+    app.include_router(admin.router, prefix=API_PREFIX)
 except NameError:
     logger.error("One or more routers failed to import")
 
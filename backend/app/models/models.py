@@ -1,30 +1,80 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, ForeignKey
+from sqlalchemy import (
+    Column, Integer, String, Float, Date, DateTime, Boolean, ForeignKey, Index, JSON, PrimaryKeyConstraint,
+    UniqueConstraint
+)
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from ..core.database import Base
 
 
 # -----------------------------
-# PRODUCT
+# LISTINGS (one row per store link seen for a query)
 # -----------------------------
-class Product(Base):
-    __tablename__ = "products"
+class Listing(Base):
+    __tablename__ = "listings"
+    __table_args__ = (
+        UniqueConstraint("query", "source", "link", name="uq_listings_query_source_link"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    query = Column(String, index=True)
+    query = Column(String, nullable=False, index=True)
+    source = Column(String, nullable=False)
+    link = Column(String, nullable=False)
     title = Column(String)
-    source = Column(String)
-    link = Column(String, unique=False)
     image = Column(String, nullable=True)
     store_logo = Column(String, nullable=True)
-    price = Column(Float)
-    created_at = Column(DateTime, default=datetime.utcnow)
+
+# -----------------------------
+# PRICE OBSERVATIONS (one narrow row per listing per scrape — the price history)
+# -----------------------------
+class PriceObservation(Base):
+    __tablename__ = "price_observations"
+    __table_args__ = (
+        # Covering primary key so history scans never touch the heap
+        PrimaryKeyConstraint("listing_id", "created_at", name="price_observations_pkey", postgresql_include=["price"]),
+    )
+
+    listing_id = Column(Integer, ForeignKey("listings.id", ondelete="CASCADE"), nullable=False)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    price = Column(Float, nullable=False)
+
+    listing = relationship("Listing")
+
+# -----------------------------
+# PRICE ROLLUPS (one row per query/store/day, maintained at ingest)
+# -----------------------------
+class PriceRollup(Base):
+    __tablename__ = "price_rollups"
+
+    query = Column(String, primary_key=True)
+    store = Column(String, primary_key=True)
+    day = Column(Date, primary_key=True)
+    count = Column(Integer, nullable=False)
+    price_sum = Column(Float, nullable=False)
+    price_sum_sq = Column(Float, nullable=False)
+    min_price = Column(Float, nullable=False)
+    max_price = Column(Float, nullable=False)
+    latest_price = Column(Float, nullable=False)
+    latest_at = Column(DateTime, nullable=False)
+
+# -----------------------------
+# QUERY VERSIONS (bumped by every stored scrape; keys the analytics cache)
+# -----------------------------
+class QueryVersion(Base):
+    __tablename__ = "query_versions"
+
+    query = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False)
+    updated_at = Column(DateTime, nullable=False)
 
 # -----------------------------
 # ALERTS
 # -----------------------------
 class Alert(Base):
     __tablename__ = "alerts"
+    __table_args__ = (
+        Index("ix_alerts_active_query", "is_active", "query"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     email = Column(String, index=True)
@@ -52,9 +102,47 @@ class User(Base):
 # -----------------------------
 class Wishlist(Base):
     __tablename__ = "wishlist"
+    __table_args__ = (
+        UniqueConstraint("email", "product_id", name="uq_wishlist_email_product"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     email = Column(String, index=True)
-    product_id = Column(Integer, ForeignKey("products.id"))
+    product_id = Column(Integer, ForeignKey("listings.id", ondelete="CASCADE"))
+    added_price = Column(Float, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    listing = relationship("Listing")
+
+# -----------------------------
+# AI SUMMARIES (validated ProductSummary JSON per normalized query)
+# -----------------------------
+class ProductSummaryCache(Base):
+    __tablename__ = "product_summaries"
+
+    query = Column(String, primary_key=True)
+    data = Column(JSON, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+# -----------------------------
+# SCRAPE JOBS (per-query tasks of a scheduler run, claimed by workers)
+# -----------------------------
+class ScrapeJob(Base):
+    __tablename__ = "scrape_jobs"
+    __table_args__ = (
+        UniqueConstraint("run_id", "query", name="uq_scrape_jobs_run_query"),
+        Index("ix_scrape_jobs_claim", "run_id", "status", "priority"),
+    )
 
-    product = relationship("Product")
\ No newline at end of file
+    id = Column(Integer, primary_key=True)
+    run_id = Column(String, nullable=False)
+    query = Column(String, nullable=False)
+    priority = Column(Float, nullable=False, default=0)
+    status = Column(String, nullable=False, default="pending")    # pending | running | done | failed
+    attempts = Column(Integer, nullable=False, default=0)
+    worker_id = Column(String, nullable=True)
+    leased_until = Column(DateTime, nullable=True)
+    lowest_price = Column(Float, nullable=True)                   # checkpoint of a finished scrape
+    last_error = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    finished_at = Column(DateTime, nullable=True)
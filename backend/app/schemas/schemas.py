@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import List, Optional
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
 
 class CompareResponse(BaseModel):
     query: str
@@ -41,3 +41,8 @@ class UserProfileUpdate(BaseModel):
 
 class SummaryRequest(BaseModel):
     query: str
+
+class AnalyticsBatchRequest(BaseModel):
+    queries: List[str] = Field(..., min_length=1)
+    resolution: Literal["raw", "day", "week"] = "day"
+    max_points: int = Field(500, ge=10, le=5000)
@@ -0,0 +1,170 @@
+"""
+Real-time alert triggering from fresh scrapes.
+
+AlertIndex keeps every active alert in memory as, per query, a list of
+(target_price, alert_id) sorted by target. A batch ingested by
+storage.upsert_product (from /compare, create_alert or the scheduler) is
+checked with one bisect: the alerts at or after bisect_left(price) are the ones
+whose target the new lowest price meets. Only then is the database touched:
+storage.mark_triggered_alerts applies the "price changed" rule and marks them,
+and the emails go out on a long-lived Mailer, all on a background thread so
+the request that brought the price in never waits.
+
+Opt-in with REALTIME_ALERTS_ENABLED; start()/stop() are called from the app
+lifespan. The index is rebuilt from the database every REALTIME_ALERTS_RELOAD
+seconds to pick up alerts changed by other workers; changes made through this
+worker's /alerts routes are applied immediately.
+"""
+import threading
+from bisect import bisect_left, insort
+from concurrent.futures import ThreadPoolExecutor
+
+from . import storage
+from .mailer import Mailer
+from .notifications import send_alert_emails
+from ..core.config import REALTIME_ALERTS_ENABLED, REALTIME_ALERTS_RELOAD
+
+
+class AlertIndex:
+    """Active alerts per query, sorted by target price for bisect lookups."""
+
+    def __init__(self):
+        self._targets = {}      # query -> [(target_price, alert_id)] sorted
+        self._queries = {}      # alert_id -> query, for removal
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._queries)
+
+    def load(self, groups):
+        """Replace the index with (query, [alert dicts]) groups (storage.iter_active_alerts_by_query)."""
+        targets = {}
+        queries = {}
+        for query, alerts in groups:
+            entries = sorted((float(a["target_price"]), a["id"]) for a in alerts)
+            targets[query] = entries
+            queries.update((alert_id, query) for _, alert_id in entries)
+        with self._lock:
+            self._targets = targets
+            self._queries = queries
+
+    def add(self, alert):
+        """Index an active alert dict (storage.add_alert / update_alert_status output)."""
+        self.remove(alert["id"])
+        query = storage.normalize_query(alert["query"])
+        with self._lock:
+            insort(self._targets.setdefault(query, []), (float(alert["target_price"]), alert["id"]))
+            self._queries[alert["id"]] = query
+
+    def remove(self, alert_id):
+        with self._lock:
+            query = self._queries.pop(alert_id, None)
+            if query is None:
+                return
+            entries = [e for e in self._targets[query] if e[1] != alert_id]
+            if entries:
+                self._targets[query] = entries
+            else:
+                del self._targets[query]
+
+    def triggered(self, query, price):
+        """Ids of the active alerts on query whose target is met by price."""
+        with self._lock:
+            entries = self._targets.get(query)
+            if not entries:
+                return []
+            start = bisect_left(entries, (price, float("-inf")))
+            return [alert_id for _, alert_id in entries[start:]]
+
+
+class AlertDispatcher:
+    """Listens to storage ingests and notifies triggered alerts off the request path."""
+
+    def __init__(self, index: AlertIndex, reload_interval: float = REALTIME_ALERTS_RELOAD):
+        self.index = index
+        self.reload_interval = reload_interval
+        self._executor = None
+        self._mailer = None
+        self._stop = threading.Event()
+        self._reloader = None
+
+    def start(self):
+        if self._executor is not None:
+            return
+        self._stop.clear()
+        # One worker: dispatches for the same query are serialized, and
+        # mark_triggered_alerts stops a price from being sent twice anyway.
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="alert-dispatch")
+        self._mailer = Mailer(pool_size=1)
+        self._reloader = threading.Thread(target=self._reload_loop, name="alert-index-reload", daemon=True)
+        self._reloader.start()
+        storage.add_ingest_listener(self.on_ingest)
+
+    def stop(self):
+        if self._executor is None:
+            return
+        storage.remove_ingest_listener(self.on_ingest)
+        self._stop.set()
+        self._executor.shutdown(wait=True)
+        self._mailer.close()
+        self._executor = None
+        self._mailer = None
+
+    def reload(self):
+        try:
+            self.index.load(storage.iter_active_alerts_by_query())
+            print(f"[ALERT INDEX] Loaded {len(self.index)} active alerts")
+        except Exception as e:
+            print(f"⚠️ [ALERT INDEX] Reload failed: {e}")
+
+    def _reload_loop(self):
+        self.reload()
+        while not self._stop.wait(self.reload_interval):
+            self.reload()
+
+    def on_ingest(self, query, results):
+        """Ingest listener: O(log n) check here, database and SMTP work on the dispatch thread."""
+        if not results or self._executor is None:
+            return
+        best_product = min(results, key=lambda r: r["price_numeric"])
+        if self.index.triggered(query, best_product["price_numeric"]):
+            self._executor.submit(self._dispatch, query, best_product)
+
+    def _dispatch(self, query, best_product):
+        try:
+            triggered = storage.mark_triggered_alerts({query: best_product["price_numeric"]})
+        except Exception as e:
+            print(f"[ERROR] Real-time alert evaluation failed for {query}: {e}")
+            return
+        if triggered:
+            print(f"[ALERT INDEX] {len(triggered)} alerts triggered by a fresh scrape of {query}")
+            send_alert_emails(self._mailer, triggered, {query: best_product})
+
+
+index = AlertIndex()
+dispatcher = AlertDispatcher(index)
+
+
+# Hooks for the app and the /alerts routes; no-ops unless real-time alerts are enabled.
+def start():
+    if REALTIME_ALERTS_ENABLED:
+        dispatcher.start()
+
+
+def stop():
+    dispatcher.stop()
+
+
+def alert_changed(alert):
+    """Keep this worker's index in step with an alert created or updated through the API."""
+    if not REALTIME_ALERTS_ENABLED:
+        return
+    if alert.get("is_active"):
+        index.add(alert)
+    else:
+        index.remove(alert["id"])
+
+
+def alert_deleted(alert_id):
+    if REALTIME_ALERTS_ENABLED:
+        index.remove(alert_id)
@@ -1,65 +1,374 @@
-import pandas as pd
+import asyncio
+import math
 import logging
-from datetime import timedelta
+import threading
+from collections import OrderedDict
+from typing import Optional
 
-from . import storage
+from . import storage, storage_async
+from ..core.config import ANALYTICS_CACHE_POINTS
 
 logger = logging.getLogger("pricenest")
 
+# The engine is columnar: rows come from storage as plain tuples and are
+# transposed straight into NumPy arrays, with stores as integer codes into a
+# sorted array of names. NumPy is imported on first use to keep it off the
+# cold-start path of routes that never run analytics.
+
 
 # ---------------------------------------------------------
-# Fetch Products from PostgreSQL and reshape for analytics
+# Fetch rows from PostgreSQL into columns
 # ---------------------------------------------------------
-def fetch_price_history(query: str) -> pd.DataFrame:
+def _store_codes(stores):
+    """(sorted unique names, code per row) for a sequence of store names."""
+    import numpy as np
+
+    names, codes = np.unique(np.array(stores, dtype=object), return_inverse=True)
+    return names, codes
+
+
+def _rollup_columns(rows):
+    """storage.get_rollup_rows output (ROLLUP_COLUMNS tuples) as a dict of arrays."""
+    import numpy as np
+
+    store, day, count, price_sum, price_sum_sq, min_price, max_price, latest_price, latest_at = zip(*rows)
+    names, codes = _store_codes(store)
+    return {
+        "stores": names,
+        "store": codes,
+        "day": np.array(day, dtype="datetime64[D]"),
+        "count": np.array(count, dtype=np.int64),
+        "price_sum": np.array(price_sum, dtype=np.float64),
+        "price_sum_sq": np.array(price_sum_sq, dtype=np.float64),
+        "min_price": np.array(min_price, dtype=np.float64),
+        "max_price": np.array(max_price, dtype=np.float64),
+        "latest_price": np.array(latest_price, dtype=np.float64),
+        "latest_at": np.array(latest_at, dtype="datetime64[us]")
+    }
+
+
+def _history_trend(rows):
+    """storage.get_history_rows output as a time-sorted (timestamps, store codes, prices, names) trend."""
+    import numpy as np
+
+    if not rows:
+        return _empty_trend()
+    created_at, store, price = zip(*rows)
+    timestamps = np.array(created_at, dtype="datetime64[us]")
+    names, codes = _store_codes(store)
+    order = np.argsort(timestamps, kind="stable")
+    return timestamps[order], codes[order], np.array(price, dtype=np.float64)[order], names
+
+
+def _empty_trend():
+    import numpy as np
+
+    return np.array([], dtype="datetime64[us]"), np.array([], dtype=np.intp), np.array([]), np.array([], dtype=object)
+
+
+async def fetch_price_history_async(query: str):
     try:
-        rows = storage.get_products(query)
-        if not rows:
-            return pd.DataFrame()
-
-        df = pd.DataFrame(rows)
-        # Map products columns to the shape analytics expects
-        df["timestamp"] = pd.to_datetime(df["created_at"])
-        df["store"] = df["source"]
-        df["price"] = df["price_numeric"]
-        return df[["timestamp", "store", "price"]]
+        rows = await storage_async.get_history_rows(query)
     except Exception as e:
         logger.error(f"Error fetching products for analytics ({query}): {e}")
-        return pd.DataFrame()
+        rows = []
+    return rows
+
+
+def _sequential_sum(values) -> float:
+    """Left-to-right total, like sum(): NumPy's pairwise .sum() can differ in the last bits."""
+    import numpy as np
+
+    return float(np.cumsum(values)[-1])
+
+
+# ---------------------------------------------------------
+# Price trend: resolution + downsampling
+# ---------------------------------------------------------
+DEFAULT_TREND_POINTS = 500
+
+
+def _rollup_trend(rollups, resolution: str):
+    """One point per store per day/week, priced at the bucket's average, ordered by (day, store)."""
+    import numpy as np
+
+    days = rollups["day"]
+    if resolution == "week":
+        # 1970-01-01 was a Thursday: (days + 3) % 7 is the Monday-based weekday
+        days = days - (days.astype(np.int64) + 3) % 7
+
+    n_stores = len(rollups["stores"])
+    keys, bucket = np.unique(days.astype(np.int64) * n_stores + rollups["store"], return_inverse=True)
+    price_sums = np.bincount(bucket, weights=rollups["price_sum"])
+    counts = np.bincount(bucket, weights=rollups["count"])
+    timestamps = (keys // n_stores).astype("datetime64[D]").astype("datetime64[us]")
+    return timestamps, keys % n_stores, price_sums / counts, rollups["stores"]
+
+
+def _lttb(xs, ys, threshold: int):
+    """
+    Largest-Triangle-Three-Buckets: indices of `threshold` points of a time-sorted
+    series, always the first and last, choosing the rest to preserve the visual shape.
+    """
+    import numpy as np
+
+    n = len(xs)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    bucket_size = (n - 2) / (threshold - 2)
+    picked = np.empty(threshold, dtype=np.intp)
+    picked[0], picked[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+        next_end = min(int((i + 2) * bucket_size) + 1, n)
+
+        avg_x = xs[end:next_end].mean()
+        avg_y = ys[end:next_end].mean()
+
+        areas = np.abs((xs[a] - avg_x) * (ys[start:end] - ys[a]) - (xs[a] - xs[start:end]) * (avg_y - ys[a]))
+        a = start + int(np.argmax(areas))
+        picked[i + 1] = a
+    return picked
+
+
+def downsample_trend(trend, max_points: int):
+    """
+    Cap a trend at max_points by running LTTB on each store's series, with the
+    budget split evenly across stores. LTTB needs 3 points per series, so when
+    there are more than max_points // 3 stores only the largest series are kept.
+    """
+    import numpy as np
+
+    timestamps, codes, prices, names = trend
+    if len(timestamps) <= max_points:
+        return trend
+
+    # Stores in order of first appearance, then a stable sort by time, as the
+    # per-point engine did
+    present, first_seen, sizes = np.unique(codes, return_index=True, return_counts=True)
+    keep = max(1, min(len(present), max_points // 3))
+    if keep < len(present):
+        # Largest series first, earlier stores winning ties
+        largest = np.lexsort((first_seen, -sizes))[:keep]
+        present, first_seen = present[largest], first_seen[largest]
+    per_store = max_points // keep
+    xs = timestamps.astype(np.int64) / 1e6
+
+    picked = []
+    for code in present[np.argsort(first_seen)]:
+        series = np.flatnonzero(codes == code)
+        if per_store >= 3:
+            picked.append(series[_lttb(xs[series], prices[series], per_store)])
+        else:
+            picked.append(series[:per_store])    # max_points < 3: no shape left to preserve
+    picked = np.concatenate(picked)
+    picked = picked[np.argsort(timestamps[picked], kind="stable")]
+    return timestamps[picked], codes[picked], prices[picked], names
+
+
+def _trend_points(trend):
+    timestamps, codes, prices, names = trend
+    return [
+        {"timestamp": timestamp, "store": store, "price": price}
+        for timestamp, store, price in zip(timestamps.tolist(), names[codes].tolist(), prices.tolist())
+    ]
 
 
 # ---------------------------------------------------------
 # Main Analytics Engine
 # ---------------------------------------------------------
-def analyze_price(query: str):
-    df = fetch_price_history(query)
+# Answers from the per (query, store, day) rollups maintained by
+# storage.upsert_product, so cost tracks stores x days, not raw rows.
+# "Current price" = lowest price from the most recent scrape batch.
+# We define the latest scrape batch as all rows within
+# storage.CURRENT_BATCH_WINDOW (10 minutes) of the most recent timestamp in
+# the DB for this query, as the wishlist does.
+# This ensures we compare against what the user just scraped,
+# not a stale per-store value from days ago.
+
+
+def _current_cutoff(rollups):
+    """Start of the latest scrape batch, or None when there is no history to compare against."""
+    if rollups["count"].sum() < 2:
+        return None
+    return rollups["latest_at"].max().item() - storage.CURRENT_BATCH_WINDOW
+
+
+# ---------------------------------------------------------
+# Result cache
+# ---------------------------------------------------------
+# A result only changes when a scrape of its query is stored, and every stored
+# scrape bumps the query's data version (storage.get_data_version). Callers
+# that pass the version they read get results cached per process under
+# (query, version, resolution, max_points); a newer version simply misses and
+# the stale entries age out of the LRU. Error results are not cached.
+#
+# The LRU is bounded by the trend points it holds, not by entries: a raw
+# result at max_points=5000 is ~1.3 MB, and max_points is the client's choice,
+# so varying it can only churn the cache, never grow it past the budget.
+_RESULT_OVERHEAD = 20      # summary, store prices etc., in trend-point equivalents
+_results = OrderedDict()   # key -> (result, cost)
+_results_cost = 0
+_results_lock = threading.Lock()
+
+
+def _cache_get(key):
+    with _results_lock:
+        entry = _results.get(key)
+        if entry is None:
+            return None
+        _results.move_to_end(key)
+        return entry[0]
+
+
+def _cache_put(key, result):
+    global _results_cost
+    if "error" in result:
+        return
+    cost = len(result["price_trend"]) + _RESULT_OVERHEAD
+    if cost > ANALYTICS_CACHE_POINTS:
+        return
+    with _results_lock:
+        previous = _results.pop(key, None)
+        if previous is not None:
+            _results_cost -= previous[1]
+        _results[key] = (result, cost)
+        _results_cost += cost
+        while _results_cost > ANALYTICS_CACHE_POINTS:
+            _, (_, evicted) = _results.popitem(last=False)
+            _results_cost -= evicted
+
+
+def _cache_key(query, version, resolution, max_points):
+    if not version:
+        return None
+    return storage.normalize_query(query), version, resolution, max_points
+
+
+async def analyze_price_async(query: str, resolution: str = "day", max_points: int = DEFAULT_TREND_POINTS,
+                              version: Optional[int] = None):
+    """
+    Analytics for one query, or {"error": ...} when it has no data. Callers that
+    pass the query's data version get the result cached (see above).
+    """
+    key = _cache_key(query, version, resolution, max_points)
+    cached = _cache_get(key) if key else None
+    if cached is not None:
+        return cached
+    result = await _analyze_price_async(query, resolution, max_points)
+    if key:
+        _cache_put(key, result)
+    return result
 
-    if df.empty:
+
+async def _analyze_price_async(query, resolution, max_points):
+    rows = await storage_async.get_rollup_rows(query)
+
+    if not rows:
         return {"error": "No price data available yet"}
 
-    df = df.sort_values("timestamp")
+    rollups = _rollup_columns(rows)
+
+    cutoff = _current_cutoff(rollups)
+    current_lowest = await storage_async.get_lowest_price_since(query, cutoff) if cutoff else None
+    if resolution == "raw":
+        # Raw history can be large; keep the array work and LTTB off the event loop
+        history = await fetch_price_history_async(query)
+        return await asyncio.to_thread(_build_analytics, rollups, current_lowest, history, resolution, max_points)
+    return _build_analytics(rollups, current_lowest, None, resolution, max_points)
+
+
+# ---------------------------------------------------------
+# Batch analytics (wishlist / alerts pages)
+# ---------------------------------------------------------
+# A fixed number of statements for any number of queries: all rollups, then
+# the current lowest price of every query with history, then (raw resolution
+# only) all observations. Each query's result or error is keyed by the query
+# as given.
+MAX_BATCH_QUERIES = 100
+
+
+async def analyze_prices_async(queries, resolution: str = "day", max_points: int = DEFAULT_TREND_POINTS):
+    normalized = {q: storage.normalize_query(q) for q in queries}
+    rows_by_query = await storage_async.get_rollup_rows_by_query(set(normalized.values()))
 
-    lowest_price = int(df["price"].min())
-    highest_price = int(df["price"].max())
-    avg_price = int(df["price"].mean())
+    rollups_by_query = {}
+    cutoffs = {}
+    for query, rows in rows_by_query.items():
+        rollups = rollups_by_query[query] = _rollup_columns(rows)
+        cutoff = _current_cutoff(rollups)
+        if cutoff:
+            cutoffs[query] = cutoff
 
-    cheapest_store = df.loc[df["price"].idxmin()]["store"]
+    lowest_by_query = await storage_async.get_lowest_prices_since(cutoffs)
+    if resolution == "raw":
+        history_by_query = await storage_async.get_history_rows_by_query(list(rollups_by_query))
+        return await asyncio.to_thread(
+            _batch_analytics, normalized, rollups_by_query, lowest_by_query, history_by_query, resolution, max_points
+        )
+    return _batch_analytics(normalized, rollups_by_query, lowest_by_query, None, resolution, max_points)
 
-    latest_prices = (
-        df.sort_values("timestamp")
-        .groupby("store")
-        .last()
-        .reset_index()
-    )
 
+def _batch_analytics(normalized, rollups_by_query, lowest_by_query, history_by_query, resolution, max_points):
+    results = {}
+    for query, key in normalized.items():
+        rollups = rollups_by_query.get(key)
+        if rollups is None:
+            results[query] = {"error": "No price data available yet"}
+            continue
+        history = history_by_query.get(key, []) if history_by_query is not None else None
+        try:
+            results[query] = _build_analytics(rollups, lowest_by_query.get(key), history, resolution, max_points)
+        except Exception as e:
+            logger.error(f"Batch analytics failed for {query}: {e}")
+            results[query] = {"error": "Analytics failed for this product"}
+    return results
+
+
+def _build_analytics(rollups, current_lowest, history, resolution, max_points):
+    import numpy as np
+
+    count = int(rollups["count"].sum())
+    price_sum = _sequential_sum(rollups["price_sum"])
+    price_sum_sq = _sequential_sum(rollups["price_sum_sq"])
+    min_price = rollups["min_price"].min()
+
+    lowest_price = int(min_price)
+    highest_price = int(rollups["max_price"].max())
+    avg_price = int(price_sum / count)
+
+    # Rollups come ordered by day, so this is the first store to hit the low
+    stores = rollups["stores"]
+    cheapest_store = stores[rollups["store"][np.argmax(rollups["min_price"] == min_price)]]
+
+    # Each store's latest price: the last row per store once sorted by
+    # (store, latest_at, row order), so later rows win ties
+    codes = rollups["store"]
+    order = np.lexsort((np.arange(len(codes)), rollups["latest_at"], codes))
+    last = order[np.append(codes[order][1:] != codes[order][:-1], True)]
     store_prices = {
-        row["store"]: int(row["price"])
-        for _, row in latest_prices.iterrows()
+        store: int(price)
+        for store, price in zip(stores[codes[last]].tolist(), rollups["latest_price"][last].tolist())
     }
 
-    price_trend = df.to_dict(orient="records")
+    # Raw observations are only read when explicitly asked for; day/week
+    # buckets come straight from the rollups. Either way the series is
+    # capped at max_points so the payload stays bounded.
+    if resolution == "raw":
+        trend = _history_trend(history)
+    else:
+        trend = _rollup_trend(rollups, resolution)
+    price_trend = _trend_points(downsample_trend(trend, max_points))
 
-    # Volatility logic based on overall variance
-    volatility_score = round(df["price"].std(), 2) if len(df) > 1 else 0
+    # Volatility logic based on overall variance (sample std from the running sums)
+    if count > 1:
+        variance = max(price_sum_sq - price_sum * price_sum / count, 0.0) / (count - 1)
+        volatility_score = round(math.sqrt(variance), 2)
+    else:
+        volatility_score = 0
     if volatility_score < 500:
         stability = "🟢 Stable"
     elif volatility_score < 1500:
@@ -68,24 +377,18 @@ def analyze_price(query: str):
         stability = "🔴 Highly Volatile"
 
     # --- Best Time-to-Buy Logic ---
-    # "Current price" = lowest price from the most recent scrape batch.
-    # We define the latest scrape batch as all rows within 10 minutes
-    # of the most recent timestamp in the DB for this query.
-    # This ensures we compare against what the user just scraped,
-    # not a stale per-store value from days ago.
+    # current_lowest is the best price in the latest scrape batch (see storage.CURRENT_BATCH_WINDOW);
+    # None when the rollups outlive their observations (e.g. a deleted listing)
     insight = "Not enough data yet — search again later to track price movement."
 
-    if len(df) > 1:
-        latest_timestamp = df["timestamp"].max()
-        cutoff = latest_timestamp - timedelta(minutes=10)
-        current_scrape_df = df[df["timestamp"] >= cutoff]
-        current_lowest = int(current_scrape_df["price"].min())
+    if count > 1 and current_lowest is not None:
+        current_lowest = int(current_lowest)
 
         diff = current_lowest - avg_price
         pct = round((diff / avg_price) * 100, 1)
 
         if current_lowest <= lowest_price:
-            insight = f"This is the lowest price ever recorded! Great time to buy."
+            insight = "This is the lowest price ever recorded! Great time to buy."
         elif diff < 0:
             insight = f"Current best price (₹{current_lowest:,}) is {abs(pct)}% below the historical average. Good time to buy."
         elif diff == 0:
@@ -99,7 +402,7 @@ def analyze_price(query: str):
             "highest_price": highest_price,
             "average_price": avg_price,
             "price_range": f"₹{lowest_price} – ₹{highest_price}",
-            "cheapest_store": cheapest_store
+            "cheapest_store": str(cheapest_store)
         },
         "store_prices": store_prices,
         "price_trend": price_trend,
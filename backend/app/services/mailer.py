@@ -0,0 +1,209 @@
+import queue
+import smtplib
+import threading
+import time
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+from ..core import metrics
+from ..core.config import (
+    EMAIL_USER, EMAIL_PASS,
+    SMTP_SERVER, SMTP_PORT, SMTP_STARTTLS, SMTP_ALLOW_NO_AUTH, SMTP_POOL_SIZE
+)
+
+# Errors that mean the connection is unusable; the message is retried on a fresh one.
+# Any other SMTPException is a rejection of the message itself.
+_CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError)
+
+_STOP = object()
+
+
+class Mailer:
+    """
+    Sends queued messages over a small pool of authenticated SMTP connections.
+
+    Each worker thread owns one connection, opened on its first message and kept
+    open until close(), so a batch of alerts pays for STARTTLS + login once per
+    worker instead of once per email. Without credentials messages are dropped
+    (and counted as skipped) unless allow_no_auth is set, for a local sink.
+
+        with Mailer() as mailer:
+            mailer.send(mailer.compose(to, subject, text, html))
+    """
+
+    def __init__(self, host=SMTP_SERVER, port=SMTP_PORT, username=EMAIL_USER, password=EMAIL_PASS,
+                 starttls=SMTP_STARTTLS, pool_size=SMTP_POOL_SIZE, max_retries=2, timeout=30,
+                 allow_no_auth=SMTP_ALLOW_NO_AUTH):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.pool_size = max(1, pool_size)
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.sender = username or "pricenest@localhost"
+        self.enabled = bool(username and password) or allow_no_auth
+
+        self._queue = queue.Queue()
+        self._workers = []
+        self._lock = threading.Lock()
+        self._started_at = None
+        self._finished_at = None
+        self.sent = 0
+        self.failed = 0
+        self.reconnects = 0
+        self.skipped = 0
+
+    # -----------------------------
+    # Public API
+    # -----------------------------
+    def compose(self, receiver_email, subject, body_text, body_html=None):
+        msg = MIMEMultipart("alternative")
+        msg["Subject"] = subject
+        msg["From"] = f"PriceNest <{self.sender}>"
+        msg["To"] = receiver_email
+
+        msg.attach(MIMEText(body_text, "plain"))
+        if body_html:
+            msg.attach(MIMEText(body_html, "html"))
+        return msg
+
+    def send(self, msg):
+        """Queue a message; it is delivered by the next free worker."""
+        if not self.enabled:
+            with self._lock:
+                self.skipped += 1
+                first = self.skipped == 1
+            if first:
+                print("❌ Email credentials not set in environment variables, not sending emails.")
+            return
+        self.start()
+        self._queue.put(msg)
+
+    def start(self):
+        with self._lock:
+            if self._workers or not self.enabled:
+                return
+            self._started_at = time.monotonic()
+            for i in range(self.pool_size):
+                worker = threading.Thread(target=self._run, name=f"mailer-{i}", daemon=True)
+                worker.start()
+                self._workers.append(worker)
+
+    def close(self):
+        """Drain the queue, close every connection and print throughput."""
+        if not self._workers:
+            return self.stats()
+        for _ in self._workers:
+            self._queue.put(_STOP)
+        for worker in self._workers:
+            worker.join()
+        self._workers = []
+        self._finished_at = time.monotonic()
+
+        stats = self.stats()
+        print(f"[MAILER] sent={stats['sent']} failed={stats['failed']} reconnects={stats['reconnects']} "
+              f"in {stats['elapsed']:.1f}s ({stats['per_second']:.1f} msg/s)")
+        return stats
+
+    def stats(self):
+        if self._started_at is None:
+            elapsed = 0.0
+        else:
+            elapsed = (self._finished_at or time.monotonic()) - self._started_at
+        return {
+            "sent": self.sent,
+            "failed": self.failed,
+            "reconnects": self.reconnects,
+            "skipped": self.skipped,
+            "queued": self._queue.qsize(),
+            "elapsed": elapsed,
+            "per_second": self.sent / elapsed if elapsed > 0 else 0.0
+        }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # -----------------------------
+    # Workers
+    # -----------------------------
+    def _connect(self):
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.starttls:
+                server.starttls()
+            if self.username and self.password:
+                server.login(self.username, self.password)
+        except Exception:
+            server.close()
+            raise
+        return server
+
+    @staticmethod
+    def _disconnect(server):
+        try:
+            server.quit()
+        except Exception:
+            server.close()
+
+    def _deliver(self, server, msg):
+        """Send one message, reconnecting on connection errors. Returns the live connection."""
+        error = None
+        for attempt in range(self.max_retries + 1):
+            try:
+                if server is None:
+                    server = self._connect()
+                    if attempt:
+                        with self._lock:
+                            self.reconnects += 1
+                with metrics.SMTP_SEND.time():
+                    server.send_message(msg)
+                with self._lock:
+                    self.sent += 1
+                print(f"[EMAIL SENT] to {msg['To']}")
+                return server
+            except smtplib.SMTPException as e:
+                error = e
+                if not isinstance(e, _CONNECTION_ERRORS):
+                    break
+            except OSError as e:
+                # Socket-level failure (timeout, reset); SMTPException is an OSError
+                # too, so this only sees errors smtplib did not wrap.
+                error = e
+
+            if server is not None:
+                self._disconnect(server)
+                server = None
+            if attempt < self.max_retries:
+                time.sleep(0.5 * (attempt + 1))
+
+        with self._lock:
+            self.failed += 1
+        print(f"[EMAIL ERROR] to {msg['To']}: {error}")
+        return server
+
+    def _run(self):
+        server = None
+        try:
+            while True:
+                msg = self._queue.get()
+                if msg is _STOP:
+                    break
+                try:
+                    server = self._deliver(server, msg)
+                except Exception as e:
+                    # A bad message (e.g. unencodable headers) must not kill the
+                    # worker; its connection is in an unknown state, so drop it.
+                    with self._lock:
+                        self.failed += 1
+                    print(f"[EMAIL ERROR] to {msg['To']}: {e!r}")
+                    if server is not None:
+                        self._disconnect(server)
+                        server = None
+        finally:
+            if server is not None:
+                self._disconnect(server)
@@ -0,0 +1,68 @@
+"""
+Price alert emails, shared by the scheduler and the real-time alert dispatcher.
+"""
+
+
+def alert_email(query, current_lowest, target_price, best_product):
+    """(subject, body_text, body_html) for a triggered alert."""
+    subject = f"Price Alert: {query} is now ₹{int(current_lowest):,}"
+
+    body_text = (
+        f"Price Alert from PriceNest\n\n"
+        f"The price for '{query}' has dropped to ₹{int(current_lowest):,}.\n"
+        f"Target Price: ₹{int(target_price):,}\n"
+        f"Current Store: {best_product['source']}\n"
+        f"View Deal: {best_product['link']}\n\n"
+        f"Thank you for choosing PriceNest."
+    )
+
+    # Minimal Website-Inspired HTML Template
+    # Using website colors: Primary #667eea, Background #0a0e27, Success #10b981
+    body_html = f"""
+    <div style="font-family: 'Inter', -apple-system, sans-serif; max-width: 550px; margin: auto; background-color: #0a0e27; color: #ffffff; border-radius: 16px; overflow: hidden; border: 1px solid rgba(255,255,255,0.1);">
+        <div style="padding: 30px; text-align: left;">
+            <h1 style="margin: 0; font-size: 20px; font-weight: 700; color: #667eea;">PriceNest</h1>
+
+            <div style="margin-top: 30px;">
+                <p style="font-size: 14px; color: #b8c1ec; margin-bottom: 8px; text-transform: uppercase; letter-spacing: 1px;">Price Update</p>
+                <h2 style="margin: 0; font-size: 24px; font-weight: 600; line-height: 1.3;">{query}</h2>
+
+                <div style="margin-top: 24px; padding: 20px; background: rgba(255,255,255,0.03); border-radius: 12px; border: 1px solid rgba(255,255,255,0.05);">
+                    <p style="margin: 0; font-size: 36px; font-weight: 700; color: #10b981;">
+                        ₹{int(current_lowest):,}
+                    </p>
+                    <p style="margin: 4px 0 0 0; font-size: 14px; color: #b8c1ec;">
+                        Dropped from your target of ₹{int(target_price):,}
+                    </p>
+                </div>
+            </div>
+
+            <div style="margin-top: 32px; text-align: center;">
+                <a href="{best_product['link']}" style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: #ffffff; padding: 14px 28px; text-decoration: none; border-radius: 12px; font-weight: 600; font-size: 16px; display: inline-block;">View Deal on {best_product['source']}</a>
+            </div>
+        </div>
+
+        <div style="padding: 20px 30px; background-color: rgba(255,255,255,0.02); border-top: 1px solid rgba(255,255,255,0.05); text-align: center;">
+            <p style="margin: 0; font-size: 12px; color: #6b7280;">
+                You're receiving this because you set an alert for "{query}".
+            </p>
+        </div>
+    </div>
+    """
+    return subject, body_text, body_html
+
+
+def send_alert_emails(mailer, triggered, best_products):
+    """
+    Queue one email per triggered alert (rows from storage.mark_triggered_alerts)
+    on a Mailer. best_products is {query: best product dict} for the deal link.
+    """
+    for alert in triggered:
+        try:
+            best_product = best_products[alert["query"]]
+            subject, body_text, body_html = alert_email(
+                alert["query"], alert["current_price"], float(alert["target_price"]), best_product
+            )
+            mailer.send(mailer.compose(alert["email"], subject, body_text, body_html))
+        except Exception as e:
+            print(f"[ERROR] Failed processing alert {alert.get('id')}: {e}")
@@ -1,44 +1,153 @@
-import smtplib
-from email.mime.text import MIMEText
+import argparse
+import math
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime
 
 from .scraper import compare_product
+from .mailer import Mailer
+from .notifications import send_alert_emails
+from .scrape_planner import plan_alert_scrapes
 from . import storage
-from ..core.database import SessionLocal
-from ..core.config import EMAIL_USER, EMAIL_PASS
+from ..core.config import (
+    SCRAPE_CONCURRENCY, SERPAPI_MAX_RPS, SCRAPE_DEADLINE,
+    SCRAPE_BUDGET, SCRAPE_JOB_LEASE, SCRAPE_JOB_MAX_ATTEMPTS
+)
 
-SMTP_SERVER = "smtp.gmail.com"
-SMTP_PORT = 587
+# Scraped queries per mark_triggered_alerts call; small runs evaluate once at the end
+ALERT_EVAL_BATCH = 500
 
-EMAIL_SENDER = EMAIL_USER
-EMAIL_PASSWORD = EMAIL_PASS
-
-
-from email.mime.multipart import MIMEMultipart
-
-def send_email_alert(receiver_email, subject, body_text, body_html=None):
-    if not EMAIL_SENDER or not EMAIL_PASSWORD:
-        print("❌ Email credentials not set in environment variables.")
-        return
-
-    msg = MIMEMultipart("alternative")
-    msg["Subject"] = subject
-    msg["From"] = f"PriceNest <{EMAIL_SENDER}>"
-    msg["To"] = receiver_email
-
-    msg.attach(MIMEText(body_text, "plain"))
-    if body_html:
-        msg.attach(MIMEText(body_html, "html"))
 
+# =========================
+# CONCURRENT SCRAPE STAGE
+# =========================
+class RateLimiter:
+    """Spaces acquire() calls at least 1/rate seconds apart across all threads."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self._next_slot = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+def _scrape_one(query, limiter, deadline, started):
+    started.append(time.monotonic())
+    limiter.acquire()
+    print(f"Scraping latest price for: {query}")
+    result = compare_product(query, timeout=deadline)
+    results = result.get("results", [])
+    if results:
+        storage.upsert_product(query, results)
+    return results
+
+
+def _best_result(results):
+    """{"lowest_price", "best_product"} for a scrape, or None if it found nothing."""
+    if not results:
+        return None
+    # Find the best product (lowest price)
+    best_product = min(results, key=lambda x: x["price_numeric"])
+    return {"lowest_price": best_product["price_numeric"], "best_product": best_product}
+
+
+def scrape_pipeline(groups, concurrency=SCRAPE_CONCURRENCY, max_rps=SERPAPI_MAX_RPS, deadline=SCRAPE_DEADLINE,
+                    on_error=None):
+    """
+    Scrape (query, payload) pairs on a bounded thread pool, sharing one SerpAPI
+    rate limiter, and yield (query, payload, best) as each scrape finishes.
+
+    groups is consumed lazily: at most 2 x concurrency queries are in flight,
+    so a streamed source (storage.iter_active_alerts_by_query) is never read
+    into memory. best is _best_result(...), None when a query produced no
+    results; a failing query is logged, passed to on_error(query, payload, exc)
+    if given, and skipped.
+
+    deadline is wall-clock seconds per query from the moment a worker picks it
+    up: rate-limiter wait, SerpAPI call and storage write together. An overdue
+    query fails with TimeoutError the same way; its thread cannot be stopped
+    and finishes in the background (its socket reads are bounded by the same
+    deadline), but its result is discarded.
+    """
+    limiter = RateLimiter(max_rps)
+    window = 2 * max(1, concurrency)
+    scraped = found = 0
+    started = time.monotonic()
+
+    pool = ThreadPoolExecutor(max_workers=max(1, concurrency))
     try:
-        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-            server.starttls()
-            server.login(EMAIL_SENDER, EMAIL_PASSWORD)
-            server.send_message(msg)
-
-        print(f"[EMAIL SENT] to {receiver_email}")
-
-    except Exception as e:
-        print(f"[EMAIL ERROR] {e}")
+        pending = {}        # future -> (query, payload, [worker start time])
+        groups = iter(groups)
+        exhausted = False
+        while pending or not exhausted:
+            while not exhausted and len(pending) < window:
+                try:
+                    query, payload = next(groups)
+                except StopIteration:
+                    exhausted = True
+                    break
+                begun = []
+                pending[pool.submit(_scrape_one, query, limiter, deadline, begun)] = (query, payload, begun)
+            if not pending:
+                break
+
+            done, _ = wait(pending, timeout=_next_expiry(pending.values(), deadline), return_when=FIRST_COMPLETED)
+            for future in done:
+                query, payload, _ = pending.pop(future)
+                scraped += 1
+                try:
+                    best = _best_result(future.result())
+                except Exception as e:
+                    print(f"⚠️ Error scraping {query}: {e}")
+                    if on_error is not None:
+                        on_error(query, payload, e)
+                    continue
+
+                if best is None:
+                    print(f"⚠️ No results found for: {query}")
+                else:
+                    found += 1
+                yield query, payload, best
+
+            if deadline:
+                now = time.monotonic()
+                for future, (query, payload, begun) in list(pending.items()):
+                    if begun and now - begun[0] >= deadline:
+                        del pending[future]
+                        scraped += 1
+                        print(f"⚠️ Scrape of {query} exceeded its {deadline:g}s deadline")
+                        if on_error is not None:
+                            on_error(query, payload, TimeoutError(f"deadline of {deadline:g}s exceeded"))
+    finally:
+        # Do not wait for overdue scrapes (or queued ones, if the caller stopped early)
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    elapsed = time.monotonic() - started
+    print(f"Scraped {found}/{scraped} queries in {elapsed:.1f}s "
+          f"(concurrency={concurrency}, max_rps={max_rps})")
+
+
+def _next_expiry(in_flight, deadline):
+    """Seconds until the earliest running scrape is overdue (None: wait for a completion)."""
+    starts = [begun[0] for _, _, begun in in_flight if begun]
+    if not deadline:
+        return None
+    if not starts:
+        # Queued scrapes have not started their clock yet; poll until one does
+        return min(deadline, 1.0)
+    return max(0.0, min(starts) + deadline - time.monotonic())
 
 
 # =========================
@@ -49,125 +158,137 @@ def check_alerts_job():
     print("[Scheduler] Checking alerts...")
     print("==============================\n")
 
-    # 1. Fetch all alerts and filter active ones
-    alerts = storage.list_all_alerts()
-    active_alerts = [a for a in alerts if a["is_active"]]
-
-    if not active_alerts:
+    # 1. Rank the active alert queries (streamed from SQL) by how likely their
+    # price is to have crossed a target, and keep the top SCRAPE_BUDGET
+    plan = plan_alert_scrapes()
+    if not plan:
         print("No active alerts found.")
         return
+    urgent = sum(1 for _, priority in plan if math.isinf(priority))
+    print(f"Scraping {len(plan)} products ({urgent} never scraped or overdue), most urgent first.")
+
+    # 2. Scrape in priority order. Finished scrapes are evaluated in batches of
+    # ALERT_EVAL_BATCH queries, one statement per batch; emails are queued on a
+    # pooled mailer and delivered while the pipeline keeps going.
+    batch = {}
+    with Mailer() as mailer:
+        for query, _, best in scrape_pipeline(plan):
+            if best is not None:
+                batch[query] = best
+            if len(batch) >= ALERT_EVAL_BATCH:
+                _evaluate_alerts(batch, mailer)
+                batch = {}
+        _evaluate_alerts(batch, mailer)
+
+
+def _evaluate_alerts(cached_results, mailer):
+    """
+    Evaluate every alert on the scraped queries in one statement and queue
+    the emails. mark_triggered_alerts applies the target check and the
+    "only notify if the price changed" rule in SQL and stores the new
+    last_alerted_price on every alert it returns.
+    """
+    if not cached_results:
+        return
 
-    # 2. Identify unique products (queries) to scrape
-    unique_queries = list(set(a["query"] for a in active_alerts))
-    print(f"Tracking {len(unique_queries)} unique products for {len(active_alerts)} active alerts.")
-
-    # 3. Scrape and update products table for unique queries
-    cached_results = {}
-    for query in unique_queries:
-        try:
-            print(f"Scraping latest price for: {query}")
-            result = compare_product(query)
-            results = result.get("results", [])
-            
-            if results:
-                storage.upsert_product(query, results)
-                # Find the best product (lowest price)
-                best_product = min(results, key=lambda x: x["price_numeric"])
-                cached_results[query] = {
-                    "lowest_price": best_product["price_numeric"],
-                    "best_product": best_product
-                }
-            else:
-                print(f"⚠️ No results found for: {query}")
-        except Exception as e:
-            print(f"⚠️ Error scraping {query}: {e}")
-
-    # 4. Evaluate each alert based on the scraped data
-    for alert in active_alerts:
-        try:
-            alert_id = alert["id"]
-            query = alert["query"]
-            target_price = float(alert["target_price"])
-            last_alerted_price = alert.get("last_alerted_price")
-            receiver_email = alert["email"]
-
-            if query not in cached_results:
+    try:
+        triggered = storage.mark_triggered_alerts(
+            {query: result["lowest_price"] for query, result in cached_results.items()}
+        )
+    except Exception as e:
+        print(f"[ERROR] Failed evaluating alerts for {len(cached_results)} products: {e}")
+        return
+
+    print(f"✅ {len(triggered)} alerts triggered across {len(cached_results)} products")
+    send_alert_emails(
+        mailer, triggered,
+        {query: result["best_product"] for query, result in cached_results.items()}
+    )
+
+
+# =========================
+# JOB QUEUE (multi-worker runs)
+# =========================
+# `enqueue` plans a run into the scrape_jobs table; any number of `worker`
+# processes, on any node, then drain it in parallel. A crashed worker's jobs
+# are picked up again once their lease expires, and a restarted worker
+# resumes the run where it stopped. Each worker rate-limits itself, so set
+# SERPAPI_MAX_RPS to the account limit divided by the number of workers.
+def enqueue_run(run_id=None, budget=SCRAPE_BUDGET):
+    run_id = run_id or datetime.utcnow().strftime("run-%Y%m%dT%H%M%S")
+    plan = plan_alert_scrapes(budget)
+    added = storage.enqueue_scrape_jobs(run_id, plan)
+    print(f"Enqueued {added} scrape jobs for run {run_id}")
+    return run_id
+
+
+def run_worker(run_id=None, batch_size=None, lease=SCRAPE_JOB_LEASE, max_attempts=SCRAPE_JOB_MAX_ATTEMPTS,
+               poll_interval=5):
+    """Claim and process jobs of a run (default: the latest) until none are left."""
+    run_id = run_id or storage.latest_scrape_run()
+    if run_id is None:
+        print("No scrape run to work on.")
+        return
+    worker_id = f"{socket.gethostname()}-{os.getpid()}"
+    batch_size = batch_size or 2 * max(1, SCRAPE_CONCURRENCY)
+    print(f"[Worker {worker_id}] Draining run {run_id}")
+
+    with Mailer() as mailer:
+        while True:
+            jobs = storage.claim_scrape_jobs(run_id, worker_id, batch_size, lease, max_attempts)
+            if jobs:
+                _run_jobs(jobs, worker_id, mailer, max_attempts)
                 continue
+            # Nothing claimable: done, unless other workers still hold leases
+            # that may expire and come back to the queue.
+            if not storage.get_scrape_run(run_id).get("running"):
+                break
+            time.sleep(poll_interval)
 
-            current_lowest = cached_results[query]["lowest_price"]
-            best_product = cached_results[query]["best_product"]
-
-            print(f"\nEvaluating Alert {alert_id} for {query}")
-            print(f"Target: ₹{target_price:,} | Current: ₹{int(current_lowest):,}")
-
-            if current_lowest <= target_price:
-                # Intelligent Alert Logic: Only notify if price changed
-                # We use abs() >= 1 to handle minor float differences
-                if last_alerted_price is None or abs(current_lowest - last_alerted_price) >= 1:
-                    print("✅ ALERT TRIGGERED")
-
-                    subject = f"Price Alert: {query} is now ₹{int(current_lowest):,}"
-
-                    body_text = (
-                        f"Price Alert from PriceNest\n\n"
-                        f"The price for '{query}' has dropped to ₹{int(current_lowest):,}.\n"
-                        f"Target Price: ₹{int(target_price):,}\n"
-                        f"Current Store: {best_product['source']}\n"
-                        f"View Deal: {best_product['link']}\n\n"
-                        f"Thank you for choosing PriceNest."
-                    )
-
-                    # Minimal Website-Inspired HTML Template
-                    # Using website colors: Primary #667eea, Background #0a0e27, Success #10b981
-                    body_html = f"""
-                    <div style="font-family: 'Inter', -apple-system, sans-serif; max-width: 550px; margin: auto; background-color: #0a0e27; color: #ffffff; border-radius: 16px; overflow: hidden; border: 1px solid rgba(255,255,255,0.1);">
-                        <div style="padding: 30px; text-align: left;">
-                            <h1 style="margin: 0; font-size: 20px; font-weight: 700; color: #667eea;">PriceNest</h1>
-
-                            <div style="margin-top: 30px;">
-                                <p style="font-size: 14px; color: #b8c1ec; margin-bottom: 8px; text-transform: uppercase; letter-spacing: 1px;">Price Update</p>
-                                <h2 style="margin: 0; font-size: 24px; font-weight: 600; line-height: 1.3;">{query}</h2>
-
-                                <div style="margin-top: 24px; padding: 20px; background: rgba(255,255,255,0.03); border-radius: 12px; border: 1px solid rgba(255,255,255,0.05);">
-                                    <p style="margin: 0; font-size: 36px; font-weight: 700; color: #10b981;">
-                                        ₹{int(current_lowest):,}
-                                    </p>
-                                    <p style="margin: 4px 0 0 0; font-size: 14px; color: #b8c1ec;">
-                                        Dropped from your target of ₹{int(target_price):,}
-                                    </p>
-                                </div>
-                            </div>
-
-                            <div style="margin-top: 32px; text-align: center;">
-                                <a href="{best_product['link']}" style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: #ffffff; padding: 14px 28px; text-decoration: none; border-radius: 12px; font-weight: 600; font-size: 16px; display: inline-block;">View Deal on {best_product['source']}</a>
-                            </div>
-                        </div>
-
-                        <div style="padding: 20px 30px; background-color: rgba(255,255,255,0.02); border-top: 1px solid rgba(255,255,255,0.05); text-align: center;">
-                            <p style="margin: 0; font-size: 12px; color: #6b7280;">
-                                You're receiving this because you set an alert for "{query}".
-                            </p>
-                        </div>
-                    </div>
-                    """
-                    
-                    send_email_alert(receiver_email, subject, body_text, body_html)
-                    
-                    # Store current price to avoid repeated alerts for the same price
-                    storage.update_alert_price(alert_id, current_lowest)
-                else:
-                    print("Price is same as last time. Skipping duplicate alert.")
-            else:
-                print("Price still above target.")
+    print(f"[Worker {worker_id}] Run {run_id}: {storage.get_scrape_run(run_id)}")
+
+
+def _run_jobs(jobs, worker_id, mailer, max_attempts):
+    errors = {}
+    lowest_prices = {}
+    batch = {}
+
+    def on_error(query, job, e):
+        errors[job["id"]] = str(e) or type(e).__name__
+
+    for query, job, best in scrape_pipeline(((j["query"], j) for j in jobs), on_error=on_error):
+        lowest_prices[job["id"]] = best["lowest_price"] if best else None
+        if best is not None:
+            batch[query] = best
 
-        except Exception as e:
-            print(f"[ERROR] Failed processing alert {alert.get('id')}: {e}")
+    # Alerts are marked before the jobs are checkpointed: if the worker dies in
+    # between, the jobs are re-run and mark_triggered_alerts will not notify twice.
+    _evaluate_alerts(batch, mailer)
+    storage.complete_scrape_jobs(worker_id, lowest_prices)
+    for job_id, error in errors.items():
+        storage.fail_scrape_job(job_id, worker_id, error, max_attempts)
 
 
 # =========================
 # MAIN RUNNER (GitHub Actions Mode)
 # =========================
 if __name__ == "__main__":
-    print("Running alert check (GitHub Actions mode)...")
-    check_alerts_job()
-    print("\nFinished alert check.")
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="PriceNest alert scheduler")
+    parser.add_argument("command", nargs="?", default="check", choices=["check", "enqueue", "worker", "status"],
+                        help="check: single-process run (default); enqueue/worker/status: job queue")
+    parser.add_argument("--run-id", help="scrape run (default: new for enqueue, latest otherwise)")
+    parser.add_argument("--budget", type=int, default=SCRAPE_BUDGET, help="queries to enqueue, 0 = all")
+    parser.add_argument("--batch", type=int, help="jobs claimed per round (worker)")
+    args = parser.parse_args()
+
+    if args.command == "enqueue":
+        enqueue_run(args.run_id, args.budget)
+    elif args.command == "worker":
+        run_worker(args.run_id, args.batch)
+    elif args.command == "status":
+        run_id = args.run_id or storage.latest_scrape_run()
+        print(f"{run_id}: {storage.get_scrape_run(run_id) if run_id else {}}")
+    else:
+        print("Running alert check (GitHub Actions mode)...")
+        check_alerts_job()
+        print("\nFinished alert check.")
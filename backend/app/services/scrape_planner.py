@@ -0,0 +1,86 @@
+"""
+Decides which alert queries the scheduler scrapes, and in what order.
+
+Every query gets a priority: roughly how likely its price is to have crossed
+an alert target since it was last scraped.
+
+    expected move = volatility% x sqrt(hours since last scrape)
+    priority      = expected move / gap% to the nearest target below the price
+
+volatility% is the sample std / mean of the query's rollups over the last
+VOLATILITY_WINDOW_DAYS, floored so a flat history still ages in. A query
+already at or under a target has a zero gap and ranks by its expected move
+alone. Queries never scraped, or not scraped for SCRAPE_MAX_AGE hours, go
+first regardless, so nothing starves.
+
+A run scrapes the top SCRAPE_BUDGET queries (0 = all of them, most urgent
+first). Selection keeps a min-heap of the best `budget` candidates, so memory
+stays bounded by the budget however many alert queries stream past.
+"""
+import heapq
+import math
+from datetime import datetime, timedelta
+
+from . import storage
+from ..core.config import SCRAPE_BUDGET, SCRAPE_MAX_AGE
+
+VOLATILITY_WINDOW_DAYS = 30
+MIN_VOLATILITY_PCT = 0.5     # % std/mean assumed for flat or single-point histories
+MIN_GAP_PCT = 0.5            # % gap below which a target counts as reached
+
+
+def volatility_pct(stats):
+    """Sample std / mean of the rolled-up prices, in percent."""
+    count = stats["count"] or 0
+    if count < 2 or not stats["price_sum"]:
+        return MIN_VOLATILITY_PCT
+    mean = stats["price_sum"] / count
+    variance = max(stats["price_sum_sq"] - stats["price_sum"] * mean, 0.0) / (count - 1)
+    return max(100 * math.sqrt(variance) / mean, MIN_VOLATILITY_PCT)
+
+
+def target_gap_pct(current_price, targets):
+    """% the price must still fall to reach the nearest target (0 if one is already met)."""
+    below = [t for t in targets if t < current_price]
+    if len(below) < len(targets):
+        return 0.0
+    return 100 * (current_price - max(below)) / current_price
+
+
+def query_priority(stats, targets, now, max_age_hours=SCRAPE_MAX_AGE):
+    """Priority of one query; math.inf for never scraped or overdue queries."""
+    if stats is None or stats["current_price"] is None or stats["last_scraped_at"] is None:
+        return math.inf
+    age_hours = max((now - stats["last_scraped_at"]).total_seconds() / 3600, 0.0)
+    if age_hours >= max_age_hours:
+        return math.inf
+    expected_move = volatility_pct(stats) * math.sqrt(age_hours)
+    return expected_move / max(target_gap_pct(stats["current_price"], targets), MIN_GAP_PCT)
+
+
+def plan_scrapes(groups, stats, budget=SCRAPE_BUDGET, now=None):
+    """
+    Pick the queries to scrape from (query, [alert dicts]) groups.
+
+    stats is storage.get_scrape_stats(). Returns [(query, priority)], highest
+    priority first, at most budget long (all queries when budget is 0).
+    """
+    now = now or datetime.utcnow()
+    heap = []
+    for seq, (query, alerts) in enumerate(groups):
+        targets = [float(a["target_price"]) for a in alerts]
+        # seq breaks ties in favour of the earlier query and keeps tuples comparable
+        entry = (query_priority(stats.get(query), targets, now), -seq, query)
+        if not budget or len(heap) < budget:
+            heapq.heappush(heap, entry)
+        elif entry > heap[0]:
+            heapq.heapreplace(heap, entry)
+
+    return [(query, priority) for priority, _, query in sorted(heap, reverse=True)]
+
+
+def plan_alert_scrapes(budget=SCRAPE_BUDGET):
+    """plan_scrapes over the active alerts and their recent price history."""
+    since_day = (datetime.utcnow() - timedelta(days=VOLATILITY_WINDOW_DAYS)).date()
+    stats = storage.get_scrape_stats(since_day)
+    return plan_scrapes(storage.iter_active_alerts_by_query(), stats, budget)
@@ -1,55 +1,67 @@
 import re
 import statistics
+from typing import TYPE_CHECKING
 from urllib.parse import urlparse
-from serpapi import GoogleSearch
+from ..core import metrics
 from ..core.config import SERPAPI_KEY
 
+if TYPE_CHECKING:
+    import httpx
+
 
 # BUILD SMART SEARCH QUERY (USER TYPES ONLY PRODUCT)
 def build_search_query(q: str) -> str:
     return f"{q} buy price"
 
+# PRECOMPILED PATTERNS (built once at import, not per call)
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+_PRICE_PATTERN = re.compile(r"(₹|Rs\.?|INR)\s?([\d,]+)")
+_EMI_PRICE_PATTERN = re.compile(
+    r"""
+    (
+        (₹|Rs\.?|INR)\s?[\d,]+\s*(/mo(nth)?|per\s*month|x\s*\d+\s*(months?|EMIs?))
+        |
+        (no[\s-]?cost[\s-]?)?emi\s*(from|starting|at|of|:)?\s*(₹|Rs\.?|INR)?\s*[\d,]+
+        |
+        (₹|Rs\.?|INR)\s?[\d,]+\s*emi
+    )
+    """,
+    re.IGNORECASE | re.VERBOSE
+)
+
+MIN_PRICE = 500
+MAX_PRICE = 5_000_000
+
 # TITLE RELEVANCE CHECKER
 def _tokenize(text: str) -> list[str]:
     """Lowercase alphanumeric tokens from a string."""
-    return re.findall(r"[a-z0-9]+", text.lower())
+    return _TOKEN_PATTERN.findall(text.lower())
+
+def _query_tokens(user_query: str) -> list[str]:
+    return [t for t in _tokenize(user_query) if len(t) > 1]
+
+def _title_has_tokens(title: str, query_tokens: list[str]) -> bool:
+    title_text = title.lower()
+    return all(tok in title_text for tok in query_tokens)
 
 def is_relevant_title(title: str, user_query: str) -> bool:
     """
     Returns True only if the result title contains ALL tokens from the user query
     (case-insensitive substring match). Single-char tokens are ignored.
     """
-    query_tokens = [t for t in _tokenize(user_query) if len(t) > 1]
-    if not query_tokens:
-        return True  # nothing to filter on
-    title_text = title.lower()
-    return all(tok in title_text for tok in query_tokens)
+    return _title_has_tokens(title, _query_tokens(user_query))
 
 # STRICT PRICE EXTRACTOR - TO OMIT EMI VALUES
 def extract_prices(text: str):
     if not text:
         return []
 
-    emi_pattern = re.compile(
-        r"""
-        (
-            (₹|Rs\.?|INR)\s?[\d,]+\s*(/mo(nth)?|per\s*month|x\s*\d+\s*(months?|EMIs?))
-            |
-            (no[\s-]?cost[\s-]?)?emi\s*(from|starting|at|of|:)?\s*(₹|Rs\.?|INR)?\s*[\d,]+
-            |
-            (₹|Rs\.?|INR)\s?[\d,]+\s*emi
-        )
-        """,
-        re.IGNORECASE | re.VERBOSE
-    )
-    cleaned = emi_pattern.sub("", text)
-
-    matches = re.findall(r"(₹|Rs\.?|INR)\s?([\d,]+)", cleaned)
+    cleaned = _EMI_PRICE_PATTERN.sub("", text)
 
     prices = []
-    for _, num in matches:
+    for _, num in _PRICE_PATTERN.findall(cleaned):
         val = int(num.replace(",", ""))
-        if 500 <= val <= 5_000_000:
+        if MIN_PRICE <= val <= MAX_PRICE:
             prices.append(val)
 
     return prices
@@ -83,6 +95,25 @@ def filter_emi_outliers(results: list) -> list:
     filtered = [r for r in results if r["price_numeric"] >= threshold]
     return filtered if filtered else results
 
+def _filter_sorted_emi_outliers(results: list) -> list:
+    """filter_emi_outliers for results already sorted by price: O(1) median, and
+    everything below the threshold is a prefix, so one slice drops it."""
+    n = len(results)
+    if n < 2:
+        return results
+
+    mid = n // 2
+    if n % 2:
+        median = results[mid]["price_numeric"]
+    else:
+        median = (results[mid - 1]["price_numeric"] + results[mid]["price_numeric"]) / 2
+    threshold = median * EMI_OUTLIER_RATIO
+
+    cut = 0
+    while cut < n and results[cut]["price_numeric"] < threshold:
+        cut += 1
+    return results[cut:]
+
 # DOMAIN NORMALIZER
 def get_domain(url: str) -> str:
     try:
@@ -92,50 +123,103 @@ def get_domain(url: str) -> str:
         return ""
 
 # GOOGLE SEARCH
-def google_search(query: str):
-    return GoogleSearch({
+SERPAPI_ENDPOINT = "https://serpapi.com/search.json"
+
+
+def _search_params(query: str) -> dict:
+    return {
         "q": query,
         "location": "India",
         "hl": "en",
         "gl": "in",
         "num": 60,
         "api_key": SERPAPI_KEY
-    }).get_dict()
+    }
+
+
+@metrics.timed(metrics.SERPAPI_REQUEST, mode="sync")
+def google_search(query: str, timeout: float = None):
+    from serpapi import GoogleSearch
+
+    search = GoogleSearch(_search_params(query))
+    if timeout:
+        # Passed straight through to requests as the HTTP timeout
+        search.timeout = timeout
+    return search.get_dict()
+
+
+# One pooled client for the async request path, so concurrent searches reuse
+# keep-alive connections to SerpAPI instead of a TLS handshake each. Like
+# serpapi above, httpx is imported on first use to keep it off the cold start.
+_http_client = None
+
+
+def _async_client() -> "httpx.AsyncClient":
+    import httpx
+
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20)
+        )
+    return _http_client
+
+
+@metrics.timed(metrics.SERPAPI_REQUEST, mode="async")
+async def google_search_async(query: str, timeout: float = None):
+    """Same request and response dict as google_search, without blocking the event loop."""
+    params = {"engine": "google", "output": "json", **_search_params(query)}
+    response = await _async_client().get(SERPAPI_ENDPOINT, params=params, timeout=timeout or 60)
+    # SerpAPI reports errors as {"error": ...} bodies, which GoogleSearch passes
+    # through as well; extract_results treats them as an empty result set.
+    return response.json()
+
+
+async def close_http_client():
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
 
 # EXTRACT RESULTS
+# Single pass over the raw SerpAPI dict: relevance, EMI and price checks run per
+# item as it is read, each link is parsed once, and organic results from stores
+# already covered by product_result are dropped inline. One sort, then the
+# outlier cut on the sorted list.
+@metrics.timed(metrics.EXTRACT_RESULTS)
 def extract_results(data: dict, user_query: str):
     results = []
+    query_tokens = _query_tokens(user_query)
 
     # ---------- PRODUCT RESULTS ----------
-    product_result = data.get("product_result", {})
+    product_result = data.get("product_result") or {}
     product_title = product_result.get("title", "")
     product_thumbnails = product_result.get("thumbnails", [])
     product_image = product_thumbnails[0] if product_thumbnails else None
+    product_relevant = _title_has_tokens(product_title, query_tokens)
+    product_domains = set()
 
-    for item in product_result.get("pricing", []):
+    for item in product_result.get("pricing", []) if product_relevant else ():
         link = item.get("link")
         title = item.get("description") or product_title
         extracted_price = item.get("extracted_price")
-        store_name = item.get("name", "")
 
         if not link or not title:
             continue
-        if not is_relevant_title(product_title, user_query):
+        if not extracted_price or not (MIN_PRICE <= extracted_price <= MAX_PRICE):
             continue
         if item_signals_emi(item):
             continue
-        if not extracted_price or not (500 <= extracted_price <= 5_000_000):
-            continue
 
         price_val = int(extracted_price)
-        prices = [price_val]
         domain = get_domain(link)
+        product_domains.add(domain)
 
         results.append({
             "title": title,
-            "source": store_name or domain,
+            "source": item.get("name", "") or domain,
             "link": link,
-            "prices": prices,
+            "prices": [price_val],
             "price_numeric": price_val,
             "price": f"₹{price_val:,}",
             "image": item.get("thumbnail") or product_image,
@@ -147,44 +231,51 @@ def extract_results(data: dict, user_query: str):
     for item in data.get("organic_results", []):
         link = item.get("link")
         title = item.get("title")
-        snippet = item.get("snippet", "")
 
         if not link or not title:
             continue
-        if not is_relevant_title(title, user_query):
+        if not _title_has_tokens(title, query_tokens):
             continue
 
         domain = get_domain(link)
-        prices = extract_prices(title + " " + snippet)
+        if domain in product_domains:
+            continue
+
+        prices = extract_prices(title + " " + item.get("snippet", ""))
         if not prices:
             continue
 
+        best = max(prices)
         results.append({
             "title": title,
             "source": domain,
             "link": link,
             "prices": prices,
-            "price_numeric": max(prices),
-            "price": f"₹{max(prices):,}",
+            "price_numeric": best,
+            "price": f"₹{best:,}",
             "image": item.get("thumbnail"),
             "store_logo": item.get("favicon"),
             "result_type": "organic"
         })
 
-    product_result_domains = {get_domain(r["link"]) for r in results if r["result_type"] == "product_result"}
-    results = [r for r in results if not (r["result_type"] == "organic" and get_domain(r["link"]) in product_result_domains)]
+    results.sort(key=lambda x: x["price_numeric"])
+    return _filter_sorted_emi_outliers(results)
 
-    results = sorted(results, key=lambda x: x["price_numeric"])
-    results = filter_emi_outliers(results)
+# MAIN ENTRY
+def compare_product(user_query: str, timeout: float = None):
+    query = build_search_query(user_query)
+    raw = google_search(query, timeout=timeout)
 
-    return results
+    return {
+        "query": user_query,
+        "results": extract_results(raw, user_query)
+    }
 
-# MAIN ENTRY
-def compare_product(user_query: str):
+async def compare_product_async(user_query: str, timeout: float = None):
     query = build_search_query(user_query)
-    raw = google_search(query)
+    raw = await google_search_async(query, timeout=timeout)
 
     return {
         "query": user_query,
         "results": extract_results(raw, user_query)
-    }
\ No newline at end of file
+    }
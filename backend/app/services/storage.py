@@ -1,10 +1,15 @@
-from sqlalchemy.orm import Session
-from datetime import datetime
+from sqlalchemy import DateTime, Float, String, and_, bindparam, case, column, event, func, insert, or_, select, true, update, values
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session, aliased
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from itertools import groupby
 from typing import Optional
 from fastapi import HTTPException
 
+from ..core import metrics
 from ..core.database import SessionLocal
-from ..models.models import Product, Alert, User, Wishlist
+from ..models.models import Listing, PriceObservation, PriceRollup, QueryVersion, Alert, User, Wishlist, ProductSummaryCache, ScrapeJob
 
 
 def _require_db():
@@ -13,100 +18,468 @@ def _require_db():
         raise HTTPException(status_code=503, detail="Database is not configured (DATABASE_URL missing)")
 
 
+@contextmanager
+def _session_scope(db: Optional[Session] = None):
+    """
+    Session for one storage call.
+
+    Given the request's session (core.database.get_db), the call joins its
+    transaction and only flushes; the request commits once at the end. Without
+    one, the call opens, commits and closes its own, as scripts and the
+    scheduler expect.
+    """
+    if db is not None:
+        yield db
+        db.flush()
+        return
+
+    _require_db()
+    # Returned ORM objects (create_user, add_to_wishlist) outlive the session
+    db = SessionLocal(expire_on_commit=False)
+    try:
+        yield db
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
 def normalize_query(q: str) -> str:
     return q.strip().lower()
 
 
+# "Current" prices (the analytics best price now, the wishlist lowest price) come
+# from a query's latest scrape batch: every observation within this window of
+# its most recent one.
+CURRENT_BATCH_WINDOW = timedelta(minutes=10)
+
+
 # -----------------------------
-# PRODUCT (always insert — accumulates price history over time)
+# PRODUCTS
+# A product result is a listing (query, source, link + display fields) and a
+# narrow price observation per scrape. Listings are upserted, observations are
+# always inserted — they accumulate the price history over time.
 # -----------------------------
-def upsert_product(query, results):
-    _require_db()
-    db: Session = SessionLocal()
+def upsert_product(query, results, db: Optional[Session] = None):
     query = normalize_query(query)
-    product_objects = []
+    if not results:
+        return []
 
-    try:
-        for r in results:
-            # Always insert a new row every scrape.
-            # This builds up price history in the products table over time
-            # so analytics can compute lowest/highest/average/volatility across all searches.
-            product = Product(
-                query=query,
-                title=r["title"],
-                source=r["source"],
-                link=r["link"],
-                image=r.get("image"),
-                store_logo=r.get("store_logo"),
-                price=r["price_numeric"],
-                created_at=datetime.utcnow()
-            )
-            db.add(product)
-            product_objects.append(product)
+    scraped_at = datetime.utcnow()
+    listings, prices = _scrape_batch(query, results)
 
-        db.commit()
-        # Refresh to get IDs
-        for p in product_objects:
-            db.refresh(p)
+    with _session_scope(db) as db:
+        listing_ids = {
+            (source, link): listing_id
+            for listing_id, source, link in db.execute(_listings_upsert(listings))
+        }
+        db.execute(insert(PriceObservation), _observation_rows(listing_ids, prices, scraped_at))
+        db.execute(_rollups_upsert(query, prices, scraped_at))
+        db.execute(_version_bump(query, scraped_at))
+        stored = _scrape_results(results, listing_ids)
+        after_commit(db, _notify_ingest, query, stored)
+
+    return stored
+
+
+# Work that must only happen once a request's transaction is committed (ingest
+# notifications, alert_index updates) is queued on the session.
+_AFTER_COMMIT = "after_commit"
+
+
+def after_commit(db: Optional[Session], callback, *args):
+    """
+    Call callback(*args) once db's transaction commits, or now when there is no
+    session (the storage call already committed its own). Dropped on rollback.
+    """
+    if db is None:
+        callback(*args)
+    else:
+        db.info.setdefault(_AFTER_COMMIT, []).append((callback, args))
+
+
+@event.listens_for(Session, "after_commit")
+def _run_after_commit(session):
+    for callback, args in session.info.pop(_AFTER_COMMIT, ()):
+        callback(*args)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_commit(session):
+    session.info.pop(_AFTER_COMMIT, None)
+
+
+# Ingest listeners are called as listener(query, results) after every batch
+# upsert_product stores (sync or async), with the results it returns, once the
+# batch is committed: with a request session that is when the request commits,
+# and a rolled-back batch is never announced. Listeners run on the committing
+# thread and must hand slow work off.
+_ingest_listeners = []
+
+
+def add_ingest_listener(listener):
+    if listener not in _ingest_listeners:
+        _ingest_listeners.append(listener)
+
+
+def remove_ingest_listener(listener):
+    if listener in _ingest_listeners:
+        _ingest_listeners.remove(listener)
+
+
+def _notify_ingest(query, results):
+    for listener in _ingest_listeners:
+        try:
+            listener(query, results)
+        except Exception as e:
+            print(f"⚠️ Ingest listener failed for {query}: {e}")
+
+
+# Statement builders and row shaping shared with storage_async, so both engines
+# issue the same SQL and return the same dicts.
+def _scrape_batch(query, results):
+    """
+    One listing per (source, link); the last result for a link wins the display
+    fields, the first (results come sorted by price) sets the observed price.
+    """
+    listings = {}
+    prices = {}
+    for r in results:
+        key = (r["source"], r["link"])
+        listings[key] = {
+            "query": query,
+            "source": r["source"],
+            "link": r["link"],
+            "title": r["title"],
+            "image": r.get("image"),
+            "store_logo": r.get("store_logo")
+        }
+        prices.setdefault(key, r["price_numeric"])
+    return list(listings.values()), prices
+
+
+def _listings_upsert(listings):
+    stmt = pg_insert(Listing).values(listings)
+    return stmt.on_conflict_do_update(
+        index_elements=[Listing.query, Listing.source, Listing.link],
+        set_={
+            "title": stmt.excluded.title,
+            "image": stmt.excluded.image,
+            "store_logo": stmt.excluded.store_logo
+        }
+    ).returning(Listing.id, Listing.source, Listing.link)
+
+
+def _observation_rows(listing_ids, prices, scraped_at):
+    return [
+        {"listing_id": listing_ids[key], "price": price, "created_at": scraped_at}
+        for key, price in prices.items()
+    ]
+
+
+def _scrape_results(results, listing_ids):
+    return [
+        {
+            "id": listing_ids[(r["source"], r["link"])],
+            "title": r["title"],
+            "source": r["source"],
+            "link": r["link"],
+            "image": r.get("image"),
+            "store_logo": r.get("store_logo"),
+            "price_numeric": r["price_numeric"],
+            "price": _format_price(r["price_numeric"])
+        } for r in results
+    ]
+
+
+def _format_price(price):
+    return f"₹{int(price):,}" if price else "₹0"
+
+
+def _listing_result(listing, price):
+    return {
+        "id": listing.id,
+        "title": listing.title,
+        "source": listing.source,
+        "link": listing.link,
+        "image": listing.image,
+        "store_logo": listing.store_logo,
+        "price_numeric": price,
+        "price": _format_price(price)
+    }
+
+
+def _rollups_upsert(query, prices, scraped_at):
+    """Fold a scrape batch ({(source, link): price}) into the per (query, store, day) price rollups."""
+    rollups = {}
+    for (source, _), price in prices.items():
+        rollup = rollups.get(source)
+        if rollup is None:
+            rollups[source] = {
+                "query": query,
+                "store": source,
+                "day": scraped_at.date(),
+                "count": 1,
+                "price_sum": price,
+                "price_sum_sq": price * price,
+                "min_price": price,
+                "max_price": price,
+                "latest_price": price,
+                "latest_at": scraped_at
+            }
+        else:
+            rollup["count"] += 1
+            rollup["price_sum"] += price
+            rollup["price_sum_sq"] += price * price
+            rollup["min_price"] = min(rollup["min_price"], price)
+            rollup["max_price"] = max(rollup["max_price"], price)
+            rollup["latest_price"] = price
+
+    stmt = pg_insert(PriceRollup).values(list(rollups.values()))
+    return stmt.on_conflict_do_update(
+        index_elements=[PriceRollup.query, PriceRollup.store, PriceRollup.day],
+        set_={
+            "count": PriceRollup.count + stmt.excluded.count,
+            "price_sum": PriceRollup.price_sum + stmt.excluded.price_sum,
+            "price_sum_sq": PriceRollup.price_sum_sq + stmt.excluded.price_sum_sq,
+            "min_price": func.least(PriceRollup.min_price, stmt.excluded.min_price),
+            "max_price": func.greatest(PriceRollup.max_price, stmt.excluded.max_price),
+            "latest_price": case(
+                (stmt.excluded.latest_at >= PriceRollup.latest_at, stmt.excluded.latest_price),
+                else_=PriceRollup.latest_price
+            ),
+            "latest_at": func.greatest(PriceRollup.latest_at, stmt.excluded.latest_at)
+        }
+    )
+
+
+def _version_bump(query, scraped_at):
+    """
+    Per-query data version, bumped in the same transaction as the scrape it
+    counts, so anything derived from a query's history (cached analytics, ETags)
+    can be keyed by (query, version) instead of being recomputed to check.
+    """
+    stmt = pg_insert(QueryVersion).values(query=query, version=1, updated_at=scraped_at)
+    return stmt.on_conflict_do_update(
+        index_elements=[QueryVersion.query],
+        set_={"version": QueryVersion.version + 1, "updated_at": stmt.excluded.updated_at}
+    )
+
+
+def _version_select(query):
+    return select(QueryVersion.version).where(QueryVersion.query == query)
+
+
+# Analytics reads plain column tuples (no ORM objects or dicts) and transposes
+# them straight into arrays; these are the column orders it unpacks.
+ROLLUP_COLUMNS = (
+    "store", "day", "count", "price_sum", "price_sum_sq", "min_price", "max_price", "latest_price", "latest_at"
+)
+HISTORY_COLUMNS = ("created_at", "store", "price")
+
+
+def _rollup_rows_select(query):
+    return (
+        select(*(getattr(PriceRollup, c) for c in ROLLUP_COLUMNS))
+        .where(PriceRollup.query == query)
+        .order_by(PriceRollup.day, PriceRollup.store)
+    )
+
+
+def _lowest_since_select(query, since):
+    return (
+        select(func.min(PriceObservation.price))
+        .join(Listing, Listing.id == PriceObservation.listing_id)
+        .where(Listing.query == query, PriceObservation.created_at >= since)
+    )
+
+
+def _history_rows_select(query):
+    return (
+        select(PriceObservation.created_at, Listing.source, PriceObservation.price)
+        .join(PriceObservation, PriceObservation.listing_id == Listing.id)
+        .where(Listing.query == query)
+        .order_by(PriceObservation.created_at, PriceObservation.listing_id)
+    )
+
+
+# Batch variants for /analytics/batch: one statement for any number of queries,
+# with the query as the leading column.
+def _rollup_rows_by_query_select(queries):
+    return (
+        select(PriceRollup.query, *(getattr(PriceRollup, c) for c in ROLLUP_COLUMNS))
+        .where(PriceRollup.query.in_(queries))
+        .order_by(PriceRollup.query, PriceRollup.day, PriceRollup.store)
+    )
+
+
+def _lowest_since_by_query_select(since_by_query):
+    cutoffs = values(
+        column("query", String), column("since", DateTime),
+        name="cutoffs"
+    ).data(list(since_by_query.items()))
+    return (
+        select(cutoffs.c.query, func.min(PriceObservation.price))
+        .select_from(cutoffs)
+        .join(Listing, Listing.query == cutoffs.c.query)
+        .join(PriceObservation, and_(
+            PriceObservation.listing_id == Listing.id,
+            PriceObservation.created_at >= cutoffs.c.since
+        ))
+        .group_by(cutoffs.c.query)
+    )
+
+
+def _history_rows_by_query_select(queries):
+    return (
+        select(Listing.query, PriceObservation.created_at, Listing.source, PriceObservation.price)
+        .join(PriceObservation, PriceObservation.listing_id == Listing.id)
+        .where(Listing.query.in_(queries))
+        .order_by(Listing.query, PriceObservation.created_at, PriceObservation.listing_id)
+    )
+
+
+def _rows_by_query(rows):
+    """Split rows led by a query column into {query: [rest of the row]}."""
+    return {query: [tuple(r)[1:] for r in group] for query, group in groupby(rows, key=lambda r: r[0])}
+
+
+def _latest_scrape_select(query):
+    return (
+        select(func.max(PriceObservation.created_at))
+        .join(Listing, Listing.id == PriceObservation.listing_id)
+        .where(Listing.query == query)
+    )
+
+
+def _scrape_batch_select(query, scraped_at):
+    return (
+        select(Listing, PriceObservation.price)
+        .join(PriceObservation, PriceObservation.listing_id == Listing.id)
+        .where(
+            Listing.query == query,
+            # upsert_product stamps a whole batch with one scraped_at
+            PriceObservation.created_at == scraped_at
+        )
+        .order_by(PriceObservation.price)
+    )
 
-        # Store return data before closing session
-        output = [
-            {
-                "id": p.id,
-                "title": p.title,
-                "source": p.source,
-                "link": p.link,
-                "image": p.image,
-                "store_logo": p.store_logo,
-                "price_numeric": p.price,
-                "price": f"₹{int(p.price):,}" if p.price else "₹0"
-            } for p in product_objects
-        ]
-        return output
-    finally:
-        db.close()
 
+def get_data_version(query, db: Optional[Session] = None) -> int:
+    """Current data version of a query; 0 if it has never been scraped."""
+    query = normalize_query(query)
+    with _session_scope(db) as db:
+        return db.scalar(_version_select(query)) or 0
 
-def get_products(query):
-    _require_db()
-    db: Session = SessionLocal()
+
+def get_rollup_rows(query, db: Optional[Session] = None):
+    """The query's daily rollups as ROLLUP_COLUMNS tuples, ordered by day and store."""
     query = normalize_query(query)
-    try:
-        products = db.query(Product).filter(Product.query == query).all()
-        return [
-            {
-                "id": p.id,
-                "title": p.title,
-                "source": p.source,
-                "link": p.link,
-                "image": p.image,
-                "store_logo": p.store_logo,
-                "price_numeric": p.price,
-                "price": f"₹{int(p.price):,}" if p.price else "₹0",
-                "created_at": p.created_at
-            } for p in products
-        ]
-    finally:
-        db.close()
+    with _session_scope(db) as db:
+        return db.execute(_rollup_rows_select(query)).all()
 
-def get_product(query):
-    _require_db()
-    db: Session = SessionLocal()
+
+def get_history_rows(query, db: Optional[Session] = None):
+    """Every price observation of the query as (created_at, store, price) tuples, oldest first."""
     query = normalize_query(query)
-    try:
-        return db.query(Product).filter(Product.query == query).first()
-    finally:
-        db.close()
+    with _session_scope(db) as db:
+        return db.execute(_history_rows_select(query)).all()
+
+
+def get_rollup_rows_by_query(queries, db: Optional[Session] = None):
+    """get_rollup_rows for many (normalized) queries in one statement: {query: rows}, absent if none."""
+    with _session_scope(db) as db:
+        return _rows_by_query(db.execute(_rollup_rows_by_query_select(list(queries))))
+
+
+def get_lowest_prices_since(since_by_query, db: Optional[Session] = None):
+    """get_lowest_price_since for {query: since} in one statement: {query: lowest price}."""
+    if not since_by_query:
+        return {}
+    with _session_scope(db) as db:
+        return dict(db.execute(_lowest_since_by_query_select(since_by_query)).all())
+
+
+def get_history_rows_by_query(queries, db: Optional[Session] = None):
+    """get_history_rows for many (normalized) queries in one statement: {query: rows}."""
+    with _session_scope(db) as db:
+        return _rows_by_query(db.execute(_history_rows_by_query_select(list(queries))))
+
+
+def get_lowest_price_since(query, since, db: Optional[Session] = None):
+    query = normalize_query(query)
+    with _session_scope(db) as db:
+        return db.scalar(_lowest_since_select(query, since))
+
+
+def get_scrape_stats(since_day, db: Optional[Session] = None):
+    """
+    Per-query price statistics for every query with an active alert, for the
+    scrape planner: {query: {count, price_sum, price_sum_sq, current_price,
+    last_scraped_at}}, aggregated from the rollups since since_day (a date).
+    current_price is the lowest per-store latest price on the query's most
+    recent day. Queries never scraped are absent.
+    """
+    alert_queries = select(Alert.query).where(Alert.is_active.is_(True)).distinct()
+    recent = (
+        select(
+            PriceRollup,
+            func.max(PriceRollup.day).over(partition_by=PriceRollup.query).label("last_day")
+        )
+        .where(PriceRollup.query.in_(alert_queries), PriceRollup.day >= since_day)
+        .subquery()
+    )
+    stmt = (
+        select(
+            recent.c.query,
+            func.sum(recent.c.count),
+            func.sum(recent.c.price_sum),
+            func.sum(recent.c.price_sum_sq),
+            func.min(recent.c.latest_price).filter(recent.c.day == recent.c.last_day),
+            func.max(recent.c.latest_at)
+        )
+        .group_by(recent.c.query)
+    )
+    with _session_scope(db) as db:
+        return {
+            query: {
+                "count": count,
+                "price_sum": price_sum,
+                "price_sum_sq": price_sum_sq,
+                "current_price": current_price,
+                "last_scraped_at": last_scraped_at
+            } for query, count, price_sum, price_sum_sq, current_price, last_scraped_at in db.execute(stmt)
+        }
+
+
+def get_latest_results(query, db: Optional[Session] = None):
+    """
+    Return (scraped_at, results) for the most recent scrape of a query,
+    or (None, []) if it has never been scraped.
+    """
+    query = normalize_query(query)
+    with _session_scope(db) as db:
+        scraped_at = db.scalar(_latest_scrape_select(query))
+        if scraped_at is None:
+            return None, []
+
+        rows = db.execute(_scrape_batch_select(query, scraped_at))
+        return scraped_at, [_listing_result(l, price) for l, price in rows]
+
+def get_product(query, db: Optional[Session] = None):
+    query = normalize_query(query)
+    with _session_scope(db) as db:
+        return db.query(Listing).filter(Listing.query == query).first()
 
 
 # -----------------------------
 # ALERTS
 # -----------------------------
-def add_alert(email, query, target_price, notify_method="email"):
-    _require_db()
-    db: Session = SessionLocal()
+def add_alert(email, query, target_price, notify_method="email", db: Optional[Session] = None):
     query = normalize_query(query)
-    try:
+    with _session_scope(db) as db:
         alert = Alert(
             email=email,
             query=query,
@@ -114,7 +487,7 @@ def add_alert(email, query, target_price, notify_method="email"):
             is_active=True
         )
         db.add(alert)
-        db.commit()
+        db.flush()
         db.refresh(alert)
         return {
             "id": alert.id,
@@ -125,14 +498,10 @@ def add_alert(email, query, target_price, notify_method="email"):
             "is_active": alert.is_active,
             "created_at": alert.created_at.isoformat() if alert.created_at else None
         }
-    finally:
-        db.close()
 
 
-def list_alerts(email: str):
-    _require_db()
-    db: Session = SessionLocal()
-    try:
+def list_alerts(email: str, db: Optional[Session] = None):
+    with _session_scope(db) as db:
         alerts = db.query(Alert).filter(Alert.email == email).all()
         return [
             {
@@ -145,14 +514,10 @@ def list_alerts(email: str):
                 "created_at": a.created_at.isoformat() if a.created_at else None
             } for a in alerts
         ]
-    finally:
-        db.close()
 
 
-def list_all_alerts():
-    _require_db()
-    db: Session = SessionLocal()
-    try:
+def list_all_alerts(db: Optional[Session] = None):
+    with _session_scope(db) as db:
         alerts = db.query(Alert).all()
         return [
             {
@@ -165,19 +530,48 @@ def list_all_alerts():
                 "created_at": a.created_at.isoformat() if a.created_at else None
             } for a in alerts
         ]
-    finally:
-        db.close()
 
 
-def update_alert_status(alert_id: int, is_active: bool):
+def iter_active_alerts_by_query(batch_size: int = 1000):
+    """
+    Yield (query, [alert dicts]) for every query with active alerts.
+
+    For the scheduler: the is_active filter runs in SQL (ix_alerts_active_query
+    also gives the ORDER BY), and rows are streamed from a server-side cursor
+    batch_size at a time, so memory is bounded by the largest single query's
+    alerts rather than the whole table. The session stays open until the
+    generator is exhausted or closed.
+    """
     _require_db()
     db: Session = SessionLocal()
     try:
+        stmt = (
+            select(Alert.id, Alert.email, Alert.query, Alert.target_price, Alert.last_alerted_price)
+            .where(Alert.is_active.is_(True))
+            .order_by(Alert.query, Alert.id)
+            .execution_options(yield_per=batch_size)
+        )
+        for query, rows in groupby(db.execute(stmt), key=lambda r: r.query):
+            yield query, [
+                {
+                    "id": r.id,
+                    "email": r.email,
+                    "query": r.query,
+                    "target_price": r.target_price,
+                    "last_alerted_price": r.last_alerted_price
+                } for r in rows
+            ]
+    finally:
+        db.close()
+
+
+def update_alert_status(alert_id: int, is_active: bool, db: Optional[Session] = None):
+    with _session_scope(db) as db:
         alert = db.query(Alert).filter(Alert.id == alert_id).first()
         if not alert:
             return None
         alert.is_active = is_active
-        db.commit()
+        db.flush()
         db.refresh(alert)
         return {
             "id": alert.id,
@@ -188,53 +582,72 @@ def update_alert_status(alert_id: int, is_active: bool):
             "is_active": alert.is_active,
             "created_at": alert.created_at.isoformat() if alert.created_at else None
         }
-    finally:
-        db.close()
 
 
-def delete_alert(alert_id: int):
-    _require_db()
-    db: Session = SessionLocal()
-    try:
+def delete_alert(alert_id: int, db: Optional[Session] = None):
+    with _session_scope(db) as db:
         alert = db.query(Alert).filter(Alert.id == alert_id).first()
         if not alert:
             return False
         db.delete(alert)
-        db.commit()
         return True
-    finally:
-        db.close()
 
-def update_alert_price(alert_id: int, last_price: float):
-    _require_db()
-    db: Session = SessionLocal()
-    try:
-        alert = db.query(Alert).filter(Alert.id == alert_id).first()
-        if alert:
-            alert.last_alerted_price = last_price
-            db.commit()
-            return True
-        return False
-    finally:
-        db.close()
+
+def mark_triggered_alerts(prices: dict, db: Optional[Session] = None):
+    """
+    Set-based alert evaluation for a batch of scrapes.
+
+    prices is {query: current lowest price}. One UPDATE ... FROM (VALUES ...)
+    finds every active alert whose target is met and whose last_alerted_price
+    differs by at least 1 (float noise), stores the new price on all of them
+    and returns the rows to notify. Marking and selecting in one statement
+    also means two overlapping runs cannot both notify the same alert.
+    """
+    if not prices:
+        return []
+
+    current = values(
+        column("query", String), column("price", Float),
+        name="current_prices"
+    ).data([(normalize_query(q), float(p)) for q, p in prices.items()])
+
+    stmt = (
+        update(Alert)
+        .where(
+            Alert.query == current.c.query,
+            Alert.is_active.is_(True),
+            Alert.target_price >= current.c.price,
+            or_(
+                Alert.last_alerted_price.is_(None),
+                func.abs(Alert.last_alerted_price - current.c.price) >= 1
+            )
+        )
+        .values(last_alerted_price=current.c.price)
+        .returning(Alert.id, Alert.email, Alert.query, Alert.target_price, current.c.price)
+        .execution_options(synchronize_session=False)
+    )
+    with _session_scope(db) as db:
+        return [
+            {
+                "id": r.id,
+                "email": r.email,
+                "query": r.query,
+                "target_price": r.target_price,
+                "current_price": r.price
+            } for r in db.execute(stmt)
+        ]
 
 
 # -----------------------------
 # USERS
 # -----------------------------
-def get_user_by_email(email: str):
-    _require_db()
-    db: Session = SessionLocal()
-    try:
+def get_user_by_email(email: str, db: Optional[Session] = None):
+    with _session_scope(db) as db:
         return db.query(User).filter(User.email == email).first()
-    finally:
-        db.close()
 
 
-def create_user(first_name, last_name, email, hashed_password):
-    _require_db()
-    db: Session = SessionLocal()
-    try:
+def create_user(first_name, last_name, email, hashed_password, db: Optional[Session] = None):
+    with _session_scope(db) as db:
         user = User(
             first_name=first_name,
             last_name=last_name,
@@ -242,40 +655,32 @@ def create_user(first_name, last_name, email, hashed_password):
             hashed_password=hashed_password
         )
         db.add(user)
-        db.commit()
+        db.flush()
         db.refresh(user)
         return user
-    finally:
-        db.close()
 
 
-def update_user(email: str, first_name: str, last_name: str):
-    _require_db()
-    db: Session = SessionLocal()
-    try:
+def update_user(email: str, first_name: str, last_name: str, db: Optional[Session] = None):
+    with _session_scope(db) as db:
         user = db.query(User).filter(User.email == email).first()
         if not user:
             return None
         user.first_name = first_name
         user.last_name = last_name
-        db.commit()
+        db.flush()
         db.refresh(user)
         return {
             "first_name": user.first_name,
             "last_name": user.last_name,
             "email": user.email
         }
-    finally:
-        db.close()
 
 
 # -----------------------------
 # WISHLIST
 # -----------------------------
-def add_to_wishlist(email: str, product_id: int):
-    _require_db()
-    db: Session = SessionLocal()
-    try:
+def add_to_wishlist(email: str, product_id: int, db: Optional[Session] = None):
+    with _session_scope(db) as db:
         existing = db.query(Wishlist).filter(
             Wishlist.email == email,
             Wishlist.product_id == product_id
@@ -284,19 +689,23 @@ def add_to_wishlist(email: str, product_id: int):
         if existing:
             return existing
 
-        wish_item = Wishlist(email=email, product_id=product_id)
+        # Remember the price at the time the item was added
+        added_price = (
+            db.query(PriceObservation.price)
+            .filter(PriceObservation.listing_id == product_id)
+            .order_by(PriceObservation.created_at.desc())
+            .limit(1)
+            .scalar()
+        )
+        wish_item = Wishlist(email=email, product_id=product_id, added_price=added_price)
         db.add(wish_item)
-        db.commit()
+        db.flush()
         db.refresh(wish_item)
         return wish_item
-    finally:
-        db.close()
 
 
-def remove_from_wishlist(email: str, product_id: int):
-    _require_db()
-    db: Session = SessionLocal()
-    try:
+def remove_from_wishlist(email: str, product_id: int, db: Optional[Session] = None):
+    with _session_scope(db) as db:
         wish_item = db.query(Wishlist).filter(
             Wishlist.email == email,
             Wishlist.product_id == product_id
@@ -304,34 +713,252 @@ def remove_from_wishlist(email: str, product_id: int):
 
         if wish_item:
             db.delete(wish_item)
-            db.commit()
             return True
         return False
-    finally:
-        db.close()
 
 
-def get_wishlist(email: str):
-    _require_db()
-    db: Session = SessionLocal()
-    try:
-        items = (
-            db.query(Product)
-            .join(Wishlist, Product.id == Wishlist.product_id)
-            .filter(Wishlist.email == email)
-            .all()
+def get_wishlist(email: str, db: Optional[Session] = None):
+    """
+    Wishlist items with live prices, in one statement for any number of items:
+      latest_price - the item's store's lowest price in its latest scrape of the query
+      price_change - latest_price minus the price when the item was added
+      lowest_price - cheapest listing of the query's latest scrape, any store
+    "price" is the latest price, or the added price if the store has no newer one.
+    """
+    with _session_scope(db) as db:
+        items = []
+        for l, w, latest_price, latest_at, lowest_price, lowest_source in db.execute(_wishlist_select(email)):
+            items.append({
+                "id": l.id,
+                "query": l.query,
+                "title": l.title,
+                "source": l.source,
+                "link": l.link,
+                "image": l.image,
+                "price": latest_price if latest_price is not None else w.added_price,
+                "added_price": w.added_price,
+                "latest_price": latest_price,
+                "latest_at": latest_at,
+                "price_change": (
+                    latest_price - w.added_price
+                    if latest_price is not None and w.added_price is not None else None
+                ),
+                "lowest_price": lowest_price,
+                "lowest_price_source": lowest_source,
+                "created_at": w.created_at
+            })
+        return items
+
+
+def _wishlist_select(email):
+    """
+    Two LATERAL probes per item, both on indexes: the rollups (query, store, day)
+    key gives the timestamp of a store's or the query's latest scrape, and
+    observations (listing_id, created_at) the prices stamped with it.
+    """
+    store_listing = aliased(Listing)
+    store_scraped_at = (
+        select(PriceRollup.latest_at)
+        .where(PriceRollup.query == Listing.query, PriceRollup.store == Listing.source)
+        .order_by(PriceRollup.day.desc())
+        .limit(1)
+        .correlate(Listing)
+        .scalar_subquery()
+    )
+    latest = (
+        select(
+            func.min(PriceObservation.price).label("price"),
+            func.max(PriceObservation.created_at).label("observed_at")
         )
-        return [
-            {
-                "id": p.id,
-                "query": p.query,
-                "title": p.title,
-                "source": p.source,
-                "link": p.link,
-                "image": p.image,
-                "price": p.price,
-                "created_at": p.created_at
-            } for p in items
+        .join(store_listing, store_listing.id == PriceObservation.listing_id)
+        .where(
+            store_listing.query == Listing.query,
+            store_listing.source == Listing.source,
+            PriceObservation.created_at == store_scraped_at
+        )
+        .lateral("latest")
+    )
+
+    query_listing = aliased(Listing)
+    query_scraped_at = (
+        select(func.max(PriceRollup.latest_at))
+        .where(PriceRollup.query == Listing.query)
+        .correlate(Listing)
+        .scalar_subquery()
+    )
+    lowest = (
+        select(PriceObservation.price, query_listing.source)
+        .join(query_listing, query_listing.id == PriceObservation.listing_id)
+        .where(
+            query_listing.query == Listing.query,
+            PriceObservation.created_at >= query_scraped_at - CURRENT_BATCH_WINDOW
+        )
+        .order_by(PriceObservation.price)
+        .limit(1)
+        .lateral("lowest")
+    )
+
+    return (
+        select(Listing, Wishlist, latest.c.price, latest.c.observed_at, lowest.c.price, lowest.c.source)
+        .join(Wishlist, Listing.id == Wishlist.product_id)
+        .outerjoin(latest, true())
+        .outerjoin(lowest, true())
+        .where(Wishlist.email == email)
+        .order_by(Wishlist.id)
+    )
+
+
+# -----------------------------
+# SCRAPE JOBS
+# A scheduler run is a set of per-query jobs. Workers on any node claim
+# pending jobs with FOR UPDATE SKIP LOCKED and hold them under a lease; a job
+# whose lease runs out (worker crashed) is claimable again until it has been
+# tried max_attempts times. A finished job keeps the scraped lowest price.
+# -----------------------------
+def enqueue_scrape_jobs(run_id: str, plan, db: Optional[Session] = None):
+    """Add [(query, priority)] to a run; queries already in it are left alone. Returns the number added."""
+    rows = [{"run_id": run_id, "query": query, "priority": priority} for query, priority in plan]
+    if not rows:
+        return 0
+    stmt = pg_insert(ScrapeJob).values(rows).on_conflict_do_nothing(
+        index_elements=[ScrapeJob.run_id, ScrapeJob.query]
+    )
+    with _session_scope(db) as db:
+        return db.execute(stmt).rowcount
+
+
+def claim_scrape_jobs(run_id: str, worker_id: str, limit: int, lease_seconds: int, max_attempts: int,
+                      db: Optional[Session] = None):
+    """Lease up to limit claimable jobs of a run to worker_id, highest priority first."""
+    now = datetime.utcnow()
+    expired = and_(ScrapeJob.status == "running", ScrapeJob.leased_until < now)
+
+    # Jobs whose last allowed attempt died with its worker will not be retried
+    give_up = (
+        update(ScrapeJob)
+        .where(ScrapeJob.run_id == run_id, expired, ScrapeJob.attempts >= max_attempts)
+        .values(status="failed", last_error="lease expired", finished_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    claimable = (
+        select(ScrapeJob.id)
+        .where(
+            ScrapeJob.run_id == run_id,
+            ScrapeJob.attempts < max_attempts,
+            or_(ScrapeJob.status == "pending", expired)
+        )
+        .order_by(ScrapeJob.priority.desc(), ScrapeJob.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    claim = (
+        update(ScrapeJob)
+        .where(ScrapeJob.id.in_(claimable.scalar_subquery()))
+        .values(
+            status="running",
+            worker_id=worker_id,
+            leased_until=now + timedelta(seconds=lease_seconds),
+            attempts=ScrapeJob.attempts + 1
+        )
+        .returning(ScrapeJob.id, ScrapeJob.query, ScrapeJob.priority, ScrapeJob.attempts)
+        .execution_options(synchronize_session=False)
+    )
+    with _session_scope(db) as db:
+        db.execute(give_up)
+        jobs = [
+            {"id": r.id, "query": r.query, "priority": r.priority, "attempts": r.attempts}
+            for r in db.execute(claim)
         ]
-    finally:
-        db.close()
\ No newline at end of file
+    return sorted(jobs, key=lambda j: (-j["priority"], j["id"]))
+
+
+def complete_scrape_jobs(worker_id: str, lowest_prices: dict, db: Optional[Session] = None):
+    """
+    Mark jobs done with their checkpoint, {job_id: lowest price or None}. A job
+    whose lease was taken over by another worker is left to that worker.
+    """
+    if not lowest_prices:
+        return
+    jobs = ScrapeJob.__table__
+    stmt = (
+        update(jobs)
+        .where(jobs.c.id == bindparam("job_id"), jobs.c.worker_id == worker_id, jobs.c.status == "running")
+        .values(status="done", lowest_price=bindparam("price"), leased_until=None,
+                finished_at=datetime.utcnow())
+    )
+    with _session_scope(db) as db:
+        db.execute(stmt, [{"job_id": job_id, "price": price} for job_id, price in lowest_prices.items()])
+
+
+def fail_scrape_job(job_id: int, worker_id: str, error: str, max_attempts: int, db: Optional[Session] = None):
+    """Release a failed job for a retry, or fail it for good once it has used max_attempts."""
+    stmt = (
+        update(ScrapeJob)
+        .where(ScrapeJob.id == job_id, ScrapeJob.worker_id == worker_id, ScrapeJob.status == "running")
+        .values(
+            status=case((ScrapeJob.attempts >= max_attempts, "failed"), else_="pending"),
+            leased_until=None,
+            last_error=error[:500],
+            finished_at=case((ScrapeJob.attempts >= max_attempts, datetime.utcnow()), else_=None)
+        )
+        .execution_options(synchronize_session=False)
+    )
+    with _session_scope(db) as db:
+        db.execute(stmt)
+
+
+def get_scrape_run(run_id: str, db: Optional[Session] = None):
+    """Job counts by status for a run, e.g. {"pending": 3, "running": 8, "done": 120}."""
+    stmt = (
+        select(ScrapeJob.status, func.count())
+        .where(ScrapeJob.run_id == run_id)
+        .group_by(ScrapeJob.status)
+    )
+    with _session_scope(db) as db:
+        return dict(db.execute(stmt).all())
+
+
+def latest_scrape_run(db: Optional[Session] = None):
+    """run_id of the most recently enqueued run, or None."""
+    stmt = select(ScrapeJob.run_id).order_by(ScrapeJob.created_at.desc(), ScrapeJob.id.desc()).limit(1)
+    with _session_scope(db) as db:
+        return db.scalar(stmt)
+
+
+# -----------------------------
+# AI SUMMARIES
+# -----------------------------
+def get_summary(query: str, max_age: timedelta, db: Optional[Session] = None):
+    """Cached summary data for a query if it is younger than max_age, else None."""
+    query = normalize_query(query)
+    with _session_scope(db) as db:
+        return db.scalar(_summary_select(query, max_age))
+
+
+def save_summary(query: str, data: dict, db: Optional[Session] = None):
+    query = normalize_query(query)
+    with _session_scope(db) as db:
+        db.execute(_summary_upsert(query, data))
+
+
+def _summary_select(query, max_age):
+    return select(ProductSummaryCache.data).where(
+        ProductSummaryCache.query == query,
+        ProductSummaryCache.created_at >= datetime.utcnow() - max_age
+    )
+
+
+def _summary_upsert(query, data):
+    stmt = pg_insert(ProductSummaryCache).values(query=query, data=data, created_at=datetime.utcnow())
+    return stmt.on_conflict_do_update(
+        index_elements=[ProductSummaryCache.query],
+        set_={"data": stmt.excluded.data, "created_at": stmt.excluded.created_at}
+    )
+
+
+# Every public storage call shows up in /api/admin/metrics (pure helpers and listener
+# registration excluded).
+metrics.instrument_module(
+    globals(), "storage",
+    exclude=("normalize_query", "after_commit", "add_ingest_listener", "remove_ingest_listener")
+)
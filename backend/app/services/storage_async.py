@@ -0,0 +1,162 @@
+"""
+Async variants of the storage functions on the request path (/compare,
+/analytics, /summary).
+
+They issue the same statements as storage.py (the builders live there) on the
+async engine, so a request waiting on Postgres does not hold a threadpool
+thread. When the async driver is unavailable they run the sync function in a
+worker thread instead, so callers can always await them.
+"""
+import asyncio
+from datetime import datetime, timedelta
+from sqlalchemy import insert
+
+from ..core import metrics
+from ..core.database import get_async_sessionmaker
+from ..models.models import PriceObservation
+from . import storage
+from .storage import normalize_query
+
+
+# -----------------------------
+# PRODUCTS
+# -----------------------------
+async def upsert_product(query, results):
+    async_session = get_async_sessionmaker()
+    if async_session is None:
+        return await asyncio.to_thread(storage.upsert_product, query, results)
+
+    query = normalize_query(query)
+    if not results:
+        return []
+
+    scraped_at = datetime.utcnow()
+    listings, prices = storage._scrape_batch(query, results)
+
+    async with async_session() as db:
+        rows = await db.execute(storage._listings_upsert(listings))
+        listing_ids = {(source, link): listing_id for listing_id, source, link in rows}
+        await db.execute(insert(PriceObservation), storage._observation_rows(listing_ids, prices, scraped_at))
+        await db.execute(storage._rollups_upsert(query, prices, scraped_at))
+        await db.execute(storage._version_bump(query, scraped_at))
+        await db.commit()
+
+    stored = storage._scrape_results(results, listing_ids)
+    storage._notify_ingest(query, stored)
+    return stored
+
+
+async def get_data_version(query):
+    async_session = get_async_sessionmaker()
+    if async_session is None:
+        return await asyncio.to_thread(storage.get_data_version, query)
+
+    query = normalize_query(query)
+    async with async_session() as db:
+        return await db.scalar(storage._version_select(query)) or 0
+
+
+async def get_rollup_rows(query):
+    async_session = get_async_sessionmaker()
+    if async_session is None:
+        return await asyncio.to_thread(storage.get_rollup_rows, query)
+
+    query = normalize_query(query)
+    async with async_session() as db:
+        return (await db.execute(storage._rollup_rows_select(query))).all()
+
+
+async def get_history_rows(query):
+    async_session = get_async_sessionmaker()
+    if async_session is None:
+        return await asyncio.to_thread(storage.get_history_rows, query)
+
+    query = normalize_query(query)
+    async with async_session() as db:
+        return (await db.execute(storage._history_rows_select(query))).all()
+
+
+async def get_rollup_rows_by_query(queries):
+    async_session = get_async_sessionmaker()
+    if async_session is None:
+        return await asyncio.to_thread(storage.get_rollup_rows_by_query, queries)
+
+    async with async_session() as db:
+        return storage._rows_by_query(await db.execute(storage._rollup_rows_by_query_select(list(queries))))
+
+
+async def get_lowest_prices_since(since_by_query):
+    async_session = get_async_sessionmaker()
+    if async_session is None:
+        return await asyncio.to_thread(storage.get_lowest_prices_since, since_by_query)
+
+    if not since_by_query:
+        return {}
+    async with async_session() as db:
+        return dict((await db.execute(storage._lowest_since_by_query_select(since_by_query))).all())
+
+
+async def get_history_rows_by_query(queries):
+    async_session = get_async_sessionmaker()
+    if async_session is None:
+        return await asyncio.to_thread(storage.get_history_rows_by_query, queries)
+
+    async with async_session() as db:
+        return storage._rows_by_query(await db.execute(storage._history_rows_by_query_select(list(queries))))
+
+
+async def get_lowest_price_since(query, since):
+    async_session = get_async_sessionmaker()
+    if async_session is None:
+        return await asyncio.to_thread(storage.get_lowest_price_since, query, since)
+
+    query = normalize_query(query)
+    async with async_session() as db:
+        return await db.scalar(storage._lowest_since_select(query, since))
+
+
+async def get_latest_results(query):
+    """
+    Return (scraped_at, results) for the most recent scrape of a query,
+    or (None, []) if it has never been scraped.
+    """
+    async_session = get_async_sessionmaker()
+    if async_session is None:
+        return await asyncio.to_thread(storage.get_latest_results, query)
+
+    query = normalize_query(query)
+    async with async_session() as db:
+        scraped_at = await db.scalar(storage._latest_scrape_select(query))
+        if scraped_at is None:
+            return None, []
+
+        rows = await db.execute(storage._scrape_batch_select(query, scraped_at))
+        return scraped_at, [storage._listing_result(l, price) for l, price in rows]
+
+
+# -----------------------------
+# AI SUMMARIES
+# -----------------------------
+async def get_summary(query: str, max_age: timedelta):
+    """Cached summary data for a query if it is younger than max_age, else None."""
+    async_session = get_async_sessionmaker()
+    if async_session is None:
+        return await asyncio.to_thread(storage.get_summary, query, max_age)
+
+    query = normalize_query(query)
+    async with async_session() as db:
+        return await db.scalar(storage._summary_select(query, max_age))
+
+
+async def save_summary(query: str, data: dict):
+    async_session = get_async_sessionmaker()
+    if async_session is None:
+        return await asyncio.to_thread(storage.save_summary, query, data)
+
+    query = normalize_query(query)
+    async with async_session() as db:
+        await db.execute(storage._summary_upsert(query, data))
+        await db.commit()
+
+
+metrics.instrument_module(globals(), "storage_async")
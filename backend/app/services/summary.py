@@ -1,9 +1,18 @@
+import asyncio
 import json
-from google import genai
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from datetime import timedelta
 from pydantic import BaseModel, Field, field_validator, ValidationError
 from typing import List
-from google.genai import types
-from ..core.config import GEMINI_API_KEY
+from . import storage, storage_async
+from ..core import metrics
+from ..core.config import GEMINI_API_KEY, SUMMARY_CACHE_TTL, SUMMARY_CACHE_SIZE
+
+logger = logging.getLogger("pricenest")
 
 # -----------------------------------------------
 # Pydantic Schema for LLM output
@@ -35,19 +44,133 @@ class ProductSummary(BaseModel):
 # -----------------------------------------------
 # Configure Gemini
 # -----------------------------------------------
-client = genai.Client(api_key=GEMINI_API_KEY) if GEMINI_API_KEY else None
+SUMMARY_MODEL = "gemini-2.5-flash-lite"
+
+# google.genai takes ~0.5s to import, so the SDK and the client are loaded on
+# the first summary request instead of on every cold start.
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """The shared Gemini client, or None when GEMINI_API_KEY is not set."""
+    global _client
+    if _client is None and GEMINI_API_KEY:
+        with _client_lock:
+            if _client is None:
+                from google import genai
+                _client = genai.Client(api_key=GEMINI_API_KEY)
+    return _client
+
+
+# -----------------------------------------------
+# Summary cache
+# -----------------------------------------------
+# Tier 1: per-process LRU of {query: (cached_at, data)}.
+# Tier 2: product_summaries table, shared by every instance.
+# Concurrent misses for the same query wait on one in-flight Future, so a burst
+# of requests for an uncached product costs a single Gemini call. If the
+# leading request is cancelled (its client went away), a waiting one takes over.
+_lru = OrderedDict()
+_lru_lock = threading.Lock()
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+class _LeaderCancelled(RuntimeError):
+    """Set on the in-flight Future when the request loading it was cancelled."""
+
+
+def _lru_get(key: str):
+    with _lru_lock:
+        entry = _lru.get(key)
+        if entry is None:
+            return None
+        cached_at, data = entry
+        if time.monotonic() - cached_at > SUMMARY_CACHE_TTL:
+            del _lru[key]
+            return None
+        _lru.move_to_end(key)
+        return data
+
+
+def _lru_put(key: str, data: dict):
+    with _lru_lock:
+        _lru[key] = (time.monotonic(), data)
+        _lru.move_to_end(key)
+        while len(_lru) > SUMMARY_CACHE_SIZE:
+            _lru.popitem(last=False)
+
+
+async def _load_summary_async(key: str, query: str) -> dict:
+    try:
+        data = await storage_async.get_summary(key, timedelta(seconds=SUMMARY_CACHE_TTL))
+        if data is not None:
+            _lru_put(key, data)
+            return {"success": True, "data": data}
+    except Exception as e:
+        logger.warning(f"[SUMMARY] Cache lookup failed for {key}: {e}")
+
+    result = await _generate_summary_async(query)
+    if result.get("success"):
+        _lru_put(key, result["data"])
+        try:
+            await storage_async.save_summary(key, result["data"])
+        except Exception as e:
+            logger.warning(f"[SUMMARY] Cache write failed for {key}: {e}")
+    return result
 
 
-def get_product_summary(query: str) -> dict:
+async def get_product_summary_async(query: str) -> dict:
     """
     Given a product search query,
-    returns a Pydantic-validated AI overview similar to Google's AI Overview.
+    returns a Pydantic-validated AI overview similar to Google's AI Overview,
+    served from cache when a recent one exists. Concurrent misses for a query
+    share one Gemini call.
     """
+    key = storage.normalize_query(query)
+
+    while True:
+        data = _lru_get(key)
+        if data is not None:
+            return {"success": True, "data": data}
+
+        with _inflight_lock:
+            future = _inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                _inflight[key] = future
+
+        if leader:
+            break
+        waiter = asyncio.wrap_future(future)
+        # Read even when this follower is cancelled first, so the error is not logged as unretrieved
+        waiter.add_done_callback(lambda f: f.cancelled() or f.exception())
+        try:
+            # Shielded: a follower's own cancellation must not cancel the shared Future
+            return await asyncio.shield(waiter)
+        except _LeaderCancelled:
+            continue
+
+    try:
+        result = await _load_summary_async(key, query)
+        future.set_result(result)
+        return result
+    except asyncio.CancelledError:
+        # Not forwarded: the followers retry, and one of them leads the next load
+        future.set_exception(_LeaderCancelled(f"summary load for {key} was cancelled"))
+        raise
+    except Exception as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _inflight_lock:
+            del _inflight[key]
 
-    if not client:
-        return {"error": "GEMINI_API_KEY is not set in environment variables."}
 
-    prompt = f"""You are a helpful product overview assistant. The user searched for: "{query}".
+def _summary_prompt(query: str) -> str:
+    return f"""You are a helpful product overview assistant. The user searched for: "{query}".
 
 Give a concise, factual AI overview of this product — exactly like Google's AI Overview panel.
 
@@ -71,15 +194,19 @@ Rules:
 - If the query is vague or not a real product, still return the JSON with a helpful general overview.
 - Return ONLY the raw JSON. No markdown, no explanation, no code blocks."""
 
+
+def _summary_config():
+    from google.genai import types
+
+    return types.GenerateContentConfig(
+        tools=[types.Tool(google_search=types.GoogleSearch())]
+    )
+
+
+def _parse_summary(raw: str) -> dict:
+    """Validate Gemini's reply against ProductSummary."""
     try:
-        response = client.models.generate_content(
-            model="gemini-2.5-flash-lite",
-            contents=prompt,
-            config=types.GenerateContentConfig(
-                tools=[types.Tool(google_search=types.GoogleSearch())]
-            )
-        )
-        raw = response.text.strip()
+        raw = raw.strip()
 
         # Strip accidental markdown fences if present
         if raw.startswith("```"):
@@ -105,5 +232,21 @@ Rules:
             "details": e.errors()
         }
 
+
+async def _generate_summary_async(query: str) -> dict:
+    """Call Gemini (the SDK's async client) and validate its output against ProductSummary."""
+
+    client = get_client()
+    if not client:
+        return {"error": "GEMINI_API_KEY is not set in environment variables."}
+
+    try:
+        with metrics.GEMINI_REQUEST.time(mode="async"):
+            response = await client.aio.models.generate_content(
+                model=SUMMARY_MODEL,
+                contents=_summary_prompt(query),
+                config=_summary_config()
+            )
+        return _parse_summary(response.text)
     except Exception as e:
-        return {"error": str(e)}
\ No newline at end of file
+        return {"error": str(e)}
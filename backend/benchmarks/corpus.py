@@ -0,0 +1,111 @@
+"""
+Corpus of SerpAPI responses for offline benchmarks.
+
+Each fixture in fixtures/ is a JSON file:
+
+    {"query": "...", "source": "serpapi" | "synthetic", "recorded_at": "...", "response": {...}}
+
+where "response" is exactly what GoogleSearch(...).get_dict() returned. Record real
+ones with `python backend/scripts/bench_scraper.py record "<query>" ...` (needs
+SERPAPI_KEY); the synthetic ones are produced by build_response() so the suite
+runs out of the box.
+"""
+import json
+import random
+from datetime import datetime
+from pathlib import Path
+
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures"
+
+# Street prices in INR per category, so each synthetic product is priced like
+# the real thing (store prices and snippets vary by a few percent around a base).
+PRICE_RANGES = {
+    "earbuds": (999, 2_499),
+    "phone": (110_000, 135_000),
+    "laptop": (99_000, 125_000),
+    "tv": (55_000, 85_000),
+}
+
+STORES = ["amazon.in", "flipkart.com", "croma.com", "reliancedigital.in", "vijaysales.com",
+          "tatacliq.com", "jiomart.com", "poorvika.com", "sangeethamobiles.com", "shopclues.com"]
+
+
+def load_corpus(directory: Path = FIXTURES_DIR) -> list[dict]:
+    """All fixtures in a directory, sorted by file name."""
+    return [json.loads(path.read_text(encoding="utf-8")) for path in sorted(directory.glob("*.json"))]
+
+
+def save_fixture(name: str, query: str, response: dict, source: str, directory: Path = FIXTURES_DIR) -> Path:
+    path = directory / f"{name}.json"
+    fixture = {
+        "query": query,
+        "source": source,
+        "recorded_at": datetime.utcnow().isoformat(timespec="seconds"),
+        "response": response,
+    }
+    path.write_text(json.dumps(fixture, ensure_ascii=False, indent=1), encoding="utf-8")
+    return path
+
+
+def build_response(n_organic: int = 40, n_pricing: int = 8, seed: int = 0,
+                   product: str = "Samsung Galaxy S24 Ultra", category: str = "phone") -> dict:
+    """A SerpAPI-shaped response with a realistic mix of usable and filtered items."""
+    rnd = random.Random(seed)
+    base = rnd.randint(*PRICE_RANGES[category])
+    older = product.rsplit(" ", 1)[0] + " Lite"
+
+    pricing = []
+    for i in range(n_pricing):
+        store = STORES[i % len(STORES)]
+        item = {
+            "name": store.split(".")[0].title(),
+            "link": f"https://www.{store}/{product.lower().replace(' ', '-')}/p/{rnd.randint(1000, 9999)}",
+            "description": f"{product} 5G ({rnd.choice(['256', '512'])} GB)",
+            "extracted_price": round(base * rnd.uniform(0.95, 1.05)),
+            "price": f"₹{base:,}",
+            "thumbnail": f"https://images.example.com/{i}.jpg",
+        }
+        if rnd.random() < 0.15:
+            item["details"] = f"No Cost EMI from ₹{base // 24:,}/month"
+        pricing.append(item)
+
+    organic = []
+    for i in range(n_organic):
+        store = rnd.choice(STORES + [f"shop{i}.in"])
+        price = round(base * rnd.uniform(0.9, 1.1))
+        kind = rnd.random()
+        if kind < 0.55:
+            title = f"{product} 5G - Buy at ₹{price:,} | {store}"
+            snippet = (f"Buy {product} online at best price ₹{price:,}. "
+                       f"EMI starting at ₹{price // 12:,} per month. Free delivery.")
+        elif kind < 0.75:
+            title = f"{product} review - {store}"
+            snippet = f"{product} launched in India at Rs. {price:,}. Specs, camera, battery."
+        elif kind < 0.9:
+            title = f"{older} price in India - {store}"
+            snippet = f"{older} from ₹{price // 2:,}. No cost EMI ₹{price // 48:,}/mo."
+        else:
+            title = f"{product} cover - {store}"
+            snippet = f"Back cover for {product} at ₹{rnd.randint(199, 999)}"
+        organic.append({
+            "position": i + 1,
+            "title": title,
+            "link": f"https://www.{store}/item/{rnd.randint(10_000, 99_999)}",
+            "snippet": snippet,
+            "favicon": f"https://www.{store}/favicon.ico",
+            "thumbnail": f"https://images.example.com/o{i}.jpg" if rnd.random() < 0.5 else None,
+        })
+
+    response = {
+        "search_metadata": {"status": "Success", "total_time_taken": round(rnd.uniform(1.5, 6.0), 2)},
+        "search_parameters": {"q": f"{product.lower()} buy price", "location_used": "India",
+                              "hl": "en", "gl": "in", "num": "60"},
+        "organic_results": organic,
+    }
+    if pricing:
+        response["product_result"] = {
+            "title": product,
+            "thumbnails": ["https://images.example.com/main.jpg"],
+            "pricing": pricing,
+        }
+    return response
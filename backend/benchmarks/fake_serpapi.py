@@ -0,0 +1,54 @@
+"""
+Drop-in fakes for the SerpAPI call in services/scraper.py, answering from the
+fixture corpus so the full compare_product path runs without network or quota.
+
+    with patched_google_search():
+        compare_product("samsung galaxy s24 ultra")
+"""
+import asyncio
+import itertools
+import time
+from contextlib import contextmanager
+
+from backend.app.services import scraper
+from .corpus import load_corpus
+
+
+def fake_google_search(corpus: list[dict] = None, latency: float = 0.0):
+    """A replacement for scraper.google_search; unknown queries cycle through the corpus."""
+    corpus = corpus if corpus is not None else load_corpus()
+    by_query = {scraper.build_search_query(f["query"]): f["response"] for f in corpus}
+    fallback = itertools.cycle(f["response"] for f in corpus)
+
+    def google_search(query: str, timeout: float = None):
+        if latency:
+            time.sleep(latency)
+        return by_query.get(query) or next(fallback)
+
+    return google_search
+
+
+def fake_google_search_async(corpus: list[dict] = None, latency: float = 0.0):
+    """The same, for scraper.google_search_async (the /compare route)."""
+    search = fake_google_search(corpus)
+
+    async def google_search_async(query: str, timeout: float = None):
+        if latency:
+            await asyncio.sleep(latency)
+        return search(query)
+
+    return google_search_async
+
+
+@contextmanager
+def patched_google_search(corpus: list[dict] = None, latency: float = 0.0):
+    """Route scraper.google_search and google_search_async (and so compare_product
+    and its async twin) to the corpus for the duration."""
+    corpus = corpus if corpus is not None else load_corpus()
+    original, original_async = scraper.google_search, scraper.google_search_async
+    scraper.google_search = fake_google_search(corpus, latency)
+    scraper.google_search_async = fake_google_search_async(corpus, latency)
+    try:
+        yield scraper.google_search
+    finally:
+        scraper.google_search, scraper.google_search_async = original, original_async
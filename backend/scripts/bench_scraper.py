@@ -0,0 +1,163 @@
+"""
+Offline benchmark suite for the scraper parsing path.
+
+Runs extract_results, is_relevant_title, extract_prices, filter_emi_outliers and the
+full compare_product path (with google_search replaced by the fixture corpus) over
+the SerpAPI responses in backend/benchmarks/fixtures, and reports throughput and
+p50/p99 latency per call. No network, no SerpAPI quota.
+
+    python backend/scripts/bench_scraper.py                        # run the suite
+    python backend/scripts/bench_scraper.py --save base.json       # keep results as a baseline
+    python backend/scripts/bench_scraper.py --baseline base.json   # exit 1 on regressions
+    python backend/scripts/bench_scraper.py record "iphone 15" ... # record real responses (SERPAPI_KEY)
+    python backend/scripts/bench_scraper.py generate               # rewrite the synthetic fixtures
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+# Add the project root to sys.path
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+if str(BASE_DIR) not in sys.path:
+    sys.path.append(str(BASE_DIR))
+
+from backend.app.services import scraper
+from backend.benchmarks.corpus import FIXTURES_DIR, build_response, load_corpus, save_fixture
+from backend.benchmarks.fake_serpapi import patched_google_search
+
+# name -> (organic results, pricing rows, product, corpus.PRICE_RANGES category)
+SYNTHETIC_FIXTURES = {
+    "synthetic_small": (8, 0, "Boat Airdopes 141", "earbuds"),
+    "synthetic_medium": (40, 8, "Samsung Galaxy S24 Ultra", "phone"),
+    "synthetic_large": (100, 20, "Apple MacBook Air M3", "laptop"),
+    "synthetic_xlarge": (250, 40, "Sony Bravia 55 inch 4K TV", "tv"),
+}
+
+
+def _time_calls(fn, args_list, repeat):
+    """Wall-clock ns per call for fn(*args) over args_list, `repeat` rounds after one warm-up."""
+    for args in args_list:
+        fn(*args)
+    timings = []
+    for _ in range(repeat):
+        for args in args_list:
+            start = time.perf_counter_ns()
+            fn(*args)
+            timings.append(time.perf_counter_ns() - start)
+    return timings
+
+
+def _summarize(timings):
+    timings = sorted(timings)
+    total = sum(timings)
+    n = len(timings)
+    return {
+        "calls": n,
+        "per_second": n / (total / 1e9) if total else 0.0,
+        "p50_us": timings[n // 2] / 1000,
+        "p99_us": timings[max(0, int(n * 0.99) - 1)] / 1000,
+    }
+
+
+def run_suite(corpus, repeat):
+    pairs = [(f["response"], f["query"]) for f in corpus]
+    items = [item for f in corpus for item in f["response"].get("organic_results", [])]
+    titles = [(item.get("title") or "", f["query"]) for f in corpus
+              for item in f["response"].get("organic_results", [])]
+    texts = [((item.get("title") or "") + " " + item.get("snippet", ""),) for item in items]
+    extracted = [(scraper.extract_results(data, query),) for data, query in pairs]
+
+    results = {
+        "extract_results": _summarize(_time_calls(scraper.extract_results, pairs, repeat)),
+        "is_relevant_title": _summarize(_time_calls(scraper.is_relevant_title, titles, repeat)),
+        "extract_prices": _summarize(_time_calls(scraper.extract_prices, texts, repeat)),
+        "filter_emi_outliers": _summarize(_time_calls(scraper.filter_emi_outliers, extracted, repeat)),
+    }
+    with patched_google_search(corpus):
+        queries = [(f["query"],) for f in corpus]
+        results["compare_product"] = _summarize(_time_calls(scraper.compare_product, queries, repeat))
+    return results
+
+
+def print_results(results, corpus):
+    sizes = sorted(len(f["response"].get("organic_results", [])) for f in corpus)
+    print(f"Corpus: {len(corpus)} responses, {sizes[0]}-{sizes[-1]} organic results each\n")
+    print(f"{'benchmark':<22}{'calls':>9}{'calls/s':>12}{'p50 µs':>10}{'p99 µs':>10}")
+    for name, r in results.items():
+        print(f"{name:<22}{r['calls']:>9}{r['per_second']:>12.0f}{r['p50_us']:>10.1f}{r['p99_us']:>10.1f}")
+
+
+def compare_baseline(results, baseline, tolerance):
+    """Names of benchmarks whose throughput dropped or p99 rose by more than tolerance."""
+    regressions = []
+    for name, r in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        slower = r["per_second"] < base["per_second"] * (1 - tolerance)
+        spikier = r["p99_us"] > base["p99_us"] * (1 + tolerance)
+        if slower or spikier:
+            regressions.append(
+                f"{name}: {base['per_second']:.0f} -> {r['per_second']:.0f} calls/s, "
+                f"p99 {base['p99_us']:.1f} -> {r['p99_us']:.1f} µs"
+            )
+    return regressions
+
+
+def record(queries):
+    """Save live GoogleSearch(...).get_dict() payloads as fixtures (spends SerpAPI quota)."""
+    if not scraper.SERPAPI_KEY:
+        sys.exit("SERPAPI_KEY is not set")
+    for query in queries:
+        response = scraper.google_search(scraper.build_search_query(query))
+        name = "serpapi_" + "_".join(scraper._tokenize(query))
+        print(f"Recorded {save_fixture(name, query, response, source='serpapi')}")
+
+
+def generate():
+    for seed, (name, (n_organic, n_pricing, product, category)) in enumerate(SYNTHETIC_FIXTURES.items()):
+        response = build_response(n_organic, n_pricing, seed=seed, product=product, category=category)
+        print(f"Wrote {save_fixture(name, product.lower(), response, source='synthetic')}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", nargs="?", default="run", choices=["run", "record", "generate"])
+    parser.add_argument("queries", nargs="*", help="queries to record (record only)")
+    parser.add_argument("--fixtures", type=Path, default=FIXTURES_DIR, help="fixture directory")
+    parser.add_argument("--repeat", type=int, default=200, help="rounds over the corpus")
+    parser.add_argument("--save", type=Path, help="write results as JSON")
+    parser.add_argument("--baseline", type=Path, help="compare against saved results")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed regression ratio (timings are noisy)")
+    args = parser.parse_args()
+
+    if args.command == "record":
+        record(args.queries)
+        return
+    if args.command == "generate":
+        generate()
+        return
+
+    corpus = load_corpus(args.fixtures)
+    if not corpus:
+        sys.exit(f"No fixtures in {args.fixtures}")
+
+    results = run_suite(corpus, args.repeat)
+    print_results(results, corpus)
+
+    if args.save:
+        args.save.write_text(json.dumps(results, indent=2))
+    if args.baseline:
+        regressions = compare_baseline(results, json.loads(args.baseline.read_text()), args.tolerance)
+        if regressions:
+            print("\nRegressions beyond {:.0%}:".format(args.tolerance))
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"\nNo regressions beyond {args.tolerance:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
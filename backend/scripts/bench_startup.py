@@ -0,0 +1,127 @@
+"""
+Cold-start benchmark for the Vercel entry point (api/index.py).
+
+Each sample is a fresh interpreter that imports the app the way Vercel does
+and serves one request in-process, so it measures what a serverless cold start
+pays: import time, time to the first response of a route, and which heavy
+dependencies that route ended up loading. Run it on two revisions to compare:
+
+    python backend/scripts/bench_startup.py
+    python backend/scripts/bench_startup.py --repeat 10 --route "GET /health"
+    python backend/scripts/bench_startup.py --importtime      # heaviest imports
+
+SerpAPI answers come from the fixture corpus (no network or quota); routes that
+need the database use DATABASE_URL as configured, or answer 503 without one.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+# Add the project root to sys.path
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+if str(BASE_DIR) not in sys.path:
+    sys.path.append(str(BASE_DIR))
+
+ROUTES = {
+    "GET /health": ("GET", "/health", None),
+    "POST /api/auth/login": ("POST", "/api/auth/login", {"email": "bench@example.com", "password": "not-the-password"}),
+    "GET /api/alerts": ("GET", "/api/alerts?email=bench@example.com", None),
+    "GET /api/wishlist": ("GET", "/api/wishlist?email=bench@example.com", None),
+    "GET /api/compare": ("GET", "/api/compare?q=samsung+galaxy+s24+ultra", None),
+    "GET /api/analytics": ("GET", "/api/analytics?q=samsung+galaxy+s24+ultra", None),
+    "GET /api/analytics (raw)": ("GET", "/api/analytics?q=samsung+galaxy+s24+ultra&resolution=raw", None),
+    "POST /api/summary": ("POST", "/api/summary", {"query": "samsung galaxy s24 ultra"}),
+}
+
+# Dependencies worth keeping off routes that do not need them
+HEAVY_MODULES = ("pandas", "numpy", "google.genai", "serpapi", "httpx", "bcrypt", "asyncpg")
+
+
+def _child(route: str):
+    """Runs in a fresh interpreter: import the entry point, serve one request, report."""
+    started = time.perf_counter()
+    sys.path.insert(0, str(BASE_DIR / "api"))
+    import index  # api/index.py, the Vercel entry point
+    imported = time.perf_counter()
+    loaded = [m for m in HEAVY_MODULES if m in sys.modules]
+
+    from fastapi.testclient import TestClient
+    from backend.benchmarks.fake_serpapi import patched_google_search
+
+    method, path, body = ROUTES[route]
+    client = TestClient(index.app, raise_server_exceptions=False)
+    # TestClient itself (and the httpx it imports) is not part of a cold start
+    before_request = set(sys.modules)
+    client_ready = time.perf_counter()
+    with patched_google_search():
+        response = client.request(method, path, json=body)
+    responded = time.perf_counter()
+
+    print(json.dumps({
+        "status": response.status_code,
+        "import": imported - started,
+        "first_response": responded - client_ready,
+        "loaded": loaded + [m for m in HEAVY_MODULES if m in sys.modules and m not in before_request],
+    }))
+
+
+def _sample(route: str) -> dict:
+    output = subprocess.run(
+        [sys.executable, __file__, "--child", route],
+        capture_output=True, text=True, check=True, env=dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run(routes: list[str], repeat: int):
+    print(f"Cold start: median of {repeat} fresh interpreters per route")
+    print(f"{'route':<28} {'status':>6} {'import':>9} {'1st resp':>9} {'total':>9}  heavy modules loaded")
+    for route in routes:
+        _sample(route)  # warm the OS page cache and .pyc files
+        samples = [_sample(route) for _ in range(repeat)]
+        imports = statistics.median(s["import"] for s in samples) * 1000
+        first = statistics.median(s["first_response"] for s in samples) * 1000
+        print(f"{route:<28} {samples[-1]['status']:>6} {imports:8.0f}ms {first:8.0f}ms {imports + first:8.0f}ms  "
+              f"{', '.join(samples[-1]['loaded']) or '-'}")
+
+
+def importtime(top: int):
+    """Heaviest modules (cumulative) behind `import backend.app.main`, from python -X importtime."""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import backend.app.main"],
+        capture_output=True, text=True, cwd=BASE_DIR, check=True
+    ).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth <= 2:
+            rows.append((int(cumulative_us), int(self_us), name.strip(), depth))
+    rows.sort(reverse=True)
+    print(f"{'cumulative':>10} {'self':>8}  module")
+    for cumulative_us, self_us, name, depth in rows[:top]:
+        print(f"{cumulative_us / 1000:8.1f}ms {self_us / 1000:6.1f}ms  {'  ' * depth}{name}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--route", action="append", choices=list(ROUTES), help="route to time (repeatable), default all")
+    parser.add_argument("--repeat", type=int, default=5, help="fresh interpreters per route")
+    parser.add_argument("--importtime", action="store_true", help="list the heaviest imports instead")
+    parser.add_argument("--top", type=int, default=25, help="rows for --importtime")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _child(args.child)
+    elif args.importtime:
+        importtime(args.top)
+    else:
+        run(args.route or list(ROUTES), args.repeat)
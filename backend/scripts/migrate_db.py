@@ -1,6 +1,7 @@
 import sys
 import os
-from sqlalchemy import text
+import argparse
+from sqlalchemy import inspect, text
 from pathlib import Path
 
 # Add the project root to sys.path
@@ -9,47 +10,426 @@ if str(BASE_DIR) not in sys.path:
     sys.path.append(str(BASE_DIR))
 
 try:
-    from backend.app.core.database import engine
+    from backend.app.core.database import Base, engine
+    from backend.app.models import models  # noqa: F401 (registers tables on Base)
 except ImportError:
     # Try alternative import path
     sys.path.append(str(BASE_DIR / "backend"))
-    from app.core.database import engine
+    from app.core.database import Base, engine
+    from app.models import models  # noqa: F401
+
+
+# =========================================================
+# Versioned migrations
+# =========================================================
+# Each applied version is recorded in schema_migrations and never runs again.
+# Format: (version, name, steps, transactional)
+#   steps         - SQL strings and/or callables taking the connection, run in order
+#   transactional - False for steps that cannot run inside a transaction
+#                   (CREATE INDEX CONCURRENTLY); those run in autocommit mode and
+#                   must be safe to re-run if the migration is interrupted.
+#
+# Steps are written so that databases set up by the old column-adding script
+# (no schema_migrations table yet) can run every version from 1 safely.
+
+def _table_exists(conn, table):
+    return inspect(conn).has_table(table)
+
+
+def _fk_target(conn, table, constraint):
+    return conn.execute(text("""
+        SELECT ccu.table_name
+        FROM information_schema.table_constraints tc
+        JOIN information_schema.constraint_column_usage ccu
+          ON ccu.constraint_name = tc.constraint_name
+        WHERE tc.table_name = :table AND tc.constraint_name = :constraint
+          AND tc.constraint_type = 'FOREIGN KEY';
+    """), {"table": table, "constraint": constraint}).scalar()
+
+
+def _create_tables(*names):
+    def step(conn):
+        Base.metadata.create_all(conn, tables=[Base.metadata.tables[name] for name in names])
+    step.__name__ = f"create_tables({', '.join(names)})"
+    return step
+
+
+def _create_index_concurrently(name, ddl):
+    """CREATE INDEX CONCURRENTLY that first drops an INVALID leftover of an interrupted build."""
+    def step(conn):
+        valid = conn.execute(text("""
+            SELECT i.indisvalid
+            FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+            WHERE c.relname = :name;
+        """), {"name": name}).scalar()
+        if valid is False:
+            print(f"   Dropping invalid index {name} from an interrupted build")
+            conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name};"))
+        conn.execute(text(ddl))
+    step.__name__ = f"create_index_concurrently({name})"
+    return step
+
+
+# Rollups count what price_observations holds: one price per listing
+# (query, source, link) per scrape, the lowest when products has duplicates,
+# exactly as split_products dedupes them below.
+ROLLUP_BACKFILL = """
+    INSERT INTO price_rollups
+        (query, store, day, count, price_sum, price_sum_sq, min_price, max_price, latest_price, latest_at)
+    SELECT
+        query,
+        source,
+        created_at::date,
+        COUNT(*),
+        SUM(price),
+        SUM(price * price),
+        MIN(price),
+        MAX(price),
+        (ARRAY_AGG(price ORDER BY created_at DESC, id DESC))[1],
+        MAX(created_at)
+    FROM (
+        SELECT query, source, created_at, MIN(price) AS price, MAX(id) AS id
+        FROM products
+        WHERE query IS NOT NULL AND source IS NOT NULL AND link IS NOT NULL
+          AND price IS NOT NULL AND created_at IS NOT NULL
+        GROUP BY query, source, link, created_at
+    ) observations
+    GROUP BY query, source, created_at::date
+    ON CONFLICT (query, store, day) DO NOTHING;
+"""
+
+# Rollups recomputed from the observations themselves, for databases whose
+# migration 3 summed duplicate products rows. The table lock holds off
+# concurrent ingest until the rebuild commits; an ingest that was waiting then
+# adds its batch on top, as usual.
+ROLLUP_REBUILD = [
+    "LOCK TABLE price_rollups IN EXCLUSIVE MODE;",
+    "DELETE FROM price_rollups;",
+    """
+    INSERT INTO price_rollups
+        (query, store, day, count, price_sum, price_sum_sq, min_price, max_price, latest_price, latest_at)
+    SELECT
+        l.query,
+        l.source,
+        o.created_at::date,
+        COUNT(*),
+        SUM(o.price),
+        SUM(o.price * o.price),
+        MIN(o.price),
+        MAX(o.price),
+        (ARRAY_AGG(o.price ORDER BY o.created_at DESC, o.listing_id DESC))[1],
+        MAX(o.created_at)
+    FROM price_observations o
+    JOIN listings l ON l.id = o.listing_id
+    GROUP BY l.query, l.source, o.created_at::date;
+    """,
+    # Analytics cached under the old numbers must not be served again
+    "UPDATE query_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP;",
+]
+
+
+def backfill_rollups(conn):
+    if _table_exists(conn, "products"):
+        conn.execute(text(ROLLUP_BACKFILL))
+
+
+# products (one wide row per result per scrape) -> listings + price_observations.
+# Wishlist rows pointed at products.id; they are re-pointed at the listing and keep
+# the price/time of the product row they were saved from.
+SPLIT_PRODUCTS = [
+    """
+    INSERT INTO listings (query, source, link, title, image, store_logo)
+    SELECT DISTINCT ON (query, source, link) query, source, link, title, image, store_logo
+    FROM products
+    WHERE query IS NOT NULL AND source IS NOT NULL AND link IS NOT NULL
+    ORDER BY query, source, link, created_at DESC, id DESC
+    ON CONFLICT (query, source, link) DO NOTHING;
+    """,
+    """
+    CREATE TEMP TABLE product_listing_map ON COMMIT DROP AS
+    SELECT p.id AS product_id, l.id AS listing_id, p.price, p.created_at
+    FROM products p
+    JOIN listings l ON l.query = p.query AND l.source = p.source AND l.link = p.link;
+    """,
+    """
+    INSERT INTO price_observations (listing_id, created_at, price)
+    SELECT listing_id, created_at, MIN(price)
+    FROM product_listing_map
+    WHERE price IS NOT NULL AND created_at IS NOT NULL
+    GROUP BY listing_id, created_at
+    ON CONFLICT DO NOTHING;
+    """,
+    "ALTER TABLE wishlist DROP CONSTRAINT IF EXISTS wishlist_product_id_fkey;",
+    "DELETE FROM wishlist WHERE product_id NOT IN (SELECT product_id FROM product_listing_map);",
+    """
+    UPDATE wishlist w
+    SET product_id = m.listing_id, added_price = m.price, created_at = m.created_at
+    FROM product_listing_map m
+    WHERE w.product_id = m.product_id;
+    """,
+    """
+    ALTER TABLE wishlist ADD CONSTRAINT wishlist_product_id_fkey
+    FOREIGN KEY (product_id) REFERENCES listings(id) ON DELETE CASCADE;
+    """,
+]
+
+
+def split_products(conn):
+    # Only while wishlist still references products; after the split it references listings
+    if not _table_exists(conn, "products") or _fk_target(conn, "wishlist", "wishlist_product_id_fkey") != "products":
+        return
+    for statement in SPLIT_PRODUCTS:
+        conn.execute(text(statement))
+
+
+# price_observations' primary key already indexes (listing_id, created_at), so
+# migration 6's covering index duplicated it. The key itself becomes covering:
+# the new unique index is built without blocking writes, then swapped in as
+# the primary key in one short ALTER TABLE.
+SWAP_OBSERVATIONS_PKEY = """
+    ALTER TABLE price_observations
+        DROP CONSTRAINT price_observations_pkey,
+        ADD CONSTRAINT price_observations_pkey PRIMARY KEY USING INDEX price_observations_pkey_covering;
+"""
+
+
+def covering_observations_pkey(conn):
+    covering = conn.execute(text("""
+        SELECT i.indnatts > i.indnkeyatts
+        FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE c.relname = 'price_observations_pkey';
+    """)).scalar()
+    if not covering:
+        _create_index_concurrently(
+            "price_observations_pkey_covering",
+            "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS price_observations_pkey_covering "
+            "ON price_observations (listing_id, created_at) INCLUDE (price);"
+        )(conn)
+        conn.execute(text(SWAP_OBSERVATIONS_PKEY))
+    conn.execute(text("DROP INDEX CONCURRENTLY IF EXISTS ix_price_observations_listing_created;"))
+
+
+MIGRATIONS = [
+    (1, "create_core_tables", [
+        _create_tables("users", "alerts"),
+    ], True),
+    (2, "alerts_tracking_columns", [
+        "ALTER TABLE alerts ADD COLUMN IF NOT EXISTS last_alerted_price FLOAT;",
+        "ALTER TABLE alerts ADD COLUMN IF NOT EXISTS created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;",
+    ], True),
+    (3, "price_rollups", [
+        _create_tables("price_rollups"),
+        backfill_rollups,
+    ], True),
+    (4, "split_products_into_listings_and_observations", [
+        _create_tables("listings", "price_observations", "wishlist"),
+        "ALTER TABLE wishlist ADD COLUMN IF NOT EXISTS added_price FLOAT;",
+        "ALTER TABLE wishlist ADD COLUMN IF NOT EXISTS created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;",
+        split_products,
+    ], True),
+    (5, "wishlist_dedupe", [
+        """
+        DELETE FROM wishlist a USING wishlist b
+        WHERE a.email = b.email AND a.product_id = b.product_id AND a.id > b.id;
+        """,
+    ], True),
+    # Hot-path indexes, built without blocking writes:
+    #   alerts by (is_active, query)   - scheduler scan of active alerts per query
+    #   wishlist (email, product_id)   - wishlist lookups; also enforces one row per item
+    #   observations (listing_id, created_at) INCLUDE (price)
+    #                                  - per-query history / latest batch as index-only scans
+    #                                    (folded into the primary key by migration 12)
+    (6, "hot_path_indexes", [
+        _create_index_concurrently(
+            "ix_alerts_active_query",
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_alerts_active_query ON alerts (is_active, query);"
+        ),
+        _create_index_concurrently(
+            "uq_wishlist_email_product",
+            "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS uq_wishlist_email_product ON wishlist (email, product_id);"
+        ),
+        _create_index_concurrently(
+            "ix_price_observations_listing_created",
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_price_observations_listing_created "
+            "ON price_observations (listing_id, created_at) INCLUDE (price);"
+        ),
+    ], False),
+    (7, "wishlist_unique_constraint", [
+        """
+        DO $$ BEGIN
+            IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'uq_wishlist_email_product') THEN
+                ALTER TABLE wishlist ADD CONSTRAINT uq_wishlist_email_product
+                UNIQUE USING INDEX uq_wishlist_email_product;
+            END IF;
+        END $$;
+        """,
+    ], True),
+    (8, "product_summaries", [
+        _create_tables("product_summaries"),
+    ], True),
+    (9, "scrape_jobs", [
+        _create_tables("scrape_jobs"),
+    ], True),
+    # Existing products start at version 1 so cached analytics have a key to go by
+    (10, "query_versions", [
+        _create_tables("query_versions"),
+        """
+        INSERT INTO query_versions (query, version, updated_at)
+        SELECT query, 1, MAX(latest_at) FROM price_rollups GROUP BY query
+        ON CONFLICT (query) DO NOTHING;
+        """,
+    ], True),
+    (11, "rebuild_rollups_from_observations", ROLLUP_REBUILD, True),
+    (12, "covering_observations_pkey", [
+        covering_observations_pkey,
+    ], False),
+]
+
+
+def _ensure_migrations_table():
+    with engine.begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                name VARCHAR NOT NULL,
+                applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+            );
+        """))
+
+
+def _applied_versions():
+    with engine.connect() as conn:
+        return {row[0]: row[1] for row in conn.execute(text("SELECT version, applied_at FROM schema_migrations;"))}
+
+
+def _run_steps(conn, steps):
+    for step in steps:
+        if callable(step):
+            step(conn)
+        else:
+            conn.execute(text(step))
+
+
+def _record(conn, version, name):
+    conn.execute(
+        text("INSERT INTO schema_migrations (version, name) VALUES (:version, :name);"),
+        {"version": version, "name": name}
+    )
+
 
 def migrate():
     print("🚀 Starting database migration...")
-    
-    # List of expected columns and their types for specific tables
-    # Format: (table_name, column_name, column_type)
-    migrations = [
-        ("alerts", "last_alerted_price", "FLOAT"),
-        ("alerts", "created_at", "TIMESTAMP DEFAULT CURRENT_TIMESTAMP"),
-        # Add more here if needed
-    ]
+    _ensure_migrations_table()
+    applied = _applied_versions()
 
-    with engine.connect() as conn:
-        for table, column, col_type in migrations:
-            try:
-                # Check if column exists
-                # This syntax works for PostgreSQL (Neon)
-                check_query = text(f"""
-                    SELECT column_name 
-                    FROM information_schema.columns 
-                    WHERE table_name='{table}' AND column_name='{column}';
-                """)
-                result = conn.execute(check_query).fetchone()
-                
-                if not result:
-                    print(f"➕ Adding column '{column}' to table '{table}'...")
-                    alter_query = text(f"ALTER TABLE {table} ADD COLUMN {column} {col_type};")
-                    conn.execute(alter_query)
-                    conn.commit()
-                    print(f"✅ Column '{column}' added successfully.")
-                else:
-                    print(f"ℹ️ Column '{column}' already exists in table '{table}'.")
-            except Exception as e:
-                print(f"❌ Error migrating {table}.{column}: {e}")
+    for version, name, steps, transactional in MIGRATIONS:
+        if version in applied:
+            print(f"ℹ️ {version:03d} {name} already applied.")
+            continue
+
+        print(f"➕ Applying {version:03d} {name}...")
+        try:
+            if transactional:
+                # Steps and the version record commit together or not at all
+                with engine.begin() as conn:
+                    _run_steps(conn, steps)
+                    _record(conn, version, name)
+            else:
+                with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+                    _run_steps(conn, steps)
+                    _record(conn, version, name)
+            print(f"✅ {version:03d} {name} applied.")
+        except Exception as e:
+            # Later migrations may depend on this one, so stop here
+            print(f"❌ Error applying {version:03d} {name}: {e}")
+            sys.exit(1)
 
     print("🏁 Migration finished.")
 
+
+def status():
+    _ensure_migrations_table()
+    applied = _applied_versions()
+    for version, name, _, _ in MIGRATIONS:
+        state = f"applied {applied[version]}" if version in applied else "pending"
+        print(f"{version:03d} {name:<48} {state}")
+
+
+# =========================================================
+# EXPLAIN check for the hot storage queries
+# =========================================================
+# Format: (label, sql, expected_indexes). Sequential scans are disabled for the
+# check so small tables still show whether the planner *can* use the index.
+HOT_QUERIES = [
+    (
+        "price history for a query (analytics, latest batch)",
+        """
+        SELECT o.created_at, l.source, o.price
+        FROM listings l JOIN price_observations o ON o.listing_id = l.id
+        WHERE l.query = :query
+        ORDER BY o.created_at
+        """,
+        {"price_observations_pkey"},
+    ),
+    (
+        "active alerts for a query (scheduler)",
+        "SELECT * FROM alerts WHERE is_active AND query = :query",
+        {"ix_alerts_active_query"},
+    ),
+    (
+        "wishlist entry lookup",
+        "SELECT * FROM wishlist WHERE email = :email AND product_id = :product_id",
+        {"uq_wishlist_email_product"},
+    ),
+    (
+        "daily rollups for a query (analytics)",
+        "SELECT * FROM price_rollups WHERE query = :query ORDER BY day",
+        {"price_rollups_pkey"},
+    ),
+    (
+        "claimable scrape jobs of a run (scheduler workers)",
+        "SELECT id FROM scrape_jobs WHERE run_id = :run_id AND status = 'pending' ORDER BY priority DESC LIMIT 16",
+        {"ix_scrape_jobs_claim"},
+    ),
+]
+
+
+def _plan_indexes(node):
+    found = set()
+    if "Index Name" in node:
+        found.add(node["Index Name"])
+    for child in node.get("Plans", []):
+        found |= _plan_indexes(child)
+    return found
+
+
+def explain():
+    params = {"query": "sample query", "email": "sample@example.com", "product_id": 1, "run_id": "sample-run"}
+    failures = 0
+    with engine.connect() as conn:
+        conn.execute(text("SET enable_seqscan = off;"))
+        for label, sql, expected in HOT_QUERIES:
+            plan = conn.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"), params).scalar()
+            used = _plan_indexes(plan[0]["Plan"])
+            if used & expected:
+                print(f"✅ {label}: {', '.join(sorted(used & expected))}")
+            else:
+                failures += 1
+                print(f"❌ {label}: expected one of {sorted(expected)}, plan used {sorted(used) or 'no index'}")
+        conn.rollback()
+    if failures:
+        sys.exit(1)
+
+
 if __name__ == "__main__":
-    migrate()
+    parser = argparse.ArgumentParser(description="Apply versioned database migrations.")
+    parser.add_argument("--status", action="store_true", help="list migrations and whether they are applied")
+    parser.add_argument("--explain", action="store_true", help="check hot queries use their indexes")
+    args = parser.parse_args()
+
+    if args.status:
+        status()
+    elif args.explain:
+        explain()
+    else:
+        migrate()
@@ -0,0 +1,52 @@
+from backend.app.services.alert_index import AlertIndex
+
+
+def _alert(alert_id, query, target_price, is_active=True):
+    return {"id": alert_id, "query": query, "target_price": target_price, "is_active": is_active}
+
+
+def _index():
+    index = AlertIndex()
+    index.load([
+        ("iphone 15", [_alert(1, "iphone 15", 60000), _alert(2, "iphone 15", 55000), _alert(3, "iphone 15", 70000)]),
+        ("airpods", [_alert(4, "airpods", 15000)]),
+    ])
+    return index
+
+
+def test_triggered_returns_every_alert_whose_target_is_met():
+    index = _index()
+
+    assert len(index) == 4
+    assert index.triggered("iphone 15", 75000) == []
+    assert index.triggered("iphone 15", 70000) == [3]          # target met exactly
+    assert sorted(index.triggered("iphone 15", 58000)) == [1, 3]
+    assert sorted(index.triggered("iphone 15", 50000)) == [1, 2, 3]
+    assert index.triggered("airpods", 14999.5) == [4]
+    assert index.triggered("unknown", 1) == []
+
+
+def test_add_moves_an_updated_alert_and_remove_drops_it():
+    index = _index()
+
+    index.add(_alert(1, "iphone 15", 40000))                   # target lowered
+    assert sorted(index.triggered("iphone 15", 58000)) == [3]
+    assert sorted(index.triggered("iphone 15", 40000)) == [1, 2, 3]
+
+    index.add(_alert(5, " AirPods ", 16000))                   # normalized like storage queries
+    assert sorted(index.triggered("airpods", 15500)) == [5]
+
+    index.remove(4)
+    index.remove(5)
+    index.remove(99)                                           # unknown ids are ignored
+    assert index.triggered("airpods", 1) == []
+    assert len(index) == 3
+
+
+def test_load_replaces_the_index():
+    index = _index()
+    index.load([("pixel 9", [_alert(7, "pixel 9", 50000)])])
+
+    assert len(index) == 1
+    assert index.triggered("iphone 15", 1) == []
+    assert index.triggered("pixel 9", 49000) == [7]
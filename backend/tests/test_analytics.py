@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from backend.app.services.analytics import downsample_trend
+
+
+def _trend(points_per_store, start=datetime(2024, 1, 1)):
+    """A time-sorted trend with the given number of hourly points per store."""
+    rows = [
+        (start + timedelta(hours=i, minutes=code), code, 50000.0 + (i * 7919 + code * 104729) % 5000)
+        for code, n in enumerate(points_per_store)
+        for i in range(n)
+    ]
+    rows.sort()
+    timestamps, codes, prices = zip(*rows)
+    names = np.array([f"store{code}.in" for code in range(len(points_per_store))], dtype=object)
+    return np.array(timestamps, dtype="datetime64[us]"), np.array(codes), np.array(prices), names
+
+
+@pytest.mark.parametrize("points_per_store", [
+    [500] * 40,                       # many stores, each with long history
+    [1000, 800] + [5] * 60,           # two big series and a long tail
+    [3000],
+    [40, 30, 20, 10],
+])
+@pytest.mark.parametrize("max_points", [1, 2, 3, 10, 11, 50, 119, 500, 5000])
+def test_downsampled_trend_never_exceeds_max_points(points_per_store, max_points):
+    timestamps, codes, prices, names = downsample_trend(_trend(points_per_store), max_points)
+
+    assert len(timestamps) <= max_points
+    assert len(timestamps) == len(codes) == len(prices)
+    assert np.all(np.diff(timestamps.astype(np.int64)) >= 0)
+
+
+def test_short_trend_is_returned_unchanged():
+    trend = _trend([5, 5])
+    assert downsample_trend(trend, 10) is trend
+
+
+def test_keeps_the_largest_series_when_stores_outnumber_the_budget():
+    _, codes, _, _ = downsample_trend(_trend([5] * 20 + [400, 300, 200]), 10)
+
+    # 10 points allow 3 series of 3: the three largest stores, first and last points included
+    assert sorted(set(codes.tolist())) == [20, 21, 22]
+    assert len(codes) == 9
+
+
+def test_missing_current_price_falls_back_to_the_default_insight():
+    from backend.app.services.analytics import _build_analytics, _rollup_columns
+
+    rows = [
+        ("Amazon", datetime(2024, 1, 1).date(), 2, 100000.0, 5000000000.0, 49000.0, 51000.0, 51000.0, datetime(2024, 1, 1, 9)),
+        ("Croma", datetime(2024, 1, 2).date(), 1, 48000.0, 2304000000.0, 48000.0, 48000.0, 48000.0, datetime(2024, 1, 2, 9)),
+    ]
+    result = _build_analytics(_rollup_columns(rows), None, None, "day", 500)
+
+    assert result["summary"]["lowest_price"] == 48000
+    assert result["best_time_to_buy"].startswith("Not enough data yet")
+
+
+def test_result_cache_is_bounded_by_trend_points(monkeypatch):
+    from backend.app.services import analytics
+
+    monkeypatch.setattr(analytics, "ANALYTICS_CACHE_POINTS", 1000)
+    monkeypatch.setattr(analytics, "_results", analytics.OrderedDict())
+    monkeypatch.setattr(analytics, "_results_cost", 0)
+
+    def result(points):
+        return {"summary": {}, "price_trend": [{"price": 1.0}] * points}
+
+    # A client varying max_points only churns the cache
+    for max_points in range(10, 5000, 7):
+        analytics._cache_put(("q", 1, "raw", max_points), result(max_points))
+        assert analytics._results_cost <= 1000
+    assert analytics._results_cost == sum(cost for _, cost in analytics._results.values())
+
+    # Oversized results are not cached; errors never are
+    analytics._cache_put(("big", 1, "raw", 5000), result(5000))
+    analytics._cache_put(("missing", 1, "day", 500), {"error": "No price data available yet"})
+    assert analytics._cache_get(("big", 1, "raw", 5000)) is None
+    assert analytics._cache_get(("missing", 1, "day", 500)) is None
+
+    small = result(100)
+    analytics._cache_put(("q", 2, "day", 100), small)
+    assert analytics._cache_get(("q", 2, "day", 100)) is small
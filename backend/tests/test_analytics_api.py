@@ -0,0 +1,101 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.app.api import analytics as api
+from backend.app.api.analytics import _etag, _etag_matches
+
+ETAG = _etag(7, "day", 120)
+
+
+@pytest.mark.parametrize("if_none_match, expected", [
+    (None, False),
+    ("", False),
+    (ETAG, True),
+    (f"W/{ETAG}", True),
+    (f'"other", {ETAG}', True),
+    ("*", True),
+    (_etag(6, "day", 120), False),
+    (_etag(7, "week", 120), False),
+    (_etag(7, "day", 500), False),
+])
+def test_etag_matches(if_none_match, expected):
+    assert _etag_matches(if_none_match, ETAG) is expected
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """The analytics router over a fake data version and analytics engine."""
+    state = {"version": 7, "analyzed": [], "batches": []}
+
+    async def get_data_version(query):
+        return state["version"]
+
+    async def analyze_price_async(query, resolution, max_points, version):
+        state["analyzed"].append((query, version))
+        return {"summary": {"query": query}}
+
+    async def analyze_prices_async(queries, resolution, max_points):
+        state["batches"].append(queries)
+        return {q: {"summary": {"query": q}} for q in queries}
+
+    monkeypatch.setattr(api.storage_async, "get_data_version", get_data_version)
+    monkeypatch.setattr(api, "analyze_price_async", analyze_price_async)
+    monkeypatch.setattr(api, "analyze_prices_async", analyze_prices_async)
+
+    app = FastAPI()
+    app.include_router(api.router, prefix="/api")
+    with TestClient(app) as c:
+        yield c, state
+
+
+def test_unchanged_data_is_not_modified(client):
+    c, state = client
+
+    first = c.get("/api/analytics", params={"q": " iPhone 15 ", "max_points": 120})
+    assert first.status_code == 200
+    assert first.headers["ETag"] == ETAG
+    assert first.headers["Cache-Control"] == "no-cache"
+
+    again = c.get("/api/analytics", params={"q": "iphone 15", "max_points": 120},
+                  headers={"If-None-Match": first.headers["ETag"]})
+    assert again.status_code == 304
+    assert again.headers["ETag"] == ETAG
+    assert state["analyzed"] == [("iphone 15", 7)]
+
+    state["version"] = 8            # a new scrape was stored
+    fresh = c.get("/api/analytics", params={"q": "iphone 15", "max_points": 120},
+                  headers={"If-None-Match": first.headers["ETag"]})
+    assert fresh.status_code == 200
+    assert fresh.headers["ETag"] == _etag(8, "day", 120)
+
+
+def test_unversioned_data_is_never_cached(client):
+    c, state = client
+    state["version"] = 0
+
+    r = c.get("/api/analytics", params={"q": "iphone 15"}, headers={"If-None-Match": "*"})
+    assert r.status_code == 200
+    assert "ETag" not in r.headers
+
+
+def test_batch_dedupes_and_accepts_up_to_the_limit(client):
+    c, state = client
+    queries = [f"Product {i}" for i in range(api.MAX_BATCH_QUERIES)]
+
+    r = c.post("/api/analytics/batch", json={"queries": queries + [" product 0 ", "PRODUCT 1"]})
+    assert r.status_code == 200
+    assert list(r.json()) == [q.lower() for q in queries]
+    assert state["batches"] == [[q.lower() for q in queries]]
+
+
+@pytest.mark.parametrize("queries", [
+    [f"product {i}" for i in range(api.MAX_BATCH_QUERIES + 1)],
+    ["   ", ""],
+])
+def test_batch_rejects_too_many_or_only_empty_queries(client, queries):
+    c, state = client
+
+    r = c.post("/api/analytics/batch", json={"queries": queries})
+    assert r.status_code == 400
+    assert state["batches"] == []
@@ -0,0 +1,223 @@
+"""
+The columnar engine against the per-row engine it replaced, on fixed rollup and
+history rows: every summary, store price, trend point and insight must match.
+
+reference_analytics is the previous analytics._build_analytics (dict rollups,
+history as time-sorted records), kept here as the oracle.
+"""
+import math
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend.app.services.analytics import _build_analytics, _rollup_columns
+from backend.app.services.storage import CURRENT_BATCH_WINDOW, HISTORY_COLUMNS, ROLLUP_COLUMNS
+
+
+# ---------------------------------------------------------
+# Fixed rows
+# ---------------------------------------------------------
+def _history(stores, days, scrapes_per_day, start, seed):
+    """(created_at, store, price) observations: every store in most scrapes, some with 2 listings."""
+    rnd = random.Random(seed)
+    rows = []
+    for d in range(days):
+        for k in range(scrapes_per_day):
+            scraped_at = start + timedelta(days=d, hours=3 * k, seconds=rnd.randint(0, 59))
+            for store in rnd.sample(stores, k=max(1, len(stores) - rnd.randint(0, 2))):
+                for _ in range(rnd.randint(1, 2)):
+                    price = float(rnd.choice([49999, 52999, 54999, 50999.5]) + rnd.randint(-3000, 3000))
+                    rows.append((scraped_at, store, price))
+    rows.sort(key=lambda r: r[0])
+    return rows
+
+
+def _rollups(history):
+    """ROLLUP_COLUMNS tuples the way storage maintains them, ordered by (day, store)."""
+    buckets = {}
+    for created_at, store, price in history:
+        key = (created_at.date(), store)
+        r = buckets.get(key)
+        if r is None:
+            buckets[key] = [1, price, price * price, price, price, price, created_at]
+        else:
+            r[0] += 1
+            r[1] += price
+            r[2] += price * price
+            r[3] = min(r[3], price)
+            r[4] = max(r[4], price)
+            if created_at >= r[6]:
+                r[5], r[6] = price, created_at
+    return [(store, day, *values) for (day, store), values in sorted(buckets.items())]
+
+
+def _current_lowest(history, window=CURRENT_BATCH_WINDOW):
+    latest = max(r[0] for r in history)
+    return min(price for created_at, _, price in history if created_at >= latest - window)
+
+
+PRODUCTS = {
+    "two stores, a month": _history(["Amazon", "Flipkart"], 30, 3, datetime(2024, 11, 1), seed=1),
+    "eight stores, a year": _history([f"Store{i}" for i in range(8)], 400, 2, datetime(2023, 11, 1), seed=2),
+    "one scrape": _history(["Croma"], 1, 1, datetime(2024, 12, 31), seed=3),
+}
+
+
+# ---------------------------------------------------------
+# Reference: the per-row engine
+# ---------------------------------------------------------
+def _reference_rollup_trend(rollups, resolution):
+    buckets = {}
+    for r in rollups:
+        day = r["day"]
+        if resolution == "week":
+            day = day - timedelta(days=day.weekday())
+        bucket = buckets.setdefault((day, r["store"]), [0.0, 0])
+        bucket[0] += r["price_sum"]
+        bucket[1] += r["count"]
+    return [
+        {"timestamp": datetime.combine(day, datetime.min.time()), "store": store, "price": price_sum / count}
+        for (day, store), (price_sum, count) in sorted(buckets.items())
+    ]
+
+
+def _reference_lttb(points, threshold):
+    n = len(points)
+    if threshold >= n or threshold < 3:
+        return points
+
+    xs = [p["timestamp"].timestamp() for p in points]
+    ys = [p["price"] for p in points]
+    bucket_size = (n - 2) / (threshold - 2)
+
+    sampled = [points[0]]
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+        next_end = min(int((i + 2) * bucket_size) + 1, n)
+
+        avg_x = sum(xs[end:next_end]) / (next_end - end)
+        avg_y = sum(ys[end:next_end]) / (next_end - end)
+
+        best, best_area = start, -1.0
+        for j in range(start, end):
+            area = abs((xs[a] - avg_x) * (ys[j] - ys[a]) - (xs[a] - xs[j]) * (avg_y - ys[a]))
+            if area > best_area:
+                best, best_area = j, area
+
+        sampled.append(points[best])
+        a = best
+
+    sampled.append(points[-1])
+    return sampled
+
+
+def _reference_downsample(price_trend, max_points):
+    if len(price_trend) <= max_points:
+        return price_trend
+
+    by_store = {}
+    for point in price_trend:
+        by_store.setdefault(point["store"], []).append(point)
+
+    per_store = max(3, max_points // len(by_store))
+    sampled = []
+    for series in by_store.values():
+        sampled.extend(_reference_lttb(series, per_store))
+    sampled.sort(key=lambda p: p["timestamp"])
+    return sampled
+
+
+def reference_analytics(rollups, current_lowest, history, resolution, max_points):
+    count = sum(r["count"] for r in rollups)
+    price_sum = sum(r["price_sum"] for r in rollups)
+    price_sum_sq = sum(r["price_sum_sq"] for r in rollups)
+    min_price = min(r["min_price"] for r in rollups)
+
+    lowest_price = int(min_price)
+    highest_price = int(max(r["max_price"] for r in rollups))
+    avg_price = int(price_sum / count)
+    cheapest_store = next(r["store"] for r in rollups if r["min_price"] == min_price)
+
+    latest_by_store = {}
+    for r in rollups:
+        current = latest_by_store.get(r["store"])
+        if current is None or r["latest_at"] >= current["latest_at"]:
+            latest_by_store[r["store"]] = r
+    store_prices = {store: int(latest_by_store[store]["latest_price"]) for store in sorted(latest_by_store)}
+
+    if resolution == "raw":
+        price_trend = sorted(history, key=lambda p: p["timestamp"])
+    else:
+        price_trend = _reference_rollup_trend(rollups, resolution)
+    price_trend = _reference_downsample(price_trend, max_points)
+
+    if count > 1:
+        variance = max(price_sum_sq - price_sum * price_sum / count, 0.0) / (count - 1)
+        volatility_score = round(math.sqrt(variance), 2)
+    else:
+        volatility_score = 0
+    if volatility_score < 500:
+        stability = "🟢 Stable"
+    elif volatility_score < 1500:
+        stability = "🟡 Moderate"
+    else:
+        stability = "🔴 Highly Volatile"
+
+    insight = "Not enough data yet — search again later to track price movement."
+    if count > 1:
+        current_lowest = int(current_lowest)
+        diff = current_lowest - avg_price
+        pct = round((diff / avg_price) * 100, 1)
+        if current_lowest <= lowest_price:
+            insight = "This is the lowest price ever recorded! Great time to buy."
+        elif diff < 0:
+            insight = f"Current best price (₹{current_lowest:,}) is {abs(pct)}% below the historical average. Good time to buy."
+        elif diff == 0:
+            insight = f"Current price is right at the historical average (₹{avg_price:,})."
+        else:
+            insight = f"Current best price (₹{current_lowest:,}) is {pct}% above the historical average. Consider waiting."
+
+    return {
+        "summary": {
+            "lowest_price": lowest_price,
+            "highest_price": highest_price,
+            "average_price": avg_price,
+            "price_range": f"₹{lowest_price} – ₹{highest_price}",
+            "cheapest_store": cheapest_store
+        },
+        "store_prices": store_prices,
+        "price_trend": price_trend,
+        "volatility": {"score": volatility_score, "stability": stability},
+        "best_time_to_buy": insight
+    }
+
+
+# ---------------------------------------------------------
+# Old vs new
+# ---------------------------------------------------------
+# Limits of at least 3 points per store: below that the new engine keeps only
+# the largest series (test_analytics.py), where the old one overshot max_points.
+@pytest.mark.parametrize("product", list(PRODUCTS))
+@pytest.mark.parametrize("resolution", ["raw", "day", "week"])
+@pytest.mark.parametrize("max_points", [24, 50, 500, 5000])
+def test_columnar_engine_matches_the_per_row_engine(product, resolution, max_points):
+    history = PRODUCTS[product]
+    rollup_rows = _rollups(history)
+    current_lowest = _current_lowest(history)
+
+    expected = reference_analytics(
+        [dict(zip(ROLLUP_COLUMNS, r)) for r in rollup_rows],
+        current_lowest,
+        [dict(zip(("timestamp", "store", "price"), r)) for r in history],
+        resolution, max_points
+    )
+    actual = _build_analytics(
+        _rollup_columns(rollup_rows), current_lowest,
+        [r[:len(HISTORY_COLUMNS)] for r in history] if resolution == "raw" else None,
+        resolution, max_points
+    )
+
+    assert actual == expected
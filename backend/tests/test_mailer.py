@@ -0,0 +1,89 @@
+import socket
+
+import pytest
+
+from backend.app.services.mailer import Mailer
+
+controller_module = pytest.importorskip("aiosmtpd.controller")
+
+
+class SinkHandler:
+    """Keeps every message it receives, with the client port it came from."""
+
+    def __init__(self):
+        self.messages = []
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append((session.peer[1], envelope.rcpt_tos, envelope.content))
+        return "250 OK"
+
+
+@pytest.fixture
+def sink():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    handler = SinkHandler()
+    controller = controller_module.Controller(handler, hostname="127.0.0.1", port=port)
+    controller.start()
+    yield handler, port
+    controller.stop()
+
+
+def _mailer(port, **kwargs):
+    kwargs.setdefault("username", None)
+    kwargs.setdefault("password", None)
+    return Mailer(host="127.0.0.1", port=port, starttls=False, **kwargs)
+
+
+def test_delivers_every_message_over_pooled_connections(sink):
+    handler, port = sink
+    with _mailer(port, allow_no_auth=True, pool_size=2) as mailer:
+        for i in range(10):
+            mailer.send(mailer.compose(f"user{i}@example.com", f"Alert {i}", "text", "<p>html</p>"))
+
+    stats = mailer.stats()
+    assert (stats["sent"], stats["failed"], stats["skipped"]) == (10, 0, 0)
+    assert sorted(rcpt[0] for _, rcpt, _ in handler.messages) == sorted(f"user{i}@example.com" for i in range(10))
+    # Connections are reused: at most one per worker
+    assert len({client_port for client_port, _, _ in handler.messages}) <= 2
+
+
+def test_without_credentials_nothing_is_sent(sink):
+    handler, port = sink
+    with _mailer(port) as mailer:
+        mailer.send(mailer.compose("user@example.com", "Alert", "text"))
+        assert mailer._workers == []
+
+    assert handler.messages == []
+    assert (mailer.stats()["sent"], mailer.stats()["skipped"]) == (0, 1)
+
+
+def test_message_is_retried_on_a_fresh_connection(sink):
+    handler, port = sink
+    mailer = _mailer(port, allow_no_auth=True, pool_size=1)
+    server = mailer._connect()
+    server.close()      # a connection the server dropped while idle
+    server = mailer._deliver(server, mailer.compose("user@example.com", "Alert", "text"))
+    mailer._disconnect(server)
+
+    assert len(handler.messages) == 1
+    assert (mailer.sent, mailer.failed, mailer.reconnects) == (1, 0, 1)
+
+
+def test_unexpected_error_fails_the_message_and_keeps_the_worker(sink, monkeypatch):
+    handler, port = sink
+    with _mailer(port, allow_no_auth=True, pool_size=1) as mailer:
+        deliver = mailer._deliver
+
+        def flaky_deliver(server, msg):
+            if msg["To"] == "bad@example.com":
+                raise ValueError("unencodable header")
+            return deliver(server, msg)
+
+        monkeypatch.setattr(mailer, "_deliver", flaky_deliver)
+        mailer.send(mailer.compose("bad@example.com", "Alert", "text"))
+        mailer.send(mailer.compose("user@example.com", "Alert", "text"))
+
+    assert (mailer.sent, mailer.failed) == (1, 1)
+    assert [rcpt for _, rcpt, _ in handler.messages] == [["user@example.com"]]
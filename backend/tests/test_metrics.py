@@ -0,0 +1,74 @@
+import pytest
+from sqlalchemy import create_engine, text
+
+from backend.app.core import metrics
+
+
+@pytest.fixture
+def registry():
+    """Metrics created by a test are unregistered afterwards."""
+    before = list(metrics._registry)
+    yield
+    metrics._registry[:] = before
+
+
+def test_counter_and_gauge_text(registry):
+    counter = metrics.Counter("test_jobs_total", "Jobs run", ("queue",))
+    counter.inc(queue="scrape")
+    counter.inc(2, queue="scrape")
+    counter.inc(queue='mail "fast"\n')
+    gauge = metrics.Gauge("test_depth", "Queue depth")
+    gauge.set(1.5)
+    broken = metrics.Gauge("test_pool", "A gauge whose source is gone", ("engine",))
+    broken.set_function(lambda: 1 / 0, engine="sync")
+
+    assert counter.render() == [
+        "# HELP test_jobs_total Jobs run",
+        "# TYPE test_jobs_total counter",
+        'test_jobs_total{queue="scrape"} 3',
+        'test_jobs_total{queue="mail \\"fast\\"\\n"} 1',
+    ]
+    assert gauge.render()[2:] == ["test_depth 1.5"]
+    assert broken.render()[2:] == []
+
+    text_format = metrics.render()
+    assert text_format.endswith("\n")
+    assert "# TYPE test_depth gauge\ntest_depth 1.5\n" in text_format
+    assert 'test_jobs_total{queue="scrape"} 3\n' in text_format
+
+
+def test_histogram_buckets_are_cumulative(registry):
+    histogram = metrics.Histogram("test_seconds", "Latency", ("mode",), buckets=(0.1, 1))
+    for value in (0.05, 0.1, 0.5, 3):
+        histogram.observe(value, mode="sync")
+
+    assert histogram.render()[2:] == [
+        'test_seconds_bucket{mode="sync",le="0.1"} 2',
+        'test_seconds_bucket{mode="sync",le="1"} 3',
+        'test_seconds_bucket{mode="sync",le="+Inf"} 4',
+        'test_seconds_sum{mode="sync"} 3.65',
+        'test_seconds_count{mode="sync"} 4',
+    ]
+    with pytest.raises(ValueError):
+        histogram.observe(1)
+
+
+def _count(histogram, engine):
+    return next(
+        (value for suffix, key, _, value in histogram._samples() if suffix == "_count" and key == (engine,)), 0
+    )
+
+
+def test_pool_metrics_survive_engine_dispose(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'pool.db'}")
+    metrics.instrument_engine(engine, "test")
+
+    with engine.connect() as conn:
+        conn.execute(text("select 1"))
+    engine.dispose()                # replaces engine.pool
+    with engine.connect() as conn:
+        conn.execute(text("select 1"))
+
+    assert _count(metrics.DB_POOL_CHECKOUT, "test") == 2
+    assert _count(metrics.DB_POOL_HOLD, "test") == 2
+    assert 'pricenest_db_pool_checked_out{engine="test"} 0' in metrics.render()
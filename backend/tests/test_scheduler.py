@@ -0,0 +1,76 @@
+import threading
+import time
+
+import pytest
+
+from backend.app.services import scheduler
+from backend.app.services.scheduler import RateLimiter, scrape_pipeline
+
+
+def test_rate_limiter_spaces_calls_across_threads():
+    limiter = RateLimiter(20)           # one slot every 50 ms
+    times = []
+
+    def worker():
+        for _ in range(3):
+            limiter.acquire()
+            times.append(time.monotonic())
+
+    threads = [threading.Thread(target=worker) for _ in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    times.sort()
+    assert len(times) == 9
+    assert all(b - a >= 0.045 for a, b in zip(times, times[1:]))
+
+
+def test_rate_limiter_without_a_rate_never_waits():
+    limiter = RateLimiter(0)
+    start = time.monotonic()
+    for _ in range(1000):
+        limiter.acquire()
+    assert time.monotonic() - start < 0.5
+
+
+@pytest.fixture
+def fake_scrapes(monkeypatch):
+    """compare_product that takes delays[query] seconds; nothing is stored."""
+    delays = {}
+
+    def compare_product(query, timeout=None):
+        time.sleep(delays[query])
+        return {"results": [{"price_numeric": 100.0 + len(query)}]}
+
+    monkeypatch.setattr(scheduler, "compare_product", compare_product)
+    monkeypatch.setattr(scheduler.storage, "upsert_product", lambda query, results: results)
+    return delays
+
+
+def test_pipeline_yields_every_scrape(fake_scrapes):
+    fake_scrapes.update({f"q{i}": 0.01 for i in range(12)})
+    groups = ((q, i) for i, q in enumerate(fake_scrapes))
+
+    out = list(scrape_pipeline(groups, concurrency=3, max_rps=0, deadline=5))
+
+    assert sorted(payload for _, payload, _ in out) == list(range(12))
+    assert all(best["lowest_price"] == 100.0 + len(q) for q, _, best in out)
+
+
+def test_pipeline_fails_overdue_scrapes_without_waiting_for_them(fake_scrapes):
+    fake_scrapes.update({"fast": 0.01, "hung": 1.5, "also fast": 0.01})
+    errors = []
+
+    start = time.monotonic()
+    out = list(scrape_pipeline(
+        [(q, None) for q in fake_scrapes], concurrency=3, max_rps=0, deadline=0.3,
+        on_error=lambda query, payload, exc: errors.append((query, exc))
+    ))
+    elapsed = time.monotonic() - start
+
+    assert sorted(q for q, _, _ in out) == ["also fast", "fast"]
+    assert [q for q, _ in errors] == ["hung"]
+    assert isinstance(errors[0][1], TimeoutError)
+    assert elapsed < 1.2
@@ -0,0 +1,64 @@
+import math
+from datetime import datetime, timedelta
+
+from backend.app.services.scrape_planner import plan_scrapes
+
+NOW = datetime(2025, 1, 1, 12)
+
+
+def _stats(current_price, hours_ago, prices):
+    """get_scrape_stats() entry for rollups holding the given prices."""
+    return {
+        "count": len(prices),
+        "price_sum": sum(prices),
+        "price_sum_sq": sum(p * p for p in prices),
+        "current_price": current_price,
+        "last_scraped_at": NOW - timedelta(hours=hours_ago),
+    }
+
+
+def _groups(targets_by_query):
+    return [(query, [{"target_price": t} for t in targets]) for query, targets in targets_by_query.items()]
+
+
+GROUPS = _groups({
+    "flat, far from target": [50000],
+    "volatile, far from target": [50000],
+    "flat, near target": [59000],
+    "never scraped": [100],
+    "overdue": [100],
+    "target already met": [70000],
+})
+STATS = {
+    "flat, far from target": _stats(60000, 4, [60000, 60000, 60000]),
+    "volatile, far from target": _stats(60000, 4, [50000, 60000, 70000]),
+    "flat, near target": _stats(60000, 4, [60000, 60000, 60000]),
+    "overdue": _stats(60000, 10_000, [60000, 60000]),
+    "target already met": _stats(60000, 1, [60000, 60000]),
+}
+
+
+def test_urgent_queries_first_then_by_expected_move_over_gap():
+    plan = plan_scrapes(GROUPS, STATS, budget=0, now=NOW)
+    queries = [query for query, _ in plan]
+
+    # Never scraped and overdue tie at infinity; the earlier group wins
+    assert queries[:2] == ["never scraped", "overdue"]
+    assert math.isinf(plan[0][1]) and math.isinf(plan[1][1])
+    assert queries.index("target already met") < queries.index("flat, near target")
+    assert queries.index("flat, near target") < queries.index("flat, far from target")
+    assert queries.index("volatile, far from target") < queries.index("flat, far from target")
+    assert [p for _, p in plan] == sorted((p for _, p in plan), reverse=True)
+
+
+def test_budget_keeps_the_most_urgent_queries():
+    full = plan_scrapes(GROUPS, STATS, budget=0, now=NOW)
+
+    for budget in range(1, len(GROUPS) + 1):
+        assert plan_scrapes(iter(GROUPS), STATS, budget=budget, now=NOW) == full[:budget]
+
+
+def test_equal_priorities_keep_group_order():
+    groups = _groups({f"q{i}": [1] for i in range(10)})
+
+    assert [q for q, _ in plan_scrapes(groups, {}, budget=4, now=NOW)] == ["q0", "q1", "q2", "q3"]
@@ -0,0 +1,74 @@
+import asyncio
+from collections import OrderedDict
+
+import pytest
+
+from backend.app.services import summary
+
+
+@pytest.fixture
+def loads(monkeypatch):
+    """Fake _load_summary_async that records its calls and takes 50 ms; caches start empty."""
+    calls = []
+
+    async def load(key, query):
+        calls.append(key)
+        await asyncio.sleep(0.05)
+        data = {"title": key, "load": len(calls)}
+        summary._lru_put(key, data)
+        return {"success": True, "data": data}
+
+    monkeypatch.setattr(summary, "_load_summary_async", load)
+    monkeypatch.setattr(summary, "_lru", OrderedDict())
+    yield calls
+    assert summary._inflight == {}
+
+
+def test_concurrent_misses_share_one_load(loads):
+    async def burst():
+        return await asyncio.gather(*(summary.get_product_summary_async(q) for q in ["iPhone 15", " iphone 15"] * 5))
+
+    results = asyncio.run(burst())
+
+    assert loads == ["iphone 15"]
+    assert all(r == {"success": True, "data": {"title": "iphone 15", "load": 1}} for r in results)
+
+    # Served from the LRU afterwards
+    asyncio.run(summary.get_product_summary_async("iphone 15"))
+    assert loads == ["iphone 15"]
+
+
+def test_a_cancelled_leader_hands_over_to_a_follower(loads):
+    async def scenario():
+        leader = asyncio.create_task(summary.get_product_summary_async("pixel 9"))
+        await asyncio.sleep(0.01)
+        followers = [asyncio.create_task(summary.get_product_summary_async("pixel 9")) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        followers[0].cancel()       # a follower leaving must not cancel the others
+        return await asyncio.gather(leader, *followers, return_exceptions=True)
+
+    leader, *followers = asyncio.run(scenario())
+
+    assert isinstance(leader, asyncio.CancelledError)
+    assert isinstance(followers[0], asyncio.CancelledError)
+    assert followers[1:] == [{"success": True, "data": {"title": "pixel 9", "load": 2}}] * 2
+    assert loads == ["pixel 9", "pixel 9"]
+
+
+def test_a_failed_load_is_raised_to_every_waiter(loads, monkeypatch):
+    async def failing(key, query):
+        loads.append(key)
+        await asyncio.sleep(0.05)
+        raise ConnectionError("database unavailable")
+
+    monkeypatch.setattr(summary, "_load_summary_async", failing)
+
+    async def burst():
+        return await asyncio.gather(*(summary.get_product_summary_async("airpods") for _ in range(4)),
+                                    return_exceptions=True)
+
+    results = asyncio.run(burst())
+
+    assert loads == ["airpods"]
+    assert all(isinstance(r, ConnectionError) for r in results)
@@ -105,6 +105,10 @@ function createWishlistCard(item) {
       <div class="wishlist-item-name">${item.title}</div>
       
       <div class="wishlist-item-price">${formatCurrency(item.price)}</div>
+      ${createPriceChange(item)}
+      ${item.lowest_price != null && item.lowest_price < item.price
+        ? `<div class="wishlist-item-lowest">Lowest now: ${formatCurrency(item.lowest_price)} at ${item.lowest_price_source}</div>`
+        : ''}
       <div class="wishlist-item-added">Added ${formatDate(item.created_at)}</div>
       
       <div class="wishlist-item-actions">
@@ -121,6 +125,13 @@ function createWishlistCard(item) {
   `;
 }
 
+function createPriceChange(item) {
+  if (item.price_change == null || item.price_change === 0) return '';
+  const direction = item.price_change < 0 ? 'down' : 'up';
+  const arrow = item.price_change < 0 ? '▼' : '▲';
+  return `<div class="wishlist-item-change ${direction}">${arrow} ${formatCurrency(Math.abs(item.price_change))} since added</div>`;
+}
+
 // =====================================================
 // WISHLIST ACTIONS
 // =====================================================